@@ -0,0 +1,327 @@
+import os
+import signal
+import asyncio
+import logging
+import time
+import threading
+from functools import partial
+from contextlib import nullcontext
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from production_pipeline import ProductionPipeline
+from pipeline_model import ModelPipeline
+from inference import FileScoring, begin_journaled
+from metrics import timed
+
+
+class AsyncProductionPipeline(ProductionPipeline):
+    """
+    Production pipeline driven by an asyncio event loop instead of the watchdog callbacks and the sleep loop.
+
+    Filesystem events are bridged from the watchdog thread into the loop. Every new file is
+    watched by a coroutine until it is stable and then put into a bounded asyncio queue, which
+    scoring_workers coroutines consume. Files are scored with the same inference.FileScoring steps
+    as in ProductionPipeline: parsing and scoring a chunk run on a pool for CPU-bound work, cache
+    lookups and writing predictions on a separate pool for I/O, so a burst of small files never
+    waits behind the writes of a large one and the loop itself never blocks.
+
+    SIGINT and SIGTERM stop the intake; files already queued or being scored are finished,
+    the output sink is flushed and then the loop exits. Files that were still being written
+    stay in the input directory and are picked up on the next start.
+
+    Attributes:
+        io_workers (int): Number of threads reading input files and writing predictions.
+    """
+
+    def __init__(self, config_path: str, io_workers: int = 8):
+        """
+        initializing the asyncio production pipeline.
+
+        Args:
+            config_path (str): Path to the configuration JSON file.
+            io_workers (int): Number of threads reading input files and writing predictions.
+        """
+        self.io_workers = io_workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._known: Dict[str, float] = {}
+        self._stabilizers = set()
+        self._stabilizing = 0
+        self._busy = 0
+        self._coalesced = 0
+        super().__init__(config_path)
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='async-io')
+        self.cpu_executor = ThreadPoolExecutor(max_workers=self.scoring_workers, thread_name_prefix='async-cpu')
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        # Asyncio counterpart of _stream_lock for the scoring coroutines of serve
+        self._stream_order_lock: Optional[asyncio.Lock] = None
+
+    def process_new_file(self, file_path: str):
+        """
+        Process a new file outside of the event loop, e.g. when called directly; see process_file.
+
+        Args:
+            file_path (str): Path to the new data file to process.
+        """
+        try:
+            with self._stream_order(self.bundle_manager.get()):
+                asyncio.run(self.process_file(file_path))
+        except Exception as e:
+            logging.error("Error processing file %s: %s", file_path, str(e))
+
+    async def process_file(self, file_path: str) -> int:
+        """
+        Score a file chunk by chunk, write its predictions, render its plots and remove it.
+
+        Every chunk is parsed and scored on the CPU pool and written on the I/O pool, so the event
+        loop only coordinates. With a journal, files already processed are skipped and
+        interrupted ones resume from their last checkpoint, as in ProductionPipeline.process_new_file.
+        A claimed file whose journal lookup or scoring fails is given back with FileClaimer.release.
+
+        Args:
+            file_path (str): Path to the data file to process.
+
+        Returns:
+            int: Number of rows scored.
+        """
+        logging.info("Found new data file %s", file_path)
+        loop = asyncio.get_running_loop()
+        if self.claimer is not None:
+            file_path = await loop.run_in_executor(self.io_executor, self.claimer.claim, file_path)
+            if file_path is None:
+                return 0
+        digest, start_row = None, 0
+        try:
+            if self.journal is not None:
+                resume = await loop.run_in_executor(self.io_executor, begin_journaled, self.journal, file_path,
+                                                    self.output_dir, self.chunk_size, self.sink)
+                if resume is None:
+                    self.metrics.counter('skipped_files_total', "Input files whose content was already "
+                                                                "processed.").inc(mode='live')
+                    await loop.run_in_executor(self.io_executor, self._remove_input, file_path)
+                    return 0
+                digest, start_row = resume
+            rows = await self._score_file(file_path, digest, start_row)
+        except Exception as e:
+            if digest is not None:
+                await loop.run_in_executor(self.io_executor, self.journal.fail, digest, str(e))
+            await loop.run_in_executor(self.io_executor, self._release_claim, file_path)
+            raise
+        self.metrics.counter('files_total', "Input files processed.").inc(mode='live')
+        self.metrics.counter('rows_total', "Rows scored.").inc(rows, mode='live')
+        return rows
+
+    async def _score_file(self, file_path: str, digest: Optional[str], start_row: int) -> int:
+        """
+        Score a claimed file from start_row on with inference.FileScoring, checkpointing every chunk in the
+        journal if digest is given. The cache lookup, writes and checkpoints run on the I/O pool, parsing
+        and scoring each chunk on the CPU pool. With a feature engine in the bundle, the scoring
+        coroutines score one file at a time, see ProductionPipeline._stream_order.
+        """
+        loop = asyncio.get_running_loop()
+        with timed(self.metrics, 'file'):
+            bundle = await loop.run_in_executor(self.io_executor, self.bundle_manager.get)
+            model_pipeline = ModelPipeline(model_path=self.model_path, data_dir=self.input_dir, bundle=bundle,
+                                           metrics=self.metrics)
+            checkpoint = partial(self.journal.checkpoint, digest) if digest is not None else None
+            collected = [] if self.sink is not None and self.sensors_to_plot else None
+            scoring = FileScoring(model_pipeline, file_path, self.output_dir, self.chunk_size, sink=self.sink,
+                                  collect=collected, start_row=start_row, checkpoint=checkpoint,
+                                  cache=self.prediction_cache, content_digest=digest)
+            ordered = bundle.feature_engine is not None and self._stream_order_lock is not None
+            async with self._stream_order_lock if ordered else nullcontext():
+                await loop.run_in_executor(self.io_executor, scoring.open)
+                while True:
+                    frame = await loop.run_in_executor(self.cpu_executor, scoring.next_frame)
+                    if frame is None:
+                        break
+                    await loop.run_in_executor(self.io_executor, scoring.write, frame)
+                rows = await loop.run_in_executor(self.io_executor, scoring.close)
+            commit = None
+            if digest is not None:
+                total = scoring.raw_rows
+                commit = lambda: self.journal.complete(digest, total)
+            await loop.run_in_executor(self.io_executor, self._complete_file, file_path, collected, start_row > 0,
+                                       commit)
+        return rows
+
+    def _register_gauges(self):
+        """
+        Expose the asyncio queue and the scoring coroutines' state as gauges read on every scrape.
+        """
+        self.metrics.gauge('scoring_queue_depth', "Stable files waiting for a scoring worker.",
+                           lambda: self._queue.qsize() if self._queue is not None else 0)
+        self.metrics.gauge('stabilizing_files', "Files waiting until they are completely written.",
+                           lambda: self._stabilizing)
+        self.metrics.gauge('scoring_workers_busy', "Scoring workers currently processing a file.", lambda: self._busy)
+        self.metrics.gauge('scoring_workers', "Configured number of scoring workers.", lambda: self.scoring_workers)
+        self.metrics.gauge('coalesced_events', "Filesystem events merged into an already known file.",
+                           lambda: self._coalesced)
+
+    def _observe(self, stage: str, seconds: float):
+        """
+        Record a duration in the stage histogram of the metrics registry.
+        """
+        self.metrics.histogram('stage_seconds', "Duration of the pipeline stages in seconds.").observe(
+            max(0.0, seconds), stage=stage)
+
+    def _on_file_event(self, file_path: str):
+        """
+        Called on the event loop for every created or moved-in file; starts watching it unless it is already known.
+        """
+        if self._stopping.is_set():
+            return
+        if file_path in self._known:
+            self._coalesced += 1
+            return
+        self._known[file_path] = time.monotonic()
+        task = self._loop.create_task(self._stabilize(file_path))
+        self._stabilizers.add(task)
+        task.add_done_callback(self._stabilizers.discard)
+
+    async def _stabilize(self, file_path: str):
+        """
+        Wait until the file's size and mtime stop changing, then put it into the scoring queue.
+        """
+        loop = asyncio.get_running_loop()
+        self._stabilizing += 1
+        try:
+            previous, unchanged, stat = None, 0, None
+            while unchanged < self.stability_checks:
+                await asyncio.sleep(self.stability_interval)
+                try:
+                    stat = await loop.run_in_executor(self.io_executor, os.stat, file_path)
+                except FileNotFoundError:
+                    logging.warning("File %s disappeared before it was processed", file_path)
+                    self._known.pop(file_path, None)
+                    return
+                signature = (stat.st_size, stat.st_mtime_ns)
+                unchanged = unchanged + 1 if signature == previous else 0
+                previous = signature
+            if stat is not None:
+                self._observe('detect', time.time() - stat.st_mtime)
+            self._observe('stabilize', time.monotonic() - self._known[file_path])
+        finally:
+            self._stabilizing -= 1
+        # Waits while the queue is full, so a burst of files is held back here instead of in memory
+        await self._queue.put((file_path, time.monotonic()))
+
+    async def _score_worker(self):
+        """
+        Take stable files from the queue and process them one at a time.
+        """
+        while True:
+            file_path, enqueued_at = await self._queue.get()
+            self._observe('queue_wait', time.monotonic() - enqueued_at)
+            self._busy += 1
+            try:
+                await self.process_file(file_path)
+            except Exception as e:
+                self.metrics.counter('errors_total', "Input files that failed to process.").inc(mode='live')
+                logging.error("Error processing file %s: %s", file_path, str(e))
+            finally:
+                self._busy -= 1
+                self._known.pop(file_path, None)
+                self._queue.task_done()
+
+    async def _housekeeping(self):
+        """
+        Log the queue state and write the output sink's buffered rows every check_interval seconds.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            logging.info("Async pipeline status: %d queued, %d stabilizing, %d busy, %d coalesced",
+                         self._queue.qsize(), self._stabilizing, self._busy, self._coalesced)
+            await loop.run_in_executor(self.io_executor, self._flush_sink)
+            await loop.run_in_executor(self.io_executor, self._reclaim_stale)
+
+    def _install_signal_handlers(self):
+        """
+        Stop the pipeline on SIGINT and SIGTERM. Where the loop cannot handle signals (Windows),
+        the handlers are installed with the signal module and hand over to the loop.
+        """
+        for signum in (signal.SIGINT, getattr(signal, 'SIGTERM', None)):
+            if signum is None:
+                continue
+            try:
+                self._loop.add_signal_handler(signum, self.stop)
+            except (NotImplementedError, RuntimeError):
+                signal.signal(signum, lambda *_: self.stop())
+
+    async def serve(self):
+        """
+        Run the pipeline on the current event loop until stop is called or SIGINT/SIGTERM is received.
+
+        Files already in the input directory are queued first. On shutdown the intake stops, the
+        queued and running files are finished, and the output sink is flushed and closed.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._stream_order_lock = asyncio.Lock()
+        if threading.current_thread() is threading.main_thread():
+            self._install_signal_handlers()
+
+        def bridge(file_path):
+            self._loop.call_soon_threadsafe(self._on_file_event, file_path)
+
+        event_handler = FileSystemEventHandler()
+        event_handler.on_created = lambda event: event.is_directory or bridge(event.src_path)
+        event_handler.on_moved = lambda event: event.is_directory or bridge(event.dest_path)
+        self.start_metrics()
+        if self.sink is not None and self.compaction_interval and hasattr(self.sink, 'start_compaction'):
+            self.sink.start_compaction(self.compaction_interval)
+        if self.claimer is not None:
+            self.claimer.start()
+        observer = Observer()
+        observer.schedule(event_handler, self.input_dir, recursive=False)
+        observer.start()
+        workers = [asyncio.create_task(self._score_worker()) for _ in range(self.scoring_workers)]
+        housekeeping = asyncio.create_task(self._housekeeping())
+        for file_path in await self._loop.run_in_executor(self.io_executor, self.list_backlog):
+            self._on_file_event(file_path)
+        logging.info("Started listening for new files with an asyncio loop.")
+        try:
+            await self._stopping.wait()
+        finally:
+            logging.info("Stopping: finishing %d queued files", self._queue.qsize())
+            observer.stop()
+            await self._loop.run_in_executor(self.io_executor, observer.join)
+            # Files still being written are left in the input directory for the next start
+            for task in list(self._stabilizers):
+                task.cancel()
+            await self._queue.join()
+            for task in workers + [housekeeping]:
+                task.cancel()
+            await asyncio.gather(*workers, housekeeping, return_exceptions=True)
+            if self.sink is not None:
+                await self._loop.run_in_executor(self.io_executor, self.sink.close)
+            if self.claimer is not None:
+                await self._loop.run_in_executor(self.io_executor, self.claimer.stop)
+            self.stop_metrics()
+            logging.info("Async pipeline stopped.")
+
+    def start_monitoring(self):
+        """
+        start monitoring the input directory for new files on an asyncio event loop, see serve.
+        """
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.io_executor.shutdown()
+            self.cpu_executor.shutdown()
+            self.render_executor.shutdown()
+
+    def stop(self):
+        """
+        Ask serve to stop, from any thread or a signal handler. Queued files are still processed.
+        """
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+# LSP: AsyncProductionPipeline can replace ProductionPipeline; run still drains the backlog and then monitors.
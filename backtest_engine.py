@@ -0,0 +1,271 @@
+import os
+import sys
+import copy
+import json
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Optional, Sequence
+from sensor_cache import SensorCache
+from ingestion import STATUS_COLUMN
+from runtime_stats import peak_rss_mb
+
+# Memory-mapped dataset and forest thread count of a backtest worker process, set by _init_backtest_worker
+_worker_frame = None
+_worker_n_jobs = 1
+
+
+def _init_backtest_worker(cache_dir: str, n_jobs: int):
+    """
+    Map the sensor cache once per backtest worker process.
+
+    The cache files are opened read-only with mmap, so all workers share the page cache
+    of one copy of the feature matrix instead of each receiving a pickled copy.
+
+    Args:
+        cache_dir (str): Directory of the sensor cache.
+        n_jobs (int): Number of threads the forest may use inside this process.
+    """
+    global _worker_frame, _worker_n_jobs
+    _worker_frame = SensorCache(cache_dir).load()
+    _worker_n_jobs = n_jobs
+
+
+def month_folds(index: pd.DatetimeIndex, min_train_months: int = 3, max_train_months: Optional[int] = None) -> List[dict]:
+    """
+    Build rolling-origin folds over the calendar months of a sorted timestamp index.
+
+    Fold k trains on the months up to and including month k and scores month k + 1.
+    The folds are given as row positions, so a worker slices them from the mapped data without copying.
+
+    Args:
+        index (pd.DatetimeIndex): Sorted timestamps of the dataset.
+        min_train_months (int): Number of months in the first fold's training window.
+        max_train_months (Optional[int]): If set, the training window slides and keeps at most this many months;
+            otherwise it grows with every fold.
+
+    Returns:
+        List[dict]: One dict per fold with train_months, test_month, train_start, train_stop and test_stop.
+    """
+    if min_train_months < 1:
+        raise ValueError("At least one training month is required.")
+    months = index.to_period('M')
+    unique = months.unique()
+    starts = np.searchsorted(index.values, unique.to_timestamp().values)
+    stops = np.append(starts[1:], len(index))
+    folds = []
+    for test in range(min_train_months, len(unique)):
+        first = 0 if max_train_months is None else max(0, test - max_train_months)
+        folds.append({
+            'train_months': [str(month) for month in unique[first:test]],
+            'test_month': str(unique[test]),
+            'train_start': int(starts[first]),
+            'train_stop': int(starts[test]),
+            'test_stop': int(stops[test]),
+        })
+    return folds
+
+
+def _run_fold(config_id: int, params: dict, fold: dict, feature_engine=None, feature_selector=None) -> dict:
+    """
+    Train and score one configuration on one fold inside a worker process.
+
+    A feature selector is cloned and fitted on the fold's training rows only, so no fold chooses
+    its columns with knowledge of the month it is scored on.
+
+    Returns:
+        dict: Configuration, fold, rows, timings in seconds, the selected columns if a selector is given,
+        and the metrics of the scored month.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.metrics import accuracy_score, f1_score, precision_recall_fscore_support
+
+    timings = {}
+    start = time.perf_counter()
+    train = _worker_frame.iloc[fold['train_start']:fold['train_stop']]
+    test = _worker_frame.iloc[fold['train_stop']:fold['test_stop']]
+    X_train = train.drop(columns=[STATUS_COLUMN])
+    X_test = test.drop(columns=[STATUS_COLUMN])
+    selected = None
+    if feature_selector is not None:
+        selector = copy.deepcopy(feature_selector).fit(X_train, train[STATUS_COLUMN])
+        selected = list(selector.selected_)
+        X_train = X_train[selected]
+        X_test = X_test[selected]
+    if feature_engine is not None:
+        # Both blocks are continuous, so no stream state is needed
+        X_train = feature_engine.transform(X_train)
+        X_test = feature_engine.transform(X_test)
+    y_train = train[STATUS_COLUMN].astype(str).to_numpy()
+    y_test = test[STATUS_COLUMN].astype(str).to_numpy()
+    timings['features'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train)
+    X_test = scaler.transform(X_test)
+    timings['scale'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = RandomForestClassifier(**{'random_state': 42, 'n_jobs': _worker_n_jobs, **params})
+    model.fit(X_train, y_train)
+    timings['fit'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictions = model.predict(X_test)
+    timings['predict'] = time.perf_counter() - start
+
+    labels = sorted(set(y_train) | set(y_test))
+    precision, recall, f1, support = precision_recall_fscore_support(y_test, predictions, labels=labels,
+                                                                     zero_division=0)
+    return {
+        'config_id': config_id,
+        'params': params,
+        'train_months': fold['train_months'],
+        'test_month': fold['test_month'],
+        'selected_features': selected,
+        'train_rows': len(y_train),
+        'test_rows': len(y_test),
+        'accuracy': accuracy_score(y_test, predictions),
+        'macro_f1': f1_score(y_test, predictions, labels=labels, average='macro', zero_division=0),
+        'per_class': {label: {'precision': p, 'recall': r, 'f1': f, 'support': int(s)}
+                      for label, p, r, f, s in zip(labels, precision, recall, f1, support)},
+        'timings': timings,
+        'worker_pid': os.getpid(),
+        'worker_peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_backtest(cache_dir: str, configurations: Sequence[dict] = ({},), min_train_months: int = 3,
+                 max_train_months: Optional[int] = None, workers: Optional[int] = None,
+                 feature_engine=None, feature_selector=None) -> dict:
+    """
+    Run every configuration on every rolling-origin fold of the cached dataset in a process pool.
+
+    The pool is sized to the cores (or workers) and the forest's n_jobs is set so that processes
+    times threads does not exceed the cores, as in ProductionPipeline.drain_backlog.
+
+    Args:
+        cache_dir (str): Directory of a complete sensor cache.
+        configurations (Sequence[dict]): RandomForestClassifier parameters per configuration; {} uses the defaults.
+        min_train_months (int): Number of months in the first fold's training window.
+        max_train_months (Optional[int]): Largest training window in months; None lets it grow.
+        workers (Optional[int]): Number of worker processes; None uses all cores.
+        feature_engine (RollingFeatureEngine): Optional rolling-window feature stage applied to both blocks of a fold.
+        feature_selector (FeatureSelector): Optional column selection, fitted anew on every fold's training rows.
+
+    Returns:
+        dict: created, seconds, the folds, one result per configuration and fold (see _run_fold), and a
+        summary per configuration with the mean accuracy, mean macro F1 and total fit seconds.
+    """
+    index = SensorCache(cache_dir).load().index
+    folds = month_folds(index, min_train_months, max_train_months)
+    if not folds:
+        raise ValueError(f"The dataset spans fewer than {min_train_months + 1} months; there is nothing to backtest.")
+    tasks = [(config_id, dict(params), fold) for config_id, params in enumerate(configurations) for fold in folds]
+    cores = os.cpu_count() or 1
+    workers = min(workers or cores, len(tasks))
+    n_jobs = max(1, cores // workers)
+    logging.info("Backtesting %d configurations on %d folds with %d processes", len(configurations), len(folds),
+                 workers)
+
+    start = time.perf_counter()
+    results, errors = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_backtest_worker,
+                             initargs=(cache_dir, n_jobs)) as pool:
+        futures = {pool.submit(_run_fold, config_id, params, fold, feature_engine,
+                               feature_selector): (config_id, fold['test_month'])
+                   for config_id, params, fold in tasks}
+        for future in as_completed(futures):
+            config_id, test_month = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error("Backtest of configuration %d on %s failed: %s", config_id, test_month, e)
+                errors.append({'config_id': config_id, 'test_month': test_month, 'error': str(e)})
+                continue
+            logging.info("Configuration %d on %s: accuracy %.4f, macro F1 %.4f, fit %.1f s", config_id, test_month,
+                         result['accuracy'], result['macro_f1'], result['timings']['fit'])
+            results.append(result)
+    results.sort(key=lambda result: (result['config_id'], result['test_month']))
+
+    summary = []
+    for config_id, params in enumerate(configurations):
+        own = [result for result in results if result['config_id'] == config_id]
+        summary.append({
+            'config_id': config_id,
+            'params': dict(params),
+            'folds': len(own),
+            'mean_accuracy': float(np.mean([result['accuracy'] for result in own])) if own else None,
+            'mean_macro_f1': float(np.mean([result['macro_f1'] for result in own])) if own else None,
+            'fit_seconds': sum(result['timings']['fit'] for result in own),
+        })
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'seconds': time.perf_counter() - start,
+        'workers': workers,
+        'folds': folds,
+        'results': results,
+        'errors': errors,
+        'summary': summary,
+    }
+
+
+def print_report(report: dict):
+    """
+    Print one line per configuration and fold, followed by the per-configuration summary.
+
+    Args:
+        report (dict): Result of run_backtest.
+    """
+    print(f"{'config':>6} {'test month':<10} {'train rows':>10} {'test rows':>9} {'accuracy':>8} {'macro F1':>8} "
+          f"{'fit s':>7} {'predict s':>9}")
+    for result in report['results']:
+        print(f"{result['config_id']:>6} {result['test_month']:<10} {result['train_rows']:>10} "
+              f"{result['test_rows']:>9} {result['accuracy']:>8.4f} {result['macro_f1']:>8.4f} "
+              f"{result['timings']['fit']:>7.1f} {result['timings']['predict']:>9.2f}")
+    for entry in report['summary']:
+        if entry['folds']:
+            print(f"configuration {entry['config_id']} {entry['params']}: mean accuracy {entry['mean_accuracy']:.4f}, "
+                  f"mean macro F1 {entry['mean_macro_f1']:.4f} over {entry['folds']} folds")
+    for error in report['errors']:
+        print(f"configuration {error['config_id']} on {error['test_month']} failed: {error['error']}")
+    print(f"Backtest finished in {report['seconds']:.1f} s with {report['workers']} processes")
+
+
+def main(argv=None):
+    """
+    Command line entry point: backtest one or more forest configurations on the cached dataset.
+    """
+    parser = argparse.ArgumentParser(description="Backtest forest configurations on rolling monthly folds.")
+    parser.add_argument('--data', help="Sensor CSV file; the cache is built from it if needed.")
+    parser.add_argument('--data-dir', default='.', help="Directory holding the sensor_cache directory.")
+    parser.add_argument('--configs', help="JSON file with a list of RandomForestClassifier parameter dicts.")
+    parser.add_argument('--min-train-months', type=int, default=3, help="Months in the first training window.")
+    parser.add_argument('--max-train-months', type=int, help="Slide the training window at this many months.")
+    parser.add_argument('--workers', type=int, help="Number of worker processes; all cores by default.")
+    parser.add_argument('--output', default='backtest_results.json', help="Where to write the JSON results.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    configurations = [{}]
+    if args.configs:
+        with open(args.configs) as file:
+            configurations = json.load(file)
+    cache_dir = os.path.join(args.data_dir, 'sensor_cache')
+    if args.data:
+        SensorCache(cache_dir).load(args.data)
+    report = run_backtest(cache_dir, configurations, args.min_train_months, args.max_train_months, args.workers)
+    print_report(report)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2, default=float)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
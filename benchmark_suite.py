@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime
+from typing import Callable, List, Sequence
+from synthetic_data import write_sensor_csv
+from runtime_stats import peak_rss_mb
+
+
+def _timed(results: dict, name: str, function: Callable, *args, **kwargs):
+    """
+    Call function, store its wall-clock duration in results[name] and return its result.
+    """
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    results[name] = time.perf_counter() - start
+    return value
+
+
+def _wait_for(pending: Callable[[], List[str]], timeout: float, interval: float):
+    """
+    Poll until pending returns nothing, so a pipeline that stops processing fails the benchmark instead of hanging it.
+
+    Args:
+        pending (Callable[[], List[str]]): Returns the files still waited for.
+        timeout (float): Seconds to wait before giving up.
+        interval (float): Seconds between two polls.
+
+    Raises:
+        TimeoutError: If files are still pending after timeout seconds; the message lists them.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        waiting = pending()
+        if not waiting:
+            return
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Still waiting after {timeout:.0f} s for: {', '.join(sorted(waiting))}")
+        time.sleep(interval)
+
+
+def _environment() -> dict:
+    """
+    Describe the machine and library versions the benchmark ran with.
+    """
+    import numpy
+    import pandas
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def measure_file_drop_latency(work_dir: str, model_path: str, source_csv: str, drops: int = 3,
+                              timeout: float = 300.0) -> List[float]:
+    """
+    Measure the time from a file landing in the input directory until its predictions are written.
+
+    A ProductionPipeline monitors a temporary input directory. Each file is moved in atomically and
+    the latency is measured until the input file has been processed and removed.
+
+    Args:
+        work_dir (str): Directory for the pipeline's input, output and image directories.
+        model_path (str): Path to the model bundle.
+        source_csv (str): CSV file that is dropped into the input directory.
+        drops (int): Number of files dropped one after the other.
+        timeout (float): Seconds to wait for each dropped file.
+
+    Returns:
+        List[float]: Latency per dropped file in seconds.
+
+    Raises:
+        TimeoutError: If a dropped file is not processed within timeout seconds.
+    """
+    from production_pipeline import ProductionPipeline
+
+    directories = {name: os.path.join(work_dir, name) for name in ('input', 'output', 'img', 'staging')}
+    for directory in directories.values():
+        os.makedirs(directory, exist_ok=True)
+    config_path = os.path.join(work_dir, 'application.json')
+    with open(config_path, 'w') as file:
+        json.dump({'input_directory': directories['input'], 'output_directory': directories['output'],
+                   'img_directory': directories['img'], 'sensors_to_plot': ['sensor_04'], 'check_interval': 1,
+                   'model_path': model_path, 'stability_interval': 0.05, 'stability_checks': 2}, file)
+
+    pipeline = ProductionPipeline(config_path)
+    monitor = threading.Thread(target=pipeline.start_monitoring, daemon=True)
+    monitor.start()
+    time.sleep(1.0)  # let the observer start
+    latencies = []
+    try:
+        for drop in range(drops):
+            staged = shutil.copy(source_csv, os.path.join(directories['staging'], f'drop_{drop}.csv'))
+            target = os.path.join(directories['input'], os.path.basename(staged))
+            output = os.path.join(directories['output'], os.path.basename(staged))
+            start = time.perf_counter()
+            os.replace(staged, target)
+            _wait_for(lambda: [path for path, waiting in ((target, os.path.exists(target)),
+                                                          (output, not os.path.exists(output))) if waiting],
+                      timeout, 0.005)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        pipeline.stop()
+        monitor.join()
+    return latencies
+
+
+def _run_instance(config_path: str, stop):
+    """
+    Run one ProductionPipeline until stop is set; the target of the processes of measure_multi_instance.
+    """
+    from production_pipeline import ProductionPipeline
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    pipeline = ProductionPipeline(config_path)
+    threading.Thread(target=lambda: (stop.wait(), pipeline.stop()), daemon=True).start()
+    pipeline.start_monitoring()
+
+
+def measure_multi_instance(work_dir: str, model_path: str, source_csv: str, instances: Sequence[int] = (1, 2, 4),
+                           files: int = 40, timeout: float = 600.0) -> List[dict]:
+    """
+    Measure the throughput of several ProductionPipeline processes sharing one input directory.
+
+    For every instance count, that many processes monitor the same input directory with claim_files
+    enabled, files copies of source_csv are moved in at once, and the time until all of them have
+    been scored and removed is measured. Every file must produce exactly one predictions file.
+
+    Args:
+        work_dir (str): Directory for the shared input, output and image directories.
+        model_path (str): Path to the model bundle.
+        source_csv (str): CSV file that is copied into the input directory.
+        instances (Sequence[int]): Numbers of pipeline processes to measure.
+        files (int): Number of files dropped per measurement.
+        timeout (float): Seconds to wait for all files of one measurement.
+
+    Returns:
+        List[dict]: instances, files, seconds and files_per_second per instance count.
+
+    Raises:
+        TimeoutError: If files are still unprocessed after timeout seconds.
+    """
+    import multiprocessing
+
+    results = []
+    for count in instances:
+        run_dir = os.path.join(work_dir, f'instances_{count}')
+        directories = {name: os.path.join(run_dir, name) for name in ('input', 'output', 'img', 'staging')}
+        for directory in directories.values():
+            os.makedirs(directory, exist_ok=True)
+        config_path = os.path.join(run_dir, 'application.json')
+        with open(config_path, 'w') as file:
+            json.dump({'input_directory': directories['input'], 'output_directory': directories['output'],
+                       'img_directory': directories['img'], 'check_interval': 1, 'model_path': model_path,
+                       'stability_interval': 0.05, 'stability_checks': 2, 'scoring_workers': 1,
+                       'claim_files': True, 'lease_timeout': 30}, file)
+        stop = multiprocessing.Event()
+        processes = [multiprocessing.Process(target=_run_instance, args=(config_path, stop)) for _ in range(count)]
+        for process in processes:
+            process.start()
+        time.sleep(2.0)  # let the observers start
+        staged = [shutil.copy(source_csv, os.path.join(directories['staging'], f'drop_{i}.csv')) for i in range(files)]
+        start = time.perf_counter()
+        for path in staged:
+            os.replace(path, os.path.join(directories['input'], os.path.basename(path)))
+        names = [os.path.basename(path) for path in staged]
+
+        def pending():
+            written = set(os.listdir(directories['output']))
+            return [name for name in names
+                    if os.path.exists(os.path.join(directories['input'], name)) or name not in written]
+
+        try:
+            _wait_for(pending, timeout, 0.01)
+            seconds = time.perf_counter() - start
+        finally:
+            stop.set()
+            for process in processes:
+                process.join()
+        results.append({'instances': count, 'files': files, 'seconds': seconds, 'files_per_second': files / seconds})
+        print(f"{count} instances: {files} files in {seconds:.2f} s ({files / seconds:.1f} files/s)")
+    return results
+
+
+def run_benchmarks(sizes: Sequence[int] = (10_000, 50_000), seed: int = 0, work_dir: str = None,
+                   drops: int = 3) -> dict:
+    """
+    Time the ModelPipeline stages and the end-to-end file-drop latency on synthetic data of several sizes.
+
+    Args:
+        sizes (Sequence[int]): Numbers of rows of the generated datasets.
+        seed (int): Seed of the synthetic data generator.
+        work_dir (str): Directory for the generated files; a temporary directory if None.
+        drops (int): Number of files dropped to measure the file-drop latency.
+
+    Returns:
+        dict: Environment description and one result dict per size, with durations in seconds.
+    """
+    from pipeline_model import ModelPipeline
+
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='pipeline_benchmark_')
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'seed': seed,
+              'environment': _environment(), 'results': []}
+    try:
+        for size in sizes:
+            size_dir = os.path.join(work_dir, f'rows_{size}')
+            os.makedirs(size_dir, exist_ok=True)
+            data_path = os.path.join(size_dir, 'sensor.csv')
+            model_path = os.path.join(size_dir, 'model.pkl')
+            timings = {}
+            _timed(timings, 'generate', write_sensor_csv, data_path, size, seed=seed)
+
+            pipeline = ModelPipeline(model_path=model_path, data_dir=size_dir)
+            _timed(timings, 'load_data_cold', pipeline.load_data, data_path)
+            _timed(timings, 'load_data_cached', pipeline.load_data, data_path)
+            _timed(timings, 'split_data', pipeline.split_data)
+            _timed(timings, 'transform_data', pipeline.transform_data)
+            _timed(timings, 'train_model', pipeline.train_model)
+
+            scorer = ModelPipeline(model_path=model_path, data_dir=size_dir)
+            _timed(timings, 'process_new_data', scorer.process_new_data, data_path)
+            _timed(timings, 'plot_sensor_anomalies', scorer.plot_sensor_anomalies, pipeline.train_df, 'sensor_04')
+            latencies = measure_file_drop_latency(os.path.join(size_dir, 'production'), model_path, data_path, drops)
+
+            result = {
+                'rows': size,
+                'train_rows': len(pipeline.train_df),
+                'timings': timings,
+                'process_new_data_rows_per_second': size / timings['process_new_data'],
+                'file_drop_latency': latencies,
+                'peak_rss_mb': peak_rss_mb(),
+            }
+            report['results'].append(result)
+            print(f"{size:>9} rows: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items())
+                  + f", file drop {min(latencies):.3f}s")
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def compare(baseline_path: str, candidate_path: str):
+    """
+    Print the ratio candidate / baseline of every timing found in both result files.
+
+    Args:
+        baseline_path (str): JSON results of the reference run.
+        candidate_path (str): JSON results of the run to compare.
+    """
+    with open(baseline_path) as file:
+        baseline = {result['rows']: result for result in json.load(file)['results']}
+    with open(candidate_path) as file:
+        candidate = {result['rows']: result for result in json.load(file)['results']}
+    print(f"{'rows':>9} {'stage':<24} {'baseline s':>11} {'candidate s':>12} {'ratio':>7}")
+    for rows in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[rows]['timings'], candidate[rows]['timings']
+        old['file_drop_latency'] = min(baseline[rows]['file_drop_latency'])
+        new['file_drop_latency'] = min(candidate[rows]['file_drop_latency'])
+        for stage in old:
+            if stage in new:
+                print(f"{rows:>9} {stage:<24} {old[stage]:>11.3f} {new[stage]:>12.3f} {new[stage] / old[stage]:>7.2f}")
+
+
+def main(argv=None):
+    """
+    Command line entry point: run the benchmarks and save them as JSON, or compare two result files.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic pump-sensor data.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000], help="Dataset sizes in rows.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data generator.")
+    parser.add_argument('--drops', type=int, default=3, help="Files dropped to measure the file-drop latency.")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results.")
+    parser.add_argument('--instances', type=int, nargs='+', metavar='N',
+                        help="Measure the throughput of N pipeline processes sharing one input directory instead, "
+                             "using a model trained on the smallest size.")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help="Compare two result files instead of running the benchmarks.")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    if args.instances:
+        from pipeline_model import ModelPipeline
+
+        work_dir = tempfile.mkdtemp(prefix='pipeline_instances_')
+        try:
+            data_path = os.path.join(work_dir, 'sensor.csv')
+            model_path = os.path.join(work_dir, 'model.pkl')
+            write_sensor_csv(data_path, min(args.sizes), seed=args.seed)
+            pipeline = ModelPipeline(model_path=model_path, data_dir=work_dir)
+            pipeline.load_data(data_path)
+            pipeline.split_data()
+            pipeline.transform_data()
+            pipeline.train_model()
+            report = {'environment': _environment(),
+                      'multi_instance': measure_multi_instance(work_dir, model_path, data_path, args.instances)}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results saved to {args.output}")
+        return
+    report = run_benchmarks(args.sizes, seed=args.seed, drops=args.drops)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,38 @@
 import os
-import requests
 import json
 import zipfile
+import logging
+from download_engine import RangedDownloader
+from sensor_cache import SensorCache
 
 class DatasetDownloader:
-    def __init__(self, credentials_file, api_url, destination_folder):
+    def __init__(self, credentials_file, api_url, destination_folder, segments=8, workers=8, checksum=None):
         """
         Initialize the DatasetDownloader with necessary parameters.
 
         :param credentials_file: Path to the file containing Kaggle API credentials (in JSON format).
         :param api_url: URL of the Kaggle API endpoint to download the dataset from.
         :param destination_folder: Directory where the dataset will be saved and extracted.
+        :param segments: Number of HTTP Range segments the archive is split into.
+        :param workers: Number of segments downloaded at the same time.
+        :param checksum: Optional expected checksum of the archive, 'sha256:<hex>' or 'md5:<hex>'.
         """
         self.credentials_file = credentials_file
         self.api_url = api_url
         self.destination_folder = destination_folder
+        self.segments = segments
+        self.workers = workers
+        self.checksum = checksum
 
     def download_dataset(self):
         """
         Download the dataset from Kaggle and extract it into the destination folder.
 
-        This method reads Kaggle API credentials, sends a request to the API to download the dataset,
-        saves the dataset to a zip file, and then extracts the contents of the zip file.
+        This method reads Kaggle API credentials, downloads the dataset as concurrent Range
+        segments into a zip file, and then extracts the contents of the zip file. An interrupted
+        download is resumed from its sidecar state file on the next call.
+
+        :returns: Download statistics of RangedDownloader.download.
         """
         # **Single Responsibility Principle (SRP):**
         # The class is responsible solely for downloading and extracting datasets.
@@ -29,34 +40,25 @@ class DatasetDownloader:
         # adhering to SRP by not mixing in other responsibilities.
 
         # reading the Kaggle credentials from the provided file
-        with open(self.credentials_file, 'r') as file:
-            kaggle_credentials = json.load(file)
-
-        headers = {
-            'Authorization': f"Bearer {kaggle_credentials['key']}"
-        }
+        headers = self._auth_headers()
         
         # **Encapsulation:**
         # The class encapsulates the details of making the API request,
         # handling the response, saving the zip file, and extracting it.
         # Users of the class interact with a high-level method without needing to know these details.
 
-        # Send a request to download the dataset
-        response = requests.get(self.api_url, headers=headers, stream=True)
-        response.raise_for_status()  # Raise an error if the request failed
-
         # Define the path to save the downloaded dataset
         dataset_zip = os.path.join(self.destination_folder, 'dataset.zip')
-        
-        # Save the dataset to a zip file
-        with open(dataset_zip, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+
+        # Download the dataset in parallel Range segments, resuming a previous partial download
+        downloader = RangedDownloader(self.api_url, headers=headers, segments=self.segments, workers=self.workers,
+                                      checksum=self.checksum)
+        stats = downloader.download(dataset_zip)
 
         # **Error Handling:**
-        # Proper error handling is done with `response.raise_for_status()` to ensure that
-        # any issues with the request are caught early, preventing further processing
-        # of an invalid response.
+        # Failed requests raise after their retries and keep the progress for the next attempt;
+        # a checksum mismatch raises and discards the partial file, preventing further processing
+        # of an invalid download.
 
         # Unzip the downloaded dataset
         with zipfile.ZipFile(dataset_zip, 'r') as zip_ref:
@@ -67,6 +69,66 @@ class DatasetDownloader:
         # easier. Each part of the code has a clear purpose and is easy to follow.
 
         print("Dataset downloaded and extracted.")
+        return stats
+
+    def stream_to_cache(self, cache_dir, member=None):
+        """
+        Fill the sensor cache straight from the remote archive, skipping datasets that did not change.
+
+        The ETag and Last-Modified of the archive are compared with those the cache was built from;
+        if they match, nothing is downloaded. Otherwise the archive is read with HTTP Range requests
+        and the CSV member is decompressed straight into SensorCache.build, so neither the zip nor
+        the extracted CSV is written to disk. zipfile checks the CRC-32 of the member while reading.
+        Servers without Range support fall back to download_dataset's zip, which is still read
+        without extracting it.
+
+        :param cache_dir: Directory of the SensorCache, e.g. ModelPipeline.cache_dir.
+        :param member: Name of the CSV member in the archive; the only .csv member if None.
+        :returns: dict with changed (False if the cache was kept) and the archive's etag and last_modified.
+        """
+        downloader = RangedDownloader(self.api_url, headers=self._auth_headers(), segments=self.segments,
+                                      workers=self.workers)
+        remote = downloader.probe()
+        cache = SensorCache(cache_dir)
+        source_info = {'url': self.api_url, 'etag': remote['etag'], 'last_modified': remote['last_modified'],
+                       'size': remote['size'], 'member': member}
+        result = {'changed': True, 'etag': remote['etag'], 'last_modified': remote['last_modified']}
+        # Without any validator the remote file cannot be compared, so it is always rebuilt
+        if (remote['etag'] or remote['last_modified']) and cache.matches_source(source_info):
+            logging.info("Dataset at %s is unchanged, keeping the sensor cache %s", self.api_url, cache_dir)
+            print("Dataset unchanged, download skipped.")
+            result['changed'] = False
+            return result
+
+        if remote['ranged']:
+            archive = downloader.open(remote)
+        else:
+            logging.info("%s does not serve byte ranges, reading the downloaded zip instead", self.api_url)
+            os.makedirs(self.destination_folder, exist_ok=True)
+            dataset_zip = os.path.join(self.destination_folder, 'dataset.zip')
+            downloader.download(dataset_zip)
+            archive = open(dataset_zip, 'rb')
+        with archive, zipfile.ZipFile(archive) as zip_ref:
+            if member is None:
+                members = [name for name in zip_ref.namelist() if name.lower().endswith('.csv')]
+                if len(members) != 1:
+                    raise ValueError(f"Expected exactly one CSV file in the archive, found {members}; "
+                                     f"please pass the member to use")
+                member = members[0]
+            with zip_ref.open(member) as csv_file:
+                cache.build(csv_file, source_info)
+        print("Dataset streamed into the sensor cache.")
+        return result
+
+    def _auth_headers(self):
+        """
+        Read the Kaggle credentials and return the authorization headers for the API.
+        """
+        with open(self.credentials_file, 'r') as file:
+            kaggle_credentials = json.load(file)
+        return {
+            'Authorization': f"Bearer {kaggle_credentials['key']}"
+        }
         
         
 #  #Single Responsibility Principle (SRP): The DatasetDownloader class is solely responsible for downloading and extracting datasets. This ensures that the class has one reason to change, adhering to SRP.
@@ -0,0 +1,389 @@
+import io
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+# Bytes read from the socket and written to disk at a time
+BUFFER_SIZE = 1024 * 1024
+
+# Progress is written to the state file at most once per this many bytes per segment
+STATE_SAVE_BYTES = 8 * 1024 * 1024
+
+
+class RangedDownloader:
+    """
+    Downloads one file as concurrent HTTP Range segments over a pooled session, resumably.
+
+    The size, ETag and Range support of the file are probed first. The file is then split into
+    segments fetched concurrently into a preallocated <destination>.part file. The progress of
+    every segment is kept in a <destination>.part.json sidecar, so a later call resumes where an
+    interrupted one stopped, as long as the remote file did not change. Servers without Range
+    support are downloaded as a single stream. At the end the file is verified against the given
+    checksum or, if none is given, against the MD5 the server advertises (Content-MD5 or
+    X-Goog-Hash), and renamed to its destination.
+
+    Attributes:
+        url (str): URL of the file.
+        headers (dict): Headers sent with every request, e.g. authorization.
+        segments (int): Number of Range segments the file is split into.
+        workers (int): Number of segments fetched at the same time.
+        checksum (Optional[str]): Expected checksum as 'sha256:<hex>' or 'md5:<hex>'.
+        retries (int): Consecutive attempts without progress per segment before the download fails.
+        timeout (float): Connect and read timeout of every request in seconds.
+    """
+    def __init__(self, url: str, headers: Optional[dict] = None, segments: int = 8, workers: int = 8,
+                 checksum: Optional[str] = None, retries: int = 5, timeout: float = 60.0,
+                 session: Optional[requests.Session] = None):
+        """
+        initializes the downloader.
+
+        Args:
+            url (str): URL of the file.
+            headers (Optional[dict]): Headers sent with every request, e.g. authorization.
+            segments (int): Number of Range segments the file is split into.
+            workers (int): Number of segments fetched at the same time.
+            checksum (Optional[str]): Expected checksum as 'sha256:<hex>' or 'md5:<hex>'.
+            retries (int): Consecutive attempts without progress per segment before the download fails.
+            timeout (float): Connect and read timeout of every request in seconds.
+            session (Optional[requests.Session]): Session to use; a pooled one is created if None.
+        """
+        if checksum is not None and checksum.split(':', 1)[0] not in ('sha256', 'md5'):
+            raise ValueError(f"Unsupported checksum {checksum}, expected 'sha256:<hex>' or 'md5:<hex>'")
+        self.url = url
+        self.headers = dict(headers or {})
+        self.segments = max(1, segments)
+        self.workers = max(1, workers)
+        self.checksum = checksum
+        self.retries = retries
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self._state_lock = threading.Lock()
+
+    def probe(self) -> dict:
+        """
+        Find the final URL after redirects, the size, the ETag and whether byte ranges are served.
+
+        Returns:
+            dict: url (after redirects), size, ranged, etag, last_modified and advertised_md5.
+        """
+        response = self.session.get(self.url, headers={**self.headers, 'Range': 'bytes=0-0'}, stream=True,
+                                    timeout=self.timeout, allow_redirects=True)
+        try:
+            response.raise_for_status()
+            headers = response.headers
+            size = None
+            ranged = response.status_code == 206
+            if ranged and '/' in headers.get('Content-Range', ''):
+                total = headers['Content-Range'].rsplit('/', 1)[1]
+                size = int(total) if total.isdigit() else None
+            elif 'Content-Length' in headers and headers.get('Content-Encoding', 'identity') == 'identity':
+                size = int(headers['Content-Length'])
+            return {
+                'url': response.url,
+                'size': size,
+                'ranged': ranged and size is not None,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'advertised_md5': self._advertised_md5(headers),
+            }
+        finally:
+            response.close()
+
+    @staticmethod
+    def _advertised_md5(headers) -> Optional[str]:
+        """
+        Return the MD5 of the whole file the server advertises, as hex, if any.
+        """
+        values = [headers.get('Content-MD5')]
+        values += [part.strip()[4:] for part in headers.get('X-Goog-Hash', '').split(',')
+                   if part.strip().startswith('md5=')]
+        for value in values:
+            if value:
+                try:
+                    return base64.b64decode(value).hex()
+                except ValueError:
+                    continue
+        return None
+
+    def _request_headers(self, url: str) -> dict:
+        """
+        Headers for requests to url. Credentials are only sent to the host they were given for,
+        like requests does on redirects; signed storage URLs reject them.
+        """
+        if urlparse(url).netloc == urlparse(self.url).netloc:
+            return dict(self.headers)
+        return {name: value for name, value in self.headers.items() if name.lower() != 'authorization'}
+
+    def _save_state(self, state_path: str, state: dict):
+        """
+        Write the sidecar state atomically.
+        """
+        with self._state_lock:
+            tmp_path = f"{state_path}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(state, file)
+            os.replace(tmp_path, state_path)
+
+    def _load_state(self, state_path: str, part_path: str, remote: dict) -> Optional[dict]:
+        """
+        Return the saved state if it belongs to the same remote file and the partial file still exists.
+        """
+        try:
+            with open(state_path) as file:
+                state = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        same_file = (state.get('size') == remote['size'] and state.get('etag') == remote['etag']
+                     and state.get('last_modified') == remote['last_modified'])
+        if not same_file or not os.path.exists(part_path) or os.path.getsize(part_path) != remote['size']:
+            logging.info("Discarding download state %s: the remote file changed or the partial file is gone",
+                         state_path)
+            return None
+        return state
+
+    def _fetch_segment(self, url: str, part_path: str, state_path: str, state: dict, index: int):
+        """
+        Fetch the missing bytes of one segment, retrying from the last written byte on errors.
+        """
+        segment = state['segments'][index]
+        attempt = 0
+        while segment['done'] < segment['end'] - segment['start'] + 1:
+            position = segment['start'] + segment['done']
+            done_before = segment['done']
+            headers = {**self._request_headers(url), 'Range': f"bytes={position}-{segment['end']}"}
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise requests.HTTPError(f"Expected 206 Partial Content, got {response.status_code}",
+                                                 response=response)
+                    unsaved = 0
+                    # Unbuffered, so every byte counted as done has reached the OS when any thread saves the state
+                    with open(part_path, 'r+b', buffering=0) as file:
+                        file.seek(position)
+                        for chunk in response.iter_content(chunk_size=BUFFER_SIZE):
+                            view = memoryview(chunk)
+                            while view:
+                                view = view[file.write(view):]
+                            segment['done'] += len(chunk)
+                            unsaved += len(chunk)
+                            if unsaved >= STATE_SAVE_BYTES:
+                                self._save_state(state_path, state)
+                                unsaved = 0
+                self._save_state(state_path, state)
+                if segment['done'] == done_before:
+                    # e.g. an empty 206 body; counted and backed off like any other attempt without progress
+                    raise requests.RequestException(f"Range request for bytes {position}-{segment['end']} "
+                                                    f"returned no data")
+            except (requests.RequestException, OSError) as e:
+                # Only consecutive attempts without progress count against the retries
+                attempt = 1 if segment['done'] > done_before else attempt + 1
+                if attempt >= self.retries:
+                    self._save_state(state_path, state)
+                    raise
+                delay = min(30.0, 2 ** attempt)
+                logging.warning("Segment %d failed at byte %d (%s), retrying in %.0f s", index, position, e, delay)
+                time.sleep(delay)
+
+    def _fetch_stream(self, url: str, part_path: str):
+        """
+        Fetch the whole file as one stream, for servers without Range support.
+        """
+        with self.session.get(url, headers=self._request_headers(url), stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with open(part_path, 'wb') as file:
+                for chunk in response.iter_content(chunk_size=BUFFER_SIZE):
+                    file.write(chunk)
+
+    def _verify(self, part_path: str, remote: dict):
+        """
+        Compare the downloaded file with the expected or advertised checksum.
+
+        Raises:
+            ValueError: If the checksum does not match.
+        """
+        if self.checksum is not None:
+            algorithm, expected = self.checksum.split(':', 1)
+        elif remote['advertised_md5'] is not None:
+            algorithm, expected = 'md5', remote['advertised_md5']
+        else:
+            logging.warning("No checksum given or advertised for %s, skipping verification", self.url)
+            return
+        digest = hashlib.new(algorithm)
+        with open(part_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(BUFFER_SIZE), b''):
+                digest.update(chunk)
+        if digest.hexdigest() != expected.lower():
+            raise ValueError(f"Checksum mismatch for {self.url}: expected {algorithm} {expected}, "
+                             f"got {digest.hexdigest()}")
+
+    def download(self, destination: str) -> dict:
+        """
+        Download the file to destination, resuming a previous interrupted download if possible.
+
+        Args:
+            destination (str): Path the complete file is written to.
+
+        Returns:
+            dict: bytes, seconds, resumed_bytes (bytes already present from an earlier attempt),
+            segments, etag and last_modified.
+
+        Raises:
+            requests.RequestException: If a segment still fails after all retries; the progress is kept.
+            ValueError: If the checksum does not match; the partial file is removed.
+        """
+        part_path = f"{destination}.part"
+        state_path = f"{part_path}.json"
+        start = time.perf_counter()
+        remote = self.probe()
+        url = remote['url']
+        resumed = 0
+        if remote['ranged'] and remote['size'] > 0:
+            state = self._load_state(state_path, part_path, remote)
+            if state is None:
+                size = remote['size']
+                count = min(self.segments, size)
+                bounds = [size * i // count for i in range(count + 1)]
+                state = {'url': self.url, 'size': size, 'etag': remote['etag'],
+                         'last_modified': remote['last_modified'],
+                         'segments': [{'start': bounds[i], 'end': bounds[i + 1] - 1, 'done': 0} for i in range(count)]}
+                with open(part_path, 'wb') as file:
+                    file.truncate(size)
+                self._save_state(state_path, state)
+            else:
+                resumed = sum(segment['done'] for segment in state['segments'])
+                logging.info("Resuming download of %s with %d of %d bytes present", self.url, resumed, state['size'])
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self._fetch_segment, url, part_path, state_path, state, index)
+                           for index in range(len(state['segments']))]
+                for future in futures:
+                    future.result()
+        else:
+            logging.info("%s does not serve byte ranges, downloading it as one stream", self.url)
+            self._fetch_stream(url, part_path)
+
+        try:
+            self._verify(part_path, remote)
+        except ValueError:
+            for path in (part_path, state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        os.replace(part_path, destination)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        size = os.path.getsize(destination)
+        seconds = time.perf_counter() - start
+        logging.info("Downloaded %s (%d bytes, %d resumed) in %.1f s", self.url, size, resumed, seconds)
+        return {'bytes': size, 'seconds': seconds, 'resumed_bytes': resumed,
+                'segments': self.segments if remote['ranged'] else 1,
+                'etag': remote['etag'], 'last_modified': remote['last_modified']}
+
+    def open(self, remote: Optional[dict] = None, buffer_size: int = 8 * BUFFER_SIZE) -> io.BufferedReader:
+        """
+        Open the remote file as a seekable, buffered binary stream served by Range requests.
+
+        Nothing is written to disk; every buffer refill is one Range request of buffer_size bytes.
+        This lets zipfile read a member straight out of a remote archive.
+
+        Args:
+            remote (Optional[dict]): Result of probe; probed now if None.
+            buffer_size (int): Bytes fetched per request.
+
+        Returns:
+            io.BufferedReader: The stream.
+
+        Raises:
+            ValueError: If the server does not serve byte ranges.
+        """
+        remote = remote or self.probe()
+        if not remote['ranged']:
+            raise ValueError(f"{self.url} does not serve byte ranges and cannot be opened as a stream")
+        raw = HTTPRangeFile(self.session, remote['url'], remote['size'], self._request_headers(remote['url']),
+                            self.timeout, self.retries)
+        return io.BufferedReader(raw, buffer_size=buffer_size)
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    Read-only, seekable raw file over HTTP Range requests. Wrap it in io.BufferedReader.
+
+    Attributes:
+        url (str): URL of the file.
+        size (int): Size of the file in bytes.
+    """
+    def __init__(self, session: requests.Session, url: str, size: int, headers: dict, timeout: float = 60.0,
+                 retries: int = 5):
+        """
+        initializes the file at position 0.
+        """
+        super().__init__()
+        self.session = session
+        self.url = url
+        self.size = size
+        self.headers = headers
+        self.timeout = timeout
+        self.retries = retries
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.size}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        """
+        Fill buffer with the next bytes, using one Range request and retrying on errors.
+        """
+        if self._position >= self.size or len(buffer) == 0:
+            return 0
+        end = min(self.size, self._position + len(buffer)) - 1
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        attempt = 0
+        while self._position + filled <= end:
+            before = filled
+            headers = {**self.headers, 'Range': f"bytes={self._position + filled}-{end}"}
+            try:
+                with self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise requests.HTTPError(f"Expected 206 Partial Content, got {response.status_code}",
+                                                 response=response)
+                    for chunk in response.iter_content(chunk_size=BUFFER_SIZE):
+                        view[filled:filled + len(chunk)] = chunk
+                        filled += len(chunk)
+                    if filled == before:
+                        raise requests.RequestException(f"Range request at byte {self._position + filled} "
+                                                        f"returned no data")
+            except requests.RequestException as e:
+                # Only consecutive attempts without progress count against the retries
+                attempt = 1 if filled > before else attempt + 1
+                if attempt >= self.retries:
+                    raise
+                logging.warning("Range read of %s failed at byte %d (%s), retrying", self.url,
+                                self._position + filled, e)
+                time.sleep(min(30.0, 2 ** attempt))
+        self._position += filled
+        return filled
@@ -0,0 +1,159 @@
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence
+
+STATISTICS = ('mean', 'std', 'min', 'max', 'slope')
+
+
+class RollingFeatureEngine:
+    """
+    Computes rolling-window statistics of every sensor, carrying state across file boundaries.
+
+    For each sensor and window (in rows) the rolling mean, standard deviation, minimum,
+    maximum and least-squares slope are added as columns. All statistics are computed in
+    O(n) with rolling sums and pandas' rolling min/max.
+
+    Per stream the engine keeps the last max(windows) - 1 raw rows and the timestamp of the
+    last row. When the next data of that stream starts within max_gap after that timestamp,
+    the kept rows are put in front of it, so its first rows get the same windows as if the
+    files had been one. Otherwise (first file, a gap, or files arriving out of order) the
+    windows start fresh.
+
+    The same engine is stored in the model bundle, so training and inference compute the
+    same features.
+
+    Attributes:
+        windows (List[int]): Window lengths in rows.
+        statistics (List[str]): Statistics to compute, a subset of STATISTICS.
+        max_gap (pd.Timedelta): Largest gap between two files of a stream that still counts as continuous.
+    """
+    def __init__(self, windows: Sequence[int] = (10, 60), statistics: Sequence[str] = STATISTICS,
+                 max_gap: str = '10min'):
+        """
+        initializes the engine.
+
+        Args:
+            windows (Sequence[int]): Window lengths in rows.
+            statistics (Sequence[str]): Statistics to compute, a subset of STATISTICS.
+            max_gap (str): Largest gap between two files of a stream that still counts as continuous.
+        """
+        unknown = set(statistics) - set(STATISTICS)
+        if unknown:
+            raise ValueError(f"Unknown statistics: {sorted(unknown)}")
+        if not windows or min(windows) < 2:
+            raise ValueError("Windows must be at least 2 rows long.")
+        self.windows = sorted(int(window) for window in windows)
+        self.statistics = list(statistics)
+        self.max_gap = pd.Timedelta(max_gap)
+        self._states: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def history(self) -> int:
+        """
+        int: Number of raw rows kept per stream.
+        """
+        return self.windows[-1] - 1
+
+    def feature_names(self, sensors: List[str]) -> List[str]:
+        """
+        Return the names of the columns added for the given sensors.
+
+        Args:
+            sensors (List[str]): Raw sensor columns.
+
+        Returns:
+            List[str]: Names of the rolling feature columns, in output order.
+        """
+        return [f'{sensor}_{statistic}_{window}' for window in self.windows
+                for statistic in self.statistics for sensor in sensors]
+
+    def transform(self, df: pd.DataFrame, stream_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Add the rolling features to a block of consecutive rows.
+
+        Args:
+            df (pd.DataFrame): Raw sensor columns indexed by timestamp, in time order.
+            stream_id (Optional[str]): Stream the rows belong to. With None no state is read or kept.
+
+        Returns:
+            pd.DataFrame: The raw columns followed by the rolling feature columns, as float32.
+        """
+        values = df.to_numpy(dtype=np.float64)
+        carried = 0
+        if stream_id is not None and len(df):
+            with self._lock:
+                state = self._states.get(stream_id)
+            if state is not None:
+                last_timestamp, tail = state
+                gap = df.index[0] - last_timestamp
+                if pd.Timedelta(0) < gap <= self.max_gap and tail.shape[1] == values.shape[1]:
+                    values = np.vstack([tail, values])
+                    carried = len(tail)
+            with self._lock:
+                self._states[stream_id] = (df.index[-1], values[-self.history:].copy())
+
+        frame = pd.DataFrame(values)
+        blocks = []
+        for window in self.windows:
+            rolling = frame.rolling(window, min_periods=1)
+            for statistic in self.statistics:
+                if statistic == 'slope':
+                    result = self._rolling_slope(values, window)
+                else:
+                    result = getattr(rolling, statistic)().to_numpy()
+                blocks.append(result[carried:])
+        features = np.hstack(blocks).astype(np.float32) if blocks else np.empty((len(df), 0), np.float32)
+        derived = pd.DataFrame(features, index=df.index, columns=self.feature_names(list(df.columns)))
+        return pd.concat([df.astype(np.float32), derived], axis=1)
+
+    def reset(self, stream_id: Optional[str] = None):
+        """
+        Forget the kept rows of one stream, or of all streams.
+
+        Args:
+            stream_id (Optional[str]): Stream to reset; all streams if None.
+        """
+        with self._lock:
+            if stream_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(stream_id, None)
+
+    @staticmethod
+    def _rolling_slope(values: np.ndarray, window: int) -> np.ndarray:
+        """
+        Least-squares slope per row over the last window rows, ignoring NaNs, in units per row.
+        """
+        valid = ~np.isnan(values)
+        y = np.where(valid, values, 0.0)
+        positions = np.arange(len(values), dtype=np.float64)[:, None] - len(values) / 2
+        x = np.where(valid, positions, 0.0)
+
+        def rolling_sum(a):
+            return pd.DataFrame(a).rolling(window, min_periods=1).sum().to_numpy()
+
+        n = rolling_sum(valid.astype(np.float64))
+        sum_x, sum_y = rolling_sum(x), rolling_sum(y)
+        sum_xy, sum_xx = rolling_sum(x * y), rolling_sum(x * x)
+        denominator = n * sum_xx - sum_x * sum_x
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (n * sum_xy - sum_x * sum_y) / denominator
+        return np.where(n >= 2, slope, np.nan)
+
+    def __getstate__(self):
+        """
+        Pickle the configuration only; stream state is runtime data.
+        """
+        state = self.__dict__.copy()
+        state['_states'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore the configuration and start without stream state.
+        """
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
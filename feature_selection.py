@@ -0,0 +1,140 @@
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+
+class FeatureSelector:
+    """
+    Chooses the raw sensor columns a model is trained on, using the training rows only.
+
+    Columns are removed in four steps, and the reason for every removal is recorded:
+
+    - empty: more than max_missing of the values are missing, e.g. sensor_15;
+    - constant: fewer than two distinct values;
+    - correlated: absolute Pearson correlation above max_correlation with a column already kept.
+      Columns are visited from the most to the least complete, so of two near-duplicate sensors
+      the one with fewer gaps is kept;
+    - unimportant: the remaining columns are ranked by the impurity importance of a small random
+      forest fitted on a sample of the rows, and the lowest ranked ones are dropped once the kept
+      ones account for cumulative_importance of the total, or beyond max_features columns.
+
+    The chosen columns become the bundle's feature_columns, which the ingestion layer passes to
+    pd.read_csv as usecols, so scoring parses, scales and traverses only those columns.
+
+    Attributes:
+        max_missing (float): Largest fraction of missing values a kept column may have.
+        max_correlation (float): Largest absolute correlation between two kept columns.
+        cumulative_importance (float): Share of the total importance the kept columns must cover; 1.0 keeps all.
+        max_features (Optional[int]): Largest number of kept columns; None for no limit.
+        n_estimators (int): Number of trees of the ranking forest.
+        sample_rows (int): Largest number of rows each tree of the ranking forest is fitted on.
+        random_state (int): Seed of the ranking forest.
+        selected_ (List[str]): Kept columns in their original order, set by fit.
+        dropped_ (Dict[str, str]): Reason per removed column, set by fit.
+        importances_ (Dict[str, float]): Importance per ranked column, highest first, set by fit.
+    """
+    def __init__(self, max_missing: float = 0.3, max_correlation: float = 0.98, cumulative_importance: float = 0.99,
+                 max_features: Optional[int] = None, n_estimators: int = 50, sample_rows: int = 50_000,
+                 random_state: int = 42):
+        """
+        initializes the selector.
+
+        Args:
+            max_missing (float): Largest fraction of missing values a kept column may have.
+            max_correlation (float): Largest absolute correlation between two kept columns.
+            cumulative_importance (float): Share of the total importance the kept columns must cover; 1.0 keeps all.
+            max_features (Optional[int]): Largest number of kept columns; None for no limit.
+            n_estimators (int): Number of trees of the ranking forest.
+            sample_rows (int): Largest number of rows each tree of the ranking forest is fitted on.
+            random_state (int): Seed of the ranking forest.
+        """
+        if not 0.0 < cumulative_importance <= 1.0:
+            raise ValueError("cumulative_importance must be in (0, 1].")
+        self.max_missing = max_missing
+        self.max_correlation = max_correlation
+        self.cumulative_importance = cumulative_importance
+        self.max_features = max_features
+        self.n_estimators = n_estimators
+        self.sample_rows = sample_rows
+        self.random_state = random_state
+        self.selected_: List[str] = []
+        self.dropped_: Dict[str, str] = {}
+        self.importances_: Dict[str, float] = {}
+
+    def fit(self, X: pd.DataFrame, y: pd.Series) -> 'FeatureSelector':
+        """
+        Choose the columns of X to keep.
+
+        Args:
+            X (pd.DataFrame): Raw sensor columns of the training rows.
+            y (pd.Series): Machine status of the training rows.
+
+        Returns:
+            FeatureSelector: The fitted selector.
+        """
+        self.dropped_ = {}
+        missing = X.isna().mean()
+        candidates = []
+        for column in X.columns:
+            if missing[column] > self.max_missing:
+                self.dropped_[column] = 'empty'
+            elif X[column].nunique(dropna=True) < 2:
+                self.dropped_[column] = 'constant'
+            else:
+                candidates.append(column)
+
+        correlation = X[candidates].corr().abs()
+        kept = []
+        for column in sorted(candidates, key=lambda name: missing[name]):
+            if kept and correlation.loc[column, kept].max() > self.max_correlation:
+                self.dropped_[column] = 'correlated'
+            else:
+                kept.append(column)
+
+        ranked = self._rank(X[kept], y)
+        self.importances_ = dict(ranked)
+        limit = self.max_features or len(ranked)
+        total = sum(importance for _, importance in ranked) or 1.0
+        chosen, covered = set(), 0.0
+        for column, importance in ranked:
+            if len(chosen) >= limit or (covered >= self.cumulative_importance * total and chosen):
+                self.dropped_[column] = 'unimportant'
+                continue
+            chosen.add(column)
+            covered += importance
+        self.selected_ = [column for column in X.columns if column in chosen]
+        if not self.selected_:
+            raise ValueError("Feature selection removed every column; check max_missing and the training data.")
+        logging.info("Feature selection kept %d of %d columns; dropped %s", len(self.selected_), len(X.columns),
+                     self.dropped_)
+        return self
+
+    def _rank(self, X: pd.DataFrame, y: pd.Series) -> List[tuple]:
+        """
+        Rank columns by the impurity importance of a small random forest, highest first.
+        """
+        from sklearn.ensemble import RandomForestClassifier
+
+        if X.shape[1] < 2:
+            return [(column, 1.0) for column in X.columns]
+        labelled = y.notna().to_numpy()
+        # The ranking forest only needs a complete matrix; the trained model sees the original values
+        X = X[labelled].fillna(X[labelled].median())
+        y = y[labelled].astype(str)
+        forest = RandomForestClassifier(n_estimators=self.n_estimators,
+                                        max_samples=min(1.0, self.sample_rows / max(len(X), 1)),
+                                        n_jobs=-1, random_state=self.random_state)
+        forest.fit(X.to_numpy(), y.to_numpy())
+        order = np.argsort(forest.feature_importances_)[::-1]
+        return [(X.columns[i], float(forest.feature_importances_[i])) for i in order]
+
+    def report(self) -> dict:
+        """
+        Return the outcome of fit in a JSON-serializable form, as stored in the bundle metadata.
+
+        Returns:
+            dict: selected columns, dropped columns with their reason and importances of the ranked columns.
+        """
+        return {'selected': list(self.selected_), 'dropped': dict(self.dropped_),
+                'importances': dict(self.importances_)}
@@ -0,0 +1,260 @@
+import os
+import socket
+import logging
+import threading
+import time
+from typing import List, Optional
+
+# Directory inside the input directory holding one claim directory per pipeline instance
+CLAIMS_DIR = '.processing'
+# File in a claim directory whose mtime is the instance's lease
+LEASE_FILE = '.lease'
+# Directory inside the input directory holding the files that failed too often to be claimed again
+FAILED_DIR = '.failed'
+
+
+def default_instance_id() -> str:
+    """
+    Return an instance id that is unique among the processes sharing an input directory.
+    """
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def claim_file(file_path: str, claim_dir: str) -> Optional[str]:
+    """
+    Claim an input file by renaming it into a claim directory.
+
+    The rename is atomic on one filesystem, so when several instances try to claim the same file
+    exactly one succeeds; the others find the file gone.
+
+    Args:
+        file_path (str): Path of the file in the input directory.
+        claim_dir (str): Claim directory of the calling instance, on the same filesystem.
+
+    Returns:
+        Optional[str]: Path of the claimed file, or None if another instance claimed it first.
+    """
+    claimed_path = os.path.join(claim_dir, os.path.basename(file_path))
+    try:
+        os.rename(file_path, claimed_path)
+    except FileNotFoundError:
+        return None
+    return claimed_path
+
+
+class FileClaimer:
+    """
+    Shares the files of one input directory between several pipeline instances.
+
+    Every instance owns a claim directory input_dir/.processing/<instance_id>. An instance only
+    processes a file after claiming it with claim_file, so every file is scored exactly once no
+    matter how many instances received the filesystem event, and no instance removes a file
+    another one is reading.
+
+    The mtime of the .lease file in a claim directory is the instance's lease; a heartbeat thread
+    renews it every lease_timeout / 3 seconds. reclaim_stale moves the files of instances whose
+    lease expired back into the input directory, where the live instances claim them again. The
+    stale directory is first renamed, so only one instance reclaims it. Leases are compared with
+    the local clock, so lease_timeout must be well above the clock skew between the hosts.
+
+    A claimed file whose processing fails is given back with release. After max_attempts failures
+    on this instance it is moved to input_dir/.failed instead, where no instance claims it again.
+
+    Attributes:
+        input_dir (str): Shared input directory.
+        instance_id (str): Name of this instance's claim directory.
+        lease_timeout (float): Seconds without a heartbeat after which an instance's claims are reclaimed.
+        claim_dir (str): Claim directory of this instance.
+        max_attempts (int): Failed attempts of this instance after which a file is moved to failed_dir.
+        failed_dir (str): Directory of the files that failed max_attempts times.
+    """
+    def __init__(self, input_dir: str, instance_id: Optional[str] = None, lease_timeout: float = 60.0,
+                 max_attempts: int = 3):
+        """
+        initializes the claimer and creates its claim directory.
+
+        Files left in the claim directory by an earlier run with the same instance_id are moved back
+        into the input directory right away.
+
+        Args:
+            input_dir (str): Shared input directory.
+            instance_id (Optional[str]): Name of this instance's claim directory; host name and pid if None.
+            lease_timeout (float): Seconds without a heartbeat after which an instance's claims are reclaimed.
+            max_attempts (int): Failed attempts of this instance after which a file is moved to failed_dir.
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1.")
+        self.input_dir = input_dir
+        self.instance_id = instance_id or default_instance_id()
+        self.lease_timeout = lease_timeout
+        self.claims_root = os.path.join(input_dir, CLAIMS_DIR)
+        self.claim_dir = os.path.join(self.claims_root, self.instance_id)
+        self.max_attempts = max_attempts
+        self.failed_dir = os.path.join(input_dir, FAILED_DIR)
+        self._failures = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if os.path.isdir(self.claim_dir):
+            self._release_files(self.claim_dir)
+        os.makedirs(self.claim_dir, exist_ok=True)
+        self.heartbeat()
+
+    def claim(self, file_path: str) -> Optional[str]:
+        """
+        Claim an input file for this instance, see claim_file.
+
+        Args:
+            file_path (str): Path of the file in the input directory.
+
+        Returns:
+            Optional[str]: Path of the claimed file, or None if another instance claimed it first.
+        """
+        claimed_path = claim_file(file_path, self.claim_dir)
+        if claimed_path is None and not os.path.isdir(self.claim_dir):
+            # Another instance reclaimed our directory while this one was paused beyond its lease
+            self.heartbeat()
+            claimed_path = claim_file(file_path, self.claim_dir)
+        if claimed_path is None:
+            logging.info("File %s was claimed by another instance", file_path)
+        return claimed_path
+
+    def release(self, claimed_path: str) -> Optional[str]:
+        """
+        Give back a claimed file whose processing failed.
+
+        The file returns to the input directory, where it is claimed again, until it has failed
+        max_attempts times on this instance; then it is moved to failed_dir.
+
+        Args:
+            claimed_path (str): Path of the file in this instance's claim directory.
+
+        Returns:
+            Optional[str]: New path of the file, or None if it is no longer in the claim directory.
+        """
+        name = os.path.basename(claimed_path)
+        with self._lock:
+            failures = self._failures.get(name, 0) + 1
+        given_up = failures >= self.max_attempts
+        if given_up:
+            os.makedirs(self.failed_dir, exist_ok=True)
+        target = os.path.join(self.failed_dir if given_up else self.input_dir, name)
+        try:
+            os.rename(claimed_path, target)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if given_up:
+                self._failures.pop(name, None)
+            else:
+                self._failures[name] = failures
+        if given_up:
+            logging.error("File %s failed %d times, moved it to %s", name, failures, self.failed_dir)
+        else:
+            logging.warning("File %s failed (attempt %d of %d), moved it back to the input directory", name,
+                            failures, self.max_attempts)
+        return target
+
+    def heartbeat(self):
+        """
+        Renew this instance's lease.
+        """
+        lease_path = os.path.join(self.claim_dir, LEASE_FILE)
+        os.makedirs(self.claim_dir, exist_ok=True)
+        with open(lease_path, 'a'):
+            pass
+        os.utime(lease_path)
+
+    def start(self):
+        """
+        Start the heartbeat thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def heartbeat_loop():
+            while not self._stop.wait(self.lease_timeout / 3):
+                try:
+                    self.heartbeat()
+                except OSError as e:
+                    logging.error("Error renewing the lease of %s: %s", self.instance_id, e)
+
+        self._thread = threading.Thread(target=heartbeat_loop, name='claim-heartbeat', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the heartbeat and give the files still claimed by this instance back to the input directory.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._release_files(self.claim_dir)
+
+    def reclaim_stale(self) -> List[str]:
+        """
+        Move the claimed files of instances whose lease expired back into the input directory.
+
+        Returns:
+            List[str]: Paths of the files moved back.
+        """
+        try:
+            names = os.listdir(self.claims_root)
+        except FileNotFoundError:
+            return []
+        moved = []
+        now = time.time()
+        for name in names:
+            directory = os.path.join(self.claims_root, name)
+            if name == self.instance_id or not os.path.isdir(directory):
+                continue
+            try:
+                lease = os.stat(os.path.join(directory, LEASE_FILE)).st_mtime
+            except FileNotFoundError:
+                # Directory of a claimer that is just starting, or one already being reclaimed
+                try:
+                    lease = os.stat(directory).st_mtime
+                except FileNotFoundError:
+                    continue
+            if now - lease < self.lease_timeout:
+                continue
+            # Only the instance whose rename succeeds reclaims the directory
+            reclaiming = os.path.join(self.claims_root, f'{name}.reclaimed-by-{self.instance_id}')
+            try:
+                os.rename(directory, reclaiming)
+            except OSError:
+                continue
+            logging.warning("Lease of instance %s was last renewed %.0f s ago, reclaiming its files", name,
+                            now - lease)
+            moved += self._release_files(reclaiming)
+            try:
+                os.rmdir(reclaiming)
+            except OSError as e:
+                logging.error("Error removing reclaimed claim directory %s: %s", reclaiming, e)
+        return moved
+
+    def _release_files(self, directory: str) -> List[str]:
+        """
+        Move all claimed files of a claim directory back into the input directory and drop its lease.
+        """
+        moved = []
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return moved
+        for name in names:
+            source = os.path.join(directory, name)
+            if name == LEASE_FILE:
+                os.remove(source)
+                continue
+            target = os.path.join(self.input_dir, name)
+            try:
+                os.rename(source, target)
+                moved.append(target)
+            except OSError as e:
+                logging.error("Error moving claimed file %s back to %s: %s", source, self.input_dir, e)
+        if moved:
+            logging.info("Moved %d claimed files from %s back to the input directory", len(moved), directory)
+        return moved
@@ -0,0 +1,292 @@
+import os
+import io
+import sys
+import glob
+import json
+import time
+import pstats
+import cProfile
+import logging
+import argparse
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+# Directory inside the output directory the profiles are written to by default
+PROFILES_DIR = 'profiles'
+# Suffixes of the cProfile dump and the allocation report of a profiled file
+PROFILE_SUFFIX = '.prof'
+ALLOCATIONS_SUFFIX = '.alloc.json'
+
+
+class FileProfiler:
+    """
+    Profiles a sample of the input files processed by the pipeline.
+
+    A file is profiled if it is the every-th file seen, or if it is at least min_bytes large.
+    For a profiled file a cProfile dump (<name>-<timestamp>.prof, readable with pstats or
+    snakeviz) and an allocation report (<name>-<timestamp>.alloc.json) are written to
+    profile_dir. The allocation report lists the source lines holding the most memory at the
+    traced peak, sampled every sample_interval seconds while the file is processed.
+
+    cProfile only sees the thread that processes the file, so work handed to other pools, e.g.
+    plot rendering, shows up as the time spent waiting for it; tracemalloc traces all threads.
+    Only one file is profiled at a time; a sampled file arriving while another one is being
+    profiled is processed without profiling.
+
+    Attributes:
+        profile_dir (str): Directory the dumps are written to.
+        every (int): Profile every every-th file; 0 disables the sampling by count.
+        min_bytes (Optional[int]): Profile files at least this large; None disables the sampling by size.
+        top_allocations (int): Number of source lines listed in an allocation report.
+        sample_interval (float): Seconds between two checks of the traced memory.
+    """
+    def __init__(self, profile_dir: str, every: int = 0, min_bytes: Optional[int] = None,
+                 top_allocations: int = 25, sample_interval: float = 0.05):
+        """
+        initializes the profiler and creates its directory.
+
+        Args:
+            profile_dir (str): Directory the dumps are written to.
+            every (int): Profile every every-th file; 0 disables the sampling by count.
+            min_bytes (Optional[int]): Profile files at least this large; None disables the sampling by size.
+            top_allocations (int): Number of source lines listed in an allocation report.
+            sample_interval (float): Seconds between two checks of the traced memory.
+        """
+        self.profile_dir = profile_dir
+        self.every = every or 0
+        self.min_bytes = min_bytes
+        self.top_allocations = top_allocations
+        self.sample_interval = sample_interval
+        self._seen = 0
+        self._lock = threading.Lock()
+        # cProfile and tracemalloc are process-wide resources, so profiles never overlap
+        self._active = threading.Lock()
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def should_profile(self, file_path: str) -> bool:
+        """
+        Count a file and decide whether it is profiled.
+
+        Args:
+            file_path (str): Path of the input file.
+
+        Returns:
+            bool: True if the file is the every-th one seen or at least min_bytes large.
+        """
+        with self._lock:
+            self._seen += 1
+            sampled = self.every > 0 and self._seen % self.every == 0
+        if not sampled and self.min_bytes is not None:
+            try:
+                sampled = os.path.getsize(file_path) >= self.min_bytes
+            except OSError:
+                pass
+        return sampled
+
+    @contextmanager
+    def profile(self, file_path: str):
+        """
+        Profile the enclosed block if the file is sampled, see should_profile.
+
+        Args:
+            file_path (str): Path of the input file processed in the block.
+
+        Yields:
+            Optional[str]: Path of the cProfile dump written when the block ends, or None if the file is not profiled.
+        """
+        if not self.should_profile(file_path) or not self._active.acquire(blocking=False):
+            yield None
+            return
+        try:
+            stem = os.path.splitext(os.path.basename(file_path))[0]
+            base = os.path.join(self.profile_dir, f"{stem}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}")
+            try:
+                file_bytes = os.path.getsize(file_path)
+            except OSError:
+                file_bytes = None
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            sampler = _PeakSampler(self.sample_interval)
+            sampler.start()
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                yield base + PROFILE_SUFFIX
+            finally:
+                profiler.disable()
+                wall_seconds = time.perf_counter() - start
+                snapshot = sampler.stop()
+                _, peak = tracemalloc.get_traced_memory()
+                if not was_tracing:
+                    tracemalloc.stop()
+                self._write(base, file_path, file_bytes, wall_seconds, peak, profiler, snapshot)
+        finally:
+            self._active.release()
+
+    def _write(self, base: str, file_path: str, file_bytes: Optional[int], wall_seconds: float, peak: int,
+               profiler: cProfile.Profile, snapshot: Optional[tracemalloc.Snapshot]):
+        """
+        Write the cProfile dump and the allocation report of a profiled file.
+        """
+        try:
+            profiler.dump_stats(base + PROFILE_SUFFIX)
+            allocations = []
+            if snapshot is not None:
+                snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),
+                                                   tracemalloc.Filter(False, __file__),
+                                                   tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                                                   tracemalloc.Filter(False, '<unknown>')))
+                for stat in snapshot.statistics('lineno')[:self.top_allocations]:
+                    frame = stat.traceback[0]
+                    allocations.append({'location': f'{frame.filename}:{frame.lineno}',
+                                        'size_mb': stat.size / (1024 * 1024), 'count': stat.count})
+            report = {
+                'file': os.path.basename(file_path),
+                'file_bytes': file_bytes,
+                'wall_seconds': wall_seconds,
+                'peak_traced_mb': peak / (1024 * 1024),
+                'top_allocations': allocations,
+            }
+            with open(base + ALLOCATIONS_SUFFIX, 'w') as file:
+                json.dump(report, file, indent=2)
+            logging.info("Profiled %s in %.2f s, peak traced memory %.1f MB, written to %s", file_path,
+                         wall_seconds, report['peak_traced_mb'], base + PROFILE_SUFFIX)
+        except Exception as e:
+            logging.error("Error writing the profile of %s: %s", file_path, e)
+
+
+class _PeakSampler:
+    """
+    Takes a tracemalloc snapshot whenever the traced memory grows past the last snapshot by 10%,
+    so the last snapshot shows what was allocated close to the peak.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.snapshot = None
+        self._size = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _sample(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if self.snapshot is None or current > self._size * 1.1:
+            self.snapshot = tracemalloc.take_snapshot()
+            self._size = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Optional[tracemalloc.Snapshot]:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.snapshot
+
+
+def _function_name(function: tuple) -> str:
+    filename, lineno, name = function
+    if filename == '~':
+        return name
+    return f'{os.path.basename(filename)}:{lineno}({name})'
+
+
+def aggregate_profiles(profile_dir: str, top: int = 30, sort: str = 'cumulative') -> dict:
+    """
+    Merge the dumps of a profile directory into a hot-function and hot-allocation report.
+
+    Args:
+        profile_dir (str): Directory holding the .prof and .alloc.json files.
+        top (int): Number of functions and allocation sites reported.
+        sort (str): 'cumulative' or 'tottime', the time functions are ranked by.
+
+    Returns:
+        dict: files, total_seconds, functions (name, calls, tottime, cumtime, share of the total time),
+        allocations (location, files it appeared in, total and largest size in MB) and slowest_files.
+    """
+    dumps = sorted(glob.glob(os.path.join(profile_dir, '*' + PROFILE_SUFFIX)))
+    reports = []
+    for path in sorted(glob.glob(os.path.join(profile_dir, '*' + ALLOCATIONS_SUFFIX))):
+        with open(path) as file:
+            reports.append(json.load(file))
+    result = {'files': len(dumps), 'total_seconds': sum(report['wall_seconds'] for report in reports),
+              'functions': [], 'allocations': [], 'slowest_files': []}
+    if dumps:
+        stats = pstats.Stats(dumps[0], stream=io.StringIO())
+        for path in dumps[1:]:
+            stats.add(path)
+        total = stats.total_tt or 1.0
+        index = 3 if sort == 'cumulative' else 2
+        ranked = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)[:top]
+        for function, (_, calls, tottime, cumtime, _) in ranked:
+            result['functions'].append({'function': _function_name(function), 'calls': calls, 'tottime': tottime,
+                                        'cumtime': cumtime, 'share': (cumtime if index == 3 else tottime) / total})
+    sites = {}
+    for report in reports:
+        for allocation in report['top_allocations']:
+            site = sites.setdefault(allocation['location'], {'location': allocation['location'], 'files': 0,
+                                                             'total_mb': 0.0, 'max_mb': 0.0})
+            site['files'] += 1
+            site['total_mb'] += allocation['size_mb']
+            site['max_mb'] = max(site['max_mb'], allocation['size_mb'])
+    result['allocations'] = sorted(sites.values(), key=lambda site: site['max_mb'], reverse=True)[:top]
+    result['slowest_files'] = [{key: report[key] for key in ('file', 'file_bytes', 'wall_seconds', 'peak_traced_mb')}
+                               for report in sorted(reports, key=lambda report: report['wall_seconds'],
+                                                    reverse=True)[:10]]
+    return result
+
+
+def print_report(report: dict):
+    """
+    Print an aggregated profile report as tables.
+
+    Args:
+        report (dict): Result of aggregate_profiles.
+    """
+    print(f"{report['files']} profiled files, {report['total_seconds']:.2f} s in total")
+    print(f"\n{'share':>6} {'cumtime':>9} {'tottime':>9} {'calls':>10}  function")
+    for function in report['functions']:
+        print(f"{function['share']:>6.1%} {function['cumtime']:>9.3f} {function['tottime']:>9.3f} "
+              f"{function['calls']:>10}  {function['function']}")
+    print(f"\n{'max MB':>9} {'total MB':>9} {'files':>6}  allocation site")
+    for site in report['allocations']:
+        print(f"{site['max_mb']:>9.1f} {site['total_mb']:>9.1f} {site['files']:>6}  {site['location']}")
+    print(f"\n{'seconds':>9} {'peak MB':>9} {'MB':>9}  slowest files")
+    for file in report['slowest_files']:
+        size = file['file_bytes'] / (1024 * 1024) if file['file_bytes'] is not None else float('nan')
+        print(f"{file['wall_seconds']:>9.2f} {file['peak_traced_mb']:>9.1f} {size:>9.1f}  {file['file']}")
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Command-line entry point aggregating the profiles written by the pipeline.
+    """
+    parser = argparse.ArgumentParser(description="Aggregate per-file profiles into a hot-function report.")
+    parser.add_argument('profile_dir', help="Directory holding the .prof and .alloc.json files.")
+    parser.add_argument('--top', type=int, default=30, help="Number of functions and allocation sites listed.")
+    parser.add_argument('--sort', choices=('cumulative', 'tottime'), default='cumulative',
+                        help="Time the functions are ranked by.")
+    parser.add_argument('--json', help="Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+    report = aggregate_profiles(args.profile_dir, args.top, args.sort)
+    if not report['files']:
+        print(f"No profiles found in {args.profile_dir}", file=sys.stderr)
+        return 1
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+# Upper bound of (trees x samples) node indices held at once while traversing
+MAX_BLOCK_CELLS = 4_000_000
+
+
+class FlatForest:
+    """
+    A trained RandomForestClassifier compiled into flat contiguous arrays.
+
+    All trees are stored in one node table. Prediction walks every tree for every sample
+    at once, one level per iteration, using vectorized NumPy indexing instead of sklearn's
+    per-call and per-tree overhead. The comparisons and the averaging of the leaf
+    probabilities follow sklearn, so the predictions are identical.
+
+    Attributes:
+        feature (np.ndarray): Split feature per node (0 for leaves).
+        threshold (np.ndarray): Split threshold per node.
+        left (np.ndarray): Global index of the left child; leaves point to themselves.
+        right (np.ndarray): Global index of the right child; leaves point to themselves.
+        missing_left (np.ndarray): Whether a missing value goes to the left child, per node.
+        value (np.ndarray): Normalized class probabilities per node, shape (n_nodes, n_classes).
+        roots (np.ndarray): Global index of the root node of every tree.
+        classes_ (np.ndarray): Class labels in the order of the value columns.
+        max_depth (int): Depth of the deepest tree.
+    """
+    # Arrays written by save, one .npy file each; left and right are views of children
+    ARRAYS = ('feature', 'threshold', 'children', 'missing_left', 'value', 'roots')
+    META_FILE = 'forest.json'
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, classes_, max_depth,
+                 children=None):
+        """
+        initializes the forest from already flattened arrays. Use from_sklearn to compile a fitted forest.
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes_
+        self.max_depth = max_depth
+        # Children interleaved as [left, right] per node, indexed by 2 * node + go_right
+        self.children = np.stack([left, right], axis=1).ravel() if children is None else children
+
+    @property
+    def n_trees(self) -> int:
+        """
+        int: Number of trees in the forest.
+        """
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, forest) -> 'FlatForest':
+        """
+        Compile a fitted RandomForestClassifier.
+
+        Args:
+            forest: Fitted sklearn.ensemble.RandomForestClassifier with a single output.
+
+        Returns:
+            FlatForest: The compiled forest.
+        """
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled.")
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(leaf, own, tree.children_left + offset))
+            rights.append(np.where(leaf, own, tree.children_right + offset))
+            missing.append(np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(n)), dtype=bool))
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :forest.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer[:, None])
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+        return cls(np.concatenate(features).astype(np.intp), np.concatenate(thresholds).astype(np.float64),
+                   np.concatenate(lefts).astype(np.intp), np.concatenate(rights).astype(np.intp),
+                   np.concatenate(missing), np.ascontiguousarray(np.concatenate(values)),
+                   np.asarray(roots, dtype=np.intp), np.asarray(forest.classes_), int(max_depth))
+
+    def save(self, directory: str):
+        """
+        Write the node arrays as .npy files, so they can be memory-mapped by load.
+
+        Every file is written under a temporary name and renamed into place, so processes
+        that still map the previous arrays keep reading them undisturbed.
+
+        Args:
+            directory (str): Directory the arrays are written into; created if needed.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            tmp_path = os.path.join(directory, f'{name}.tmp.npy')
+            np.save(tmp_path, np.ascontiguousarray(getattr(self, name)))
+            os.replace(tmp_path, os.path.join(directory, f'{name}.npy'))
+        meta = {'classes': self.classes_.tolist(), 'classes_dtype': self.classes_.dtype.str,
+                'max_depth': self.max_depth}
+        tmp_path = os.path.join(directory, f'{self.META_FILE}.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, os.path.join(directory, self.META_FILE))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = 'r') -> 'FlatForest':
+        """
+        Open a forest written by save.
+
+        With mmap_mode='r' the node arrays are mapped read-only, so all processes loading the
+        same directory share one copy in the page cache.
+
+        Args:
+            directory (str): Directory written by save.
+            mmap_mode (str): Passed to numpy.load; None reads the arrays into memory.
+
+        Returns:
+            FlatForest: The loaded forest.
+        """
+        with open(os.path.join(directory, cls.META_FILE)) as file:
+            meta = json.load(file)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        children = arrays['children']
+        classes = np.asarray(meta['classes'], dtype=np.dtype(meta['classes_dtype']))
+        return cls(arrays['feature'], arrays['threshold'], children[0::2], children[1::2], arrays['missing_left'],
+                   arrays['value'], arrays['roots'], classes, meta['max_depth'], children=children)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Find the leaf every sample reaches in every tree.
+
+        Args:
+            X (np.ndarray): Feature matrix of shape (n_samples, n_features).
+
+        Returns:
+            np.ndarray: Global leaf indices of shape (n_trees, n_samples).
+        """
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        cells = X.ravel()
+        rows = np.arange(n_samples) * n_features
+        has_missing = bool(np.isnan(cells).any())
+        nodes = np.repeat(self.roots[:, None], n_samples, axis=1)
+        for _ in range(self.max_depth):
+            x = cells[rows + self.feature[nodes]]
+            go_right = ~(x <= self.threshold[nodes])
+            if has_missing:
+                go_right &= ~(np.isnan(x) & self.missing_left[nodes])
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Average the class probabilities of all trees.
+
+        Args:
+            X (np.ndarray): Feature matrix of shape (n_samples, n_features).
+
+        Returns:
+            np.ndarray: Class probabilities of shape (n_samples, n_classes).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        n_samples = X.shape[0]
+        proba = np.zeros((n_samples, self.value.shape[1]), dtype=np.float64)
+        block = max(1, MAX_BLOCK_CELLS // max(1, self.n_trees))
+        for start in range(0, n_samples, block):
+            leaves = self.apply(X[start:start + block])
+            out = proba[start:start + block]
+            # Accumulate tree by tree, in the same order as sklearn
+            for tree_leaves in leaves:
+                out += self.value[tree_leaves]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Predict the class of every sample.
+
+        Args:
+            X (np.ndarray): Feature matrix of shape (n_samples, n_features).
+
+        Returns:
+            np.ndarray: Predicted class labels.
+        """
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def benchmark(model, X: np.ndarray, batch_sizes=(1, 10, 100, 1_000, 10_000, 100_000, 1_000_000),
+              max_seconds: float = 2.0) -> list:
+    """
+    Time sklearn's predict against FlatForest.predict for several batch sizes.
+
+    Batches are tiled from the rows of X. Each configuration is repeated until about
+    max_seconds have passed (at least once) and the mean time per call is reported.
+
+    Args:
+        model: Fitted RandomForestClassifier.
+        X (np.ndarray): Scaled feature rows to draw the batches from.
+        batch_sizes: Batch sizes to time.
+        max_seconds (float): Time budget per configuration.
+
+    Returns:
+        list: One dict per batch size with the timings, rows per second and whether the predictions match.
+    """
+    flat = FlatForest.from_sklearn(model)
+    X = np.asarray(X, dtype=np.float32)
+    results = []
+    for batch_size in batch_sizes:
+        batch = X[np.arange(batch_size) % len(X)]
+        timings = {}
+        predictions = {}
+        for name, predict in (('sklearn', model.predict), ('flat', flat.predict)):
+            calls = 0
+            start = time.perf_counter()
+            while True:
+                predictions[name] = predict(batch)
+                calls += 1
+                if time.perf_counter() - start >= max_seconds:
+                    break
+            timings[name] = (time.perf_counter() - start) / calls
+        results.append({
+            'batch_size': batch_size,
+            'sklearn_seconds': timings['sklearn'],
+            'flat_seconds': timings['flat'],
+            'speedup': timings['sklearn'] / timings['flat'],
+            'flat_rows_per_second': batch_size / timings['flat'],
+            'identical': bool(np.array_equal(predictions['sklearn'], predictions['flat'])),
+        })
+    return results
+
+
+def main(argv=None):
+    """
+    Command line entry point: benchmark a trained model bundle against its compiled FlatForest.
+    """
+    from model_bundle import ModelBundle
+    from ingestion import read_sensor_csv
+
+    parser = argparse.ArgumentParser(description="Benchmark sklearn predict against FlatForest.")
+    parser.add_argument('--model', required=True, help="Path to the model bundle.")
+    parser.add_argument('--data', help="Sensor CSV to draw rows from; random rows if omitted.")
+    parser.add_argument('--max-batch', type=int, default=1_000_000, help="Largest batch size.")
+    parser.add_argument('--seconds', type=float, default=2.0, help="Time budget per configuration.")
+    args = parser.parse_args(argv)
+
+    bundle = ModelBundle.load(args.model)
+    if args.data:
+        df, _ = read_sensor_csv(args.data, usecols=bundle.feature_columns, with_status=False)
+        X = bundle.transform(df)
+    else:
+        X = np.random.default_rng(0).normal(size=(10_000, len(bundle.feature_columns)))
+    batch_sizes = [size for size in (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000) if size <= args.max_batch]
+    print(f"{'batch':>9} {'sklearn ms':>12} {'flat ms':>10} {'speedup':>8} {'identical':>10}")
+    for row in benchmark(bundle.model, X, batch_sizes, args.seconds):
+        print(f"{row['batch_size']:>9} {row['sklearn_seconds'] * 1000:>12.3f} {row['flat_seconds'] * 1000:>10.3f} "
+              f"{row['speedup']:>8.1f} {str(row['identical']):>10}")
+
+
+if __name__ == '__main__':
+    main()
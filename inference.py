@@ -0,0 +1,395 @@
+import os
+import re
+import sys
+import logging
+import argparse
+import subprocess
+import pandas as pd
+from typing import Callable, List, Optional
+from model_bundle import ModelBundle, file_digest
+from pipeline_model import ModelPipeline, DEFAULT_STREAM
+from output_sinks import OutputSink
+from metrics import timed
+
+# Modules a scoring process must not load just by importing the entry point. sklearn itself is
+# loaded later, by unpickling the model bundle; plotting and training stacks are never needed.
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'sklearn')
+
+# One line of `python -X importtime`: self and cumulative microseconds, then the indented module name
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\s*)(\S+)$')
+
+
+class FileScoring:
+    """
+    The scoring of one input file, split into steps so that callers can run them on different threads.
+
+    open looks the file up in the prediction cache, next_frame parses and scores the next chunk (or
+    returns the cached frames), write passes a frame to the output sink or appends its predictions to
+    the file's predictions CSV and records a checkpoint, and close stores a cache miss and returns the
+    number of rows. score_file runs the steps in a loop; AsyncProductionPipeline runs open, write and
+    close on its I/O pool and next_frame on its CPU pool.
+
+    Attributes:
+        model_pipeline (ModelPipeline): Pipeline holding the model bundle to score with.
+        file_path (str): Path to the data file to score.
+        output_path (str): Path of the predictions CSV, named after the input file; unused with a sink.
+        start_row (int): Number of data rows already scored, skipped when scoring in chunks.
+        rows (int): Number of rows written so far.
+        cached (Optional[pd.DataFrame]): Frames answered from the prediction cache, or None.
+    """
+    def __init__(self, model_pipeline: ModelPipeline, file_path: str, output_dir: str,
+                 chunk_size: Optional[int] = None, sink: Optional[OutputSink] = None, collect: Optional[list] = None,
+                 start_row: int = 0, checkpoint: Optional[Callable[[int, Optional[int]], None]] = None, cache=None,
+                 content_digest: Optional[str] = None, stream_id: str = DEFAULT_STREAM):
+        """
+        initializes the scoring of a file; see score_file for the arguments.
+        """
+        self.model_pipeline = model_pipeline
+        self.file_path = file_path
+        self.output_path = os.path.join(output_dir, os.path.basename(file_path))
+        self.source = os.path.basename(file_path)
+        self.chunk_size = chunk_size
+        self.sink = sink
+        self.collect = collect
+        self.start_row = start_row
+        self.checkpoint = checkpoint
+        self.cache = cache
+        self.content_digest = content_digest
+        self.stream_id = stream_id
+        bundle = model_pipeline.load_bundle()
+        self.model_digest = bundle.artifact_digest
+        self.has_feature_engine = bundle.feature_engine is not None
+        self.rows = 0
+        self.cached = None
+        self._frames = None
+        self._kept = None
+        self._kept_bytes = 0
+
+    @property
+    def uses_cache(self) -> bool:
+        """
+        bool: Whether the file goes through the prediction cache: a cache is given, the model artifact's
+        digest is known, the file is scored from the start and the bundle has no feature engine. With a
+        feature engine the predictions also depend on the rows of the stream's previous file, which the
+        key does not cover, and a hit would not advance the stream's rolling state for the next file.
+        """
+        return (self.cache is not None and self.model_digest is not None and not self.start_row
+                and not self.has_feature_engine)
+
+    @property
+    def raw_rows(self) -> int:
+        """
+        int: Number of raw data rows of the file covered so far, including start_row. For a cache hit,
+        where the file is not parsed, the number of rows answered from the cache.
+        """
+        report = self.model_pipeline.last_ingestion_report
+        if self.cached is not None or report is None:
+            return self.start_row + self.rows
+        return self.start_row + report.rows_read
+
+    def open(self):
+        """
+        Look the file up in the prediction cache and prepare the frames to write.
+        """
+        if self.uses_cache:
+            self.content_digest = self.content_digest or file_digest(self.file_path)
+            self.cached = self.cache.get(self.content_digest, self.model_digest)
+        if self.cached is not None:
+            self.model_pipeline.last_ingestion_report = None
+            self._frames = iter([self.cached])
+        else:
+            self._kept = [] if self.uses_cache else None
+            self._frames = self.model_pipeline.score_frames(self.file_path, self.chunk_size, self.stream_id,
+                                                            start_row=self.start_row)
+
+    def next_frame(self) -> Optional[pd.DataFrame]:
+        """
+        Return the next scored frame of the file, or None at its end.
+
+        Returns:
+            Optional[pd.DataFrame]: Predictions and class probabilities indexed by timestamp, see ModelPipeline.score_frames.
+        """
+        if self._frames is None:
+            self.open()
+        return next(self._frames, None)
+
+    def write(self, frame: pd.DataFrame):
+        """
+        Write a scored frame to the sink or the predictions CSV and record a checkpoint after it.
+
+        Args:
+            frame (pd.DataFrame): Frame returned by next_frame.
+        """
+        first = not self.rows and not self.start_row
+        with timed(self.model_pipeline.metrics, 'write'):
+            if self.sink is not None:
+                self.sink.write(frame, self.source, self.stream_id)
+            else:
+                frame[['predictions']].to_csv(self.output_path, mode='w' if first else 'a', header=first,
+                                              index=False)
+        if self.collect is not None:
+            self.collect.append(frame['predictions'].to_numpy())
+        self.rows += len(frame)
+        if self.cached is not None:
+            return
+        if self.checkpoint is not None:
+            offset = self.raw_rows
+            if self.sink is None:
+                self.checkpoint(offset, os.path.getsize(self.output_path))
+            else:
+                self.sink.after_write(lambda: self.checkpoint(offset, None))
+        if self._kept is not None:
+            self._kept.append(frame)
+            self._kept_bytes += int(frame.memory_usage(deep=True).sum())
+            if self._kept_bytes > self.cache.max_entry_bytes:
+                self._kept = None
+
+    def close(self) -> int:
+        """
+        Finish the predictions CSV of an empty file and store the frames of a cache miss.
+
+        Returns:
+            int: Number of rows scored or answered from the cache.
+        """
+        if self.sink is None and not self.rows and not self.start_row:
+            pd.DataFrame(columns=['predictions']).to_csv(self.output_path, index=False)
+        if self._kept:
+            self.cache.put(self.content_digest, self.model_digest, pd.concat(self._kept))
+        how = ('answered from the prediction cache' if self.cached is not None
+               else 'scored and cached' if self._kept else 'scored')
+        logging.info("Predictions of %s %s and written to %s", self.file_path, how,
+                     type(self.sink).__name__ if self.sink is not None else self.output_path)
+        return self.rows
+
+    def run(self) -> int:
+        """
+        Run all steps on the calling thread.
+
+        Returns:
+            int: Number of rows scored or answered from the cache.
+        """
+        self.open()
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                break
+            self.write(frame)
+        return self.close()
+
+
+def score_file(model_pipeline: ModelPipeline, file_path: str, output_dir: str, chunk_size: Optional[int] = None,
+               sink: Optional[OutputSink] = None, collect: Optional[list] = None, start_row: int = 0,
+               checkpoint: Optional[Callable[[int, Optional[int]], None]] = None, cache=None,
+               content_digest: Optional[str] = None) -> int:
+    """
+    Score one input file and write its predictions to the output directory or to an output sink.
+
+    Args:
+        model_pipeline (ModelPipeline): Pipeline holding the model bundle to score with.
+        file_path (str): Path to the data file to score.
+        output_dir (str): Directory the predictions file is written to, named after the input file.
+        chunk_size (Optional[int]): Rows per chunk for streaming inference; None scores the file in one go.
+        sink (Optional[OutputSink]): Sink receiving timestamped predictions with class probabilities
+            instead of the per-file predictions CSV. Its rows may still be buffered when this returns.
+        collect (Optional[list]): If given, the predicted classes of every chunk are appended to it.
+        start_row (int): Number of data rows already scored, skipped when scoring in chunks. Without a sink
+            the predictions are appended to the predictions file, which must end right after those rows.
+        checkpoint (Optional[Callable]): Called with the number of raw data rows whose predictions are persisted
+            (including start_row) and the size of the predictions file, or None with a sink. With a sink it
+            is called once the sink has written the rows.
+        cache (Optional[PredictionCache]): Cache answering files whose content was already scored by the same
+            model; used when the bundle's artifact_digest is known, the file is scored from the start and
+            the bundle has no feature engine, see FileScoring.uses_cache.
+        content_digest (Optional[str]): sha256 digest of the file, if already known.
+
+    Returns:
+        int: Number of rows scored or answered from the cache.
+    """
+    return FileScoring(model_pipeline, file_path, output_dir, chunk_size, sink, collect, start_row, checkpoint,
+                       cache, content_digest).run()
+
+
+def begin_journaled(journal, file_path: str, output_dir: str, chunk_size: Optional[int] = None,
+                    sink: Optional[OutputSink] = None) -> Optional[tuple]:
+    """
+    Start recording a file in a ProcessingJournal and find the row to resume from.
+
+    A predictions CSV is truncated to its size at the last checkpoint; if it does not match the
+    journal the file is scored from the start. Without chunk_size there are no intermediate
+    checkpoints, so the file is always scored from the start. With a rolling feature engine in the
+    bundle, scoring resumes at the checkpoint after re-reading the engine's history rows before it
+    to restore the windows, so the resumed predictions match an uninterrupted run, see
+    ModelPipeline._warm_up.
+
+    Args:
+        journal (ProcessingJournal): Journal recording the progress.
+        file_path (str): Path to the data file to score.
+        output_dir (str): Directory of the predictions file, named after the input file.
+        chunk_size (Optional[int]): Rows per chunk the file is scored in.
+        sink (Optional[OutputSink]): Sink receiving the predictions instead of the per-file predictions CSV.
+
+    Returns:
+        Optional[tuple]: The file's content digest and the number of data rows to skip; None if the
+        file's content was already completely processed.
+    """
+    from processing_journal import DONE
+
+    digest = file_digest(file_path)
+    entry = journal.lookup(digest)
+    if entry is not None and entry['status'] == DONE:
+        logging.info("Skipping %s, its content was already processed as %s", file_path, entry['source'])
+        return None
+    entry = journal.start(digest, os.path.basename(file_path))
+    start_row = entry['row_offset'] if chunk_size else 0
+    if start_row and sink is None:
+        output_path = os.path.join(output_dir, os.path.basename(file_path))
+        output_bytes = entry['output_bytes']
+        if output_bytes is None or not os.path.exists(output_path) or os.path.getsize(output_path) < output_bytes:
+            logging.warning("Predictions of %s do not match the journal, scoring it from the start", file_path)
+            start_row = 0
+        else:
+            with open(output_path, 'r+b') as file:
+                file.truncate(output_bytes)
+    if start_row:
+        logging.info("Resuming %s after row %d", file_path, start_row)
+    return digest, start_row
+
+
+def score_file_journaled(model_pipeline: ModelPipeline, file_path: str, output_dir: str, journal,
+                         chunk_size: Optional[int] = None, sink: Optional[OutputSink] = None,
+                         collect: Optional[list] = None, cache=None) -> Optional[dict]:
+    """
+    Score one input file with score_file, recording its progress in a ProcessingJournal.
+
+    A file whose content was already completely processed is not scored again. A file whose
+    earlier attempt was interrupted resumes after its last checkpoint when scoring in chunks;
+    a predictions CSV is first truncated to its size at that checkpoint, which drops rows written
+    after it. The caller marks the file done by calling commit once its predictions are persisted,
+    i.e. right away without a sink or from the sink's after_write, and before removing the input.
+
+    Args:
+        model_pipeline (ModelPipeline): Pipeline holding the model bundle to score with.
+        file_path (str): Path to the data file to score.
+        output_dir (str): Directory the predictions file is written to, named after the input file.
+        journal (ProcessingJournal): Journal recording the progress.
+        chunk_size (Optional[int]): Rows per chunk; checkpoints are taken after every chunk.
+        sink (Optional[OutputSink]): Sink receiving the predictions instead of the per-file predictions CSV.
+        collect (Optional[list]): If given with a sink, the predicted classes of every chunk are appended to it.
+        cache (Optional[PredictionCache]): Prediction cache passed to score_file.
+
+    Returns:
+        Optional[dict]: rows scored in this call, start_row it resumed from and commit, the callable marking
+        the file done; None if the file was already processed.
+    """
+    resume = begin_journaled(journal, file_path, output_dir, chunk_size, sink)
+    if resume is None:
+        return None
+    digest, start_row = resume
+
+    def checkpoint(row_offset, output_bytes):
+        journal.checkpoint(digest, row_offset, output_bytes)
+
+    scoring = FileScoring(model_pipeline, file_path, output_dir, chunk_size, sink=sink, collect=collect,
+                          start_row=start_row, checkpoint=checkpoint, cache=cache, content_digest=digest)
+    try:
+        rows = scoring.run()
+    except Exception as e:
+        journal.fail(digest, str(e))
+        raise
+    total = scoring.raw_rows
+    return {'rows': rows, 'start_row': start_row, 'commit': lambda: journal.complete(digest, total)}
+
+
+def measure_imports(module: str = 'inference') -> dict:
+    """
+    Import a module in a fresh interpreter under `python -X importtime` and summarize the cost.
+
+    Args:
+        module (str): Module to import.
+
+    Returns:
+        dict: seconds (cumulative import time of the module), modules (number of modules loaded),
+        heavy (loaded top-level packages from HEAVY_MODULES) and slowest (the ten slowest
+        modules by self time, as (name, seconds) tuples).
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    loaded = []
+    seconds = 0.0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        own, cumulative, indent, name = match.groups()
+        loaded.append((name, int(own) / 1e6))
+        if name == module and not indent:
+            seconds = int(cumulative) / 1e6
+    packages = {name.split('.')[0] for name, _ in loaded}
+    return {
+        'seconds': seconds,
+        'modules': len(loaded),
+        'heavy': sorted(packages & set(HEAVY_MODULES)),
+        'slowest': sorted(loaded, key=lambda item: item[1], reverse=True)[:10],
+    }
+
+
+def check_imports(modules: List[str], budget_seconds: Optional[float] = None) -> bool:
+    """
+    Check that importing each module loads none of HEAVY_MODULES and, optionally, stays within a time budget.
+
+    Args:
+        modules (List[str]): Modules to check, each in a fresh interpreter.
+        budget_seconds (Optional[float]): Largest allowed cumulative import time per module.
+
+    Returns:
+        bool: True if every module passed.
+    """
+    passed = True
+    for module in modules:
+        report = measure_imports(module)
+        problems = []
+        if report['heavy']:
+            problems.append(f"loads {', '.join(report['heavy'])}")
+        if budget_seconds is not None and report['seconds'] > budget_seconds:
+            problems.append(f"exceeds the budget of {budget_seconds:.2f} s")
+        status = 'FAIL: ' + '; '.join(problems) if problems else 'ok'
+        print(f"{module}: {report['seconds']:.3f} s, {report['modules']} modules - {status}")
+        for name, seconds in report['slowest'][:5]:
+            print(f"    {seconds * 1000:8.1f} ms  {name}")
+        passed = passed and not problems
+    return passed
+
+
+def main(argv=None):
+    """
+    Command line entry point: score files with a model bundle, or check the import cost of the entry points.
+    """
+    parser = argparse.ArgumentParser(description="Score sensor files with a model bundle.")
+    parser.add_argument('files', nargs='*', help="Sensor CSV files to score.")
+    parser.add_argument('--model', help="Path to the model bundle.")
+    parser.add_argument('--output-dir', default='.', help="Directory the predictions are written to.")
+    parser.add_argument('--chunk-size', type=int, help="Rows per chunk for streaming inference.")
+    parser.add_argument('--check-imports', nargs='*', metavar='MODULE',
+                        help="Check that importing the given modules (default: inference, production_pipeline) "
+                             "does not load the plotting or training stacks, then exit.")
+    parser.add_argument('--budget', type=float, help="Largest allowed import time in seconds for --check-imports.")
+    args = parser.parse_args(argv)
+
+    if args.check_imports is not None:
+        modules = args.check_imports or ['inference', 'production_pipeline']
+        sys.exit(0 if check_imports(modules, args.budget) else 1)
+    if not args.model or not args.files:
+        parser.error("--model and at least one file are required for scoring")
+
+    bundle = ModelBundle.load(args.model)
+    os.makedirs(args.output_dir, exist_ok=True)
+    model_pipeline = ModelPipeline(model_path=args.model, data_dir=args.output_dir, bundle=bundle)
+    for file_path in args.files:
+        rows = score_file(model_pipeline, file_path, args.output_dir, args.chunk_size)
+        print(f"{file_path}: {rows} rows scored")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import logging
+import pandas as pd
+from typing import Iterator, List, Optional
+
+# Declared schema of the pump sensor dataset
+TIMESTAMP_COLUMN = 'timestamp'
+STATUS_COLUMN = 'machine_status'
+SENSOR_COLUMNS = [f'sensor_{i:02d}' for i in range(52)]
+STATUS_CATEGORIES = ['BROKEN', 'NORMAL', 'RECOVERING']
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+SENSOR_DTYPE = 'float32'
+
+# Maximum number of offending row numbers kept per problem in an IngestionReport
+MAX_REPORTED_ROWS = 20
+
+
+class IngestionReport:
+    """
+    Summary of the rows that did not match the schema while reading a file.
+
+    Attributes:
+        source (str): Name of the file that was read.
+        rows_read (int): Number of data rows read from the file.
+        rows_kept (int): Number of rows returned after dropping malformed ones.
+        bad_timestamps (int): Number of rows dropped because the timestamp did not match TIMESTAMP_FORMAT.
+        unknown_status (int): Number of rows whose machine_status is not one of STATUS_CATEGORIES.
+        bad_values (int): Number of sensor cells that could not be parsed as numbers and were set to NaN.
+        sample_rows (dict): Up to MAX_REPORTED_ROWS file row numbers per problem.
+    """
+    def __init__(self, source: str):
+        """
+        initializes an empty report.
+
+        Args:
+            source (str): Name of the file that was read.
+        """
+        self.source = source
+        self.rows_read = 0
+        self.rows_kept = 0
+        self.bad_timestamps = 0
+        self.unknown_status = 0
+        self.bad_values = 0
+        self.sample_rows = {'bad_timestamps': [], 'unknown_status': [], 'bad_values': []}
+
+    @property
+    def is_clean(self) -> bool:
+        """
+        bool: True if no malformed rows or values were found.
+        """
+        return not (self.bad_timestamps or self.unknown_status or self.bad_values)
+
+    def add_rows(self, problem: str, row_numbers):
+        """
+        Count rows with a problem and keep a few of their row numbers.
+
+        Args:
+            problem (str): One of 'bad_timestamps', 'unknown_status' or 'bad_values'.
+            row_numbers: File row numbers (1-based, header excluded) of the offending rows.
+        """
+        row_numbers = list(row_numbers)
+        setattr(self, problem, getattr(self, problem) + len(row_numbers))
+        samples = self.sample_rows[problem]
+        samples.extend(row_numbers[:MAX_REPORTED_ROWS - len(samples)])
+
+    def log(self):
+        """
+        Log the report: one info line for a clean file, a warning with sample rows otherwise.
+        """
+        if self.is_clean:
+            logging.info("Ingested %d rows from %s", self.rows_kept, self.source)
+            return
+        logging.warning("Ingested %d of %d rows from %s: %d bad timestamps, %d unknown status, %d bad values "
+                        "(sample rows: %s)", self.rows_kept, self.rows_read, self.source, self.bad_timestamps,
+                        self.unknown_status, self.bad_values, self.sample_rows)
+
+
+def _select_columns(header: List[str], usecols: Optional[List[str]], with_status: bool) -> List[str]:
+    """
+    Choose the columns to read: the timestamp, the requested sensors present in the file and optionally the status.
+    """
+    if TIMESTAMP_COLUMN not in header:
+        raise ValueError(f"Input data has no '{TIMESTAMP_COLUMN}' column.")
+    sensors = SENSOR_COLUMNS if usecols is None else usecols
+    columns = [TIMESTAMP_COLUMN] + [column for column in sensors if column in header]
+    if with_status and STATUS_COLUMN in header:
+        columns.append(STATUS_COLUMN)
+    return columns
+
+
+def _clean(df: pd.DataFrame, report: IngestionReport, first_row: int) -> pd.DataFrame:
+    """
+    Parse timestamps and sensor values of one frame, record malformed rows and set the timestamp index.
+    """
+    row_numbers = pd.RangeIndex(first_row, first_row + len(df))
+    report.rows_read += len(df)
+
+    sensors = [column for column in df.columns if column in SENSOR_COLUMNS]
+    for column in sensors:
+        if df[column].dtype == SENSOR_DTYPE:
+            continue
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            parsed = pd.to_numeric(df[column], errors='coerce')
+            bad = parsed.isna() & df[column].notna()
+            report.add_rows('bad_values', row_numbers[bad.to_numpy()])
+            df[column] = parsed
+        df[column] = df[column].astype(SENSOR_DTYPE)
+
+    timestamps = pd.to_datetime(df[TIMESTAMP_COLUMN], format=TIMESTAMP_FORMAT, errors='coerce')
+    bad = timestamps.isna().to_numpy()
+    if bad.any():
+        report.add_rows('bad_timestamps', row_numbers[bad])
+    df[TIMESTAMP_COLUMN] = timestamps
+
+    if STATUS_COLUMN in df.columns:
+        unknown = (df[STATUS_COLUMN].isna() & ~bad).to_numpy()
+        if unknown.any():
+            report.add_rows('unknown_status', row_numbers[unknown])
+
+    df = df[~bad]
+    report.rows_kept += len(df)
+    return df.set_index(TIMESTAMP_COLUMN)
+
+
+def _read(source, columns: List[str], typed: bool = True, **kwargs):
+    """
+    Call pd.read_csv with the declared dtypes. With typed=False the sensor columns are left for _clean to parse.
+    """
+    dtypes = {STATUS_COLUMN: pd.CategoricalDtype(STATUS_CATEGORIES), TIMESTAMP_COLUMN: str}
+    if typed:
+        dtypes.update({column: SENSOR_DTYPE for column in columns if column in SENSOR_COLUMNS})
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return pd.read_csv(source, usecols=columns, dtype=dtypes, **kwargs)
+
+
+def read_sensor_csv(source, usecols: Optional[List[str]] = None, with_status: bool = True):
+    """
+    Read a sensor CSV according to the declared schema.
+
+    Only the timestamp, the sensor columns and (optionally) machine_status are read. Sensors are
+    stored as float32, machine_status as a categorical and timestamps are parsed with
+    TIMESTAMP_FORMAT. Rows with a malformed timestamp are dropped and listed in the report.
+
+    Args:
+        source: Path or file-like object of the CSV.
+        usecols (Optional[List[str]]): Sensor columns to read; all declared sensors if None.
+        with_status (bool): Whether to read the machine_status column when it is present.
+
+    Returns:
+        Tuple[pd.DataFrame, IngestionReport]: Data indexed by timestamp and the malformed-row report.
+    """
+    name = str(getattr(source, 'name', source))
+    header = list(pd.read_csv(source, nrows=0).columns)
+    columns = _select_columns(header, usecols, with_status)
+    report = IngestionReport(name)
+    try:
+        df = _read(source, columns)
+    except ValueError:
+        # A sensor value that is not a number; parse the sensors leniently and report the bad cells
+        df = _read(source, columns, typed=False)
+    df = _clean(df, report, first_row=1)
+    report.log()
+    return df, report
+
+
+def iter_sensor_csv(source, chunk_size: int, usecols: Optional[List[str]] = None,
+                    with_status: bool = True, report: Optional[IngestionReport] = None,
+                    start_row: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Read a sensor CSV according to the declared schema in chunks of rows.
+
+    Args:
+        source: Path or file-like object of the CSV.
+        chunk_size (int): Number of rows per chunk.
+        usecols (Optional[List[str]]): Sensor columns to read; all declared sensors if None.
+        with_status (bool): Whether to read the machine_status column when it is present.
+        report (Optional[IngestionReport]): Report that is filled in while the chunks are consumed.
+            Its rows_read counts the raw data rows consumed after start_row.
+        start_row (int): Number of data rows at the start of the file to skip, e.g. to resume after a checkpoint.
+
+    Yields:
+        pd.DataFrame: One cleaned chunk indexed by timestamp.
+    """
+    name = str(getattr(source, 'name', source))
+    header = list(pd.read_csv(source, nrows=0).columns)
+    columns = _select_columns(header, usecols, with_status)
+    report = report if report is not None else IngestionReport(name)
+    first_row = start_row + 1
+    typed = True
+    skip = {'skiprows': range(1, first_row)} if start_row else {}
+    reader = _read(source, columns, chunksize=chunk_size, **skip)
+    while True:
+        try:
+            chunk = next(reader)
+        except StopIteration:
+            break
+        except ValueError:
+            if not typed:
+                raise
+            # A sensor value that is not a number; continue after the rows already yielded with lenient parsing
+            typed = False
+            reader = _read(source, columns, typed=False, chunksize=chunk_size, skiprows=range(1, first_row))
+            continue
+        rows = len(chunk)
+        yield _clean(chunk, report, first_row)
+        first_row += rows
+    report.log()
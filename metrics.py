@@ -0,0 +1,380 @@
+import os
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from sub-millisecond predicts of small files up to minutes-long large files
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+                   300.0)
+
+
+def _label_key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+    """
+    Turn a label dict into a hashable, ordered key.
+    """
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    """
+    Format a label key in the Prometheus text format, e.g. {stage="parse"}.
+    """
+    pairs = tuple(key) + extra
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    """
+    Format a sample value; Prometheus spells infinity +Inf.
+    """
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Counter:
+    """
+    A monotonically increasing count, e.g. files processed, per label set.
+
+    Attributes:
+        name (str): Metric name.
+        help (str): One-line description.
+    """
+    type = 'counter'
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        """
+        Add amount to the count of the given labels.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """
+        Return the current count of the given labels.
+        """
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        """
+        Yield (suffix, label key, value) for every label set.
+        """
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', key, value
+
+
+class Gauge:
+    """
+    A value that goes up and down, e.g. queue depth. Either set explicitly or read from a function on every scrape.
+
+    Attributes:
+        name (str): Metric name.
+        help (str): One-line description.
+        function (Optional[Callable[[], float]]): Called on every scrape to read the current value.
+    """
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.function = function
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        """
+        Set the value of the given labels.
+        """
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def samples(self):
+        """
+        Yield (suffix, label key, value) for every label set.
+        """
+        if self.function is not None:
+            try:
+                yield '', (), float(self.function())
+            except Exception as e:
+                logging.warning("Could not read gauge %s: %s", self.name, e)
+            return
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', key, value
+
+
+class Histogram:
+    """
+    Distribution of observed values, e.g. stage durations, in cumulative buckets per label set.
+
+    Attributes:
+        name (str): Metric name.
+        help (str): One-line description.
+        buckets (Tuple[float, ...]): Upper bounds of the buckets, ascending; +Inf is added implicitly.
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # Per label key: [bucket counts (not cumulative, last one is +Inf), sum, count]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """
+        Record one observation for the given labels.
+        """
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self, **labels) -> dict:
+        """
+        Return count and sum of the observations of the given labels.
+        """
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if series is None:
+                return {'count': 0, 'sum': 0.0}
+            return {'count': series[2], 'sum': series[1]}
+
+    def samples(self):
+        """
+        Yield (suffix, label key, value) for every bucket, sum and count of every label set.
+        """
+        with self._lock:
+            items = [(key, list(series[0]), series[1], series[2]) for key, series in self._series.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield '_bucket', key + (('le', _format_value(bound)),), cumulative
+            yield '_sum', key, total
+            yield '_count', key, count
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of one process and renders them in the Prometheus text exposition format.
+
+    Metrics are created on first use and returned again for the same name, so modules can
+    record into a shared registry without coordinating who creates what.
+
+    Attributes:
+        prefix (str): Prepended to every metric name.
+    """
+    def __init__(self, prefix: str = 'pipeline_'):
+        """
+        initializes an empty registry.
+
+        Args:
+            prefix (str): Prepended to every metric name.
+        """
+        self.prefix = prefix
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, *args):
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {full_name} is already registered as a {metric.type}.")
+            return metric
+
+    def counter(self, name: str, help: str = '') -> Counter:
+        """
+        Return the counter called name, creating it if needed.
+        """
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = '', function: Optional[Callable[[], float]] = None) -> Gauge:
+        """
+        Return the gauge called name, creating it if needed. A function replaces the one of an existing gauge.
+        """
+        gauge = self._get(Gauge, name, help)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name: str, help: str = '', buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Return the histogram called name, creating it if needed.
+        """
+        return self._get(Histogram, name, help, buckets)
+
+    @contextmanager
+    def time(self, name: str, help: str = '', **labels):
+        """
+        Observe the wall-clock duration of the with block in the histogram called name.
+
+        The duration is recorded even if the block raises.
+        """
+        histogram = self.histogram(name, help)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for suffix, key, value in metric.samples():
+                lines.append(f'{metric.name}{suffix}{_format_labels(key)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """
+        Write the rendered metrics to a file, replacing it atomically, e.g. for node_exporter's textfile collector.
+
+        Args:
+            path (str): Destination file.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as file:
+            file.write(self.render())
+        os.replace(tmp_path, path)
+
+
+@contextmanager
+def timed(registry: Optional[MetricsRegistry], stage: str, **labels):
+    """
+    Observe the duration of the with block as pipeline_stage_seconds{stage=...}, or do nothing without a registry.
+
+    Args:
+        registry (Optional[MetricsRegistry]): Registry to record into; None disables the measurement.
+        stage (str): Name of the stage.
+        **labels: Further labels, e.g. the sensor of a plot.
+    """
+    if registry is None:
+        yield
+        return
+    with registry.time('stage_seconds', "Duration of the pipeline stages in seconds.", stage=stage, **labels):
+        yield
+
+
+class MetricsExporter:
+    """
+    Publishes a registry over HTTP at /metrics and/or by periodically rewriting a file.
+
+    Attributes:
+        registry (MetricsRegistry): The metrics to publish.
+        port (Optional[int]): Local HTTP port to serve on; None disables the server and 0 picks a free port,
+            which start replaces with the port actually bound.
+        host (str): Interface the server binds to.
+        path (Optional[str]): File to rewrite every flush_interval seconds; None disables the file.
+        flush_interval (float): Seconds between two writes of the file.
+    """
+    def __init__(self, registry: MetricsRegistry, port: Optional[int] = None, host: str = '127.0.0.1',
+                 path: Optional[str] = None, flush_interval: float = 15.0):
+        """
+        initializes the exporter. Call start to begin publishing.
+        """
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.path = path
+        self.flush_interval = flush_interval
+        self._server = None
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        """
+        Start the HTTP server and the file flusher, whichever is configured.
+        """
+        self._stop.clear()
+        if self.port is not None:
+            registry = self.registry
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] not in ('/', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+            self.port = self._server.server_address[1]
+            self._threads.append(threading.Thread(target=self._server.serve_forever, name='metrics-http',
+                                                  daemon=True))
+            logging.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+        if self.path is not None:
+            self._threads.append(threading.Thread(target=self._flush_loop, name='metrics-file', daemon=True))
+            logging.info("Writing metrics to %s every %s s", self.path, self.flush_interval)
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop publishing; the file is written one last time.
+        """
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _flush_loop(self):
+        """
+        Rewrite the metrics file until stopped, and once more on the way out.
+        """
+        while True:
+            stopped = self._stop.wait(self.flush_interval)
+            try:
+                self.registry.write(self.path)
+            except OSError as e:
+                logging.error("Error writing metrics to %s: %s", self.path, e)
+            if stopped:
+                break
@@ -0,0 +1,412 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import time
+import joblib
+import pandas as pd
+from typing import List, Optional
+
+
+class ModelBundle:
+    """
+    The fitted artifacts needed for scoring, persisted together as one file.
+
+    Attributes:
+        scaler: Fitted StandardScaler applied to the feature columns.
+        model: Fitted classifier used for the predictions.
+        feature_columns (List[str]): Raw input columns, in the order the features are built from.
+        version (int): Version number of the artifact, incremented on every save of a retrained bundle.
+        metadata (dict): Free-form information about how the bundle was produced.
+        flat_forest (FlatForest): Compiled copy of the forest used for small batches, set by use_flat_forest.
+        flat_forest_max_batch (int): Largest batch scored with flat_forest; larger batches use sklearn.
+        feature_engine (RollingFeatureEngine): Optional stage adding rolling-window features to the raw columns.
+        shared (bool): Whether the model is a memory-mapped FlatForest opened by load with mmap_mode.
+        artifact_digest (str): sha256 digest of the artifact the bundle was loaded from, set by ModelBundleManager.
+    """
+    flat_forest = None
+    artifact_digest = None
+    flat_forest_max_batch = 256
+    feature_engine = None
+    shared = False
+    # Directory next to the artifact holding the array-backed copy written by save, see shared_dir
+    SHARED_SUFFIX = '.shared'
+    # Pointer file in shared_dir naming the subdirectory of the current version
+    SHARED_POINTER_FILE = 'current.json'
+    SHARED_BUNDLE_FILE = 'bundle.joblib'
+
+    def __init__(self, scaler, model, feature_columns: List[str], version: int = 1, metadata: Optional[dict] = None,
+                 feature_engine=None):
+        """
+        initializes the bundle from already fitted objects.
+
+        Args:
+            scaler: Fitted scaler.
+            model: Fitted classifier.
+            feature_columns (List[str]): Feature column order used during fitting.
+            version (int): Version number of the artifact.
+            metadata (dict): Optional extra information stored with the bundle.
+            feature_engine (RollingFeatureEngine): Optional rolling-window feature stage used during fitting.
+        """
+        self.scaler = scaler
+        self.model = model
+        self.feature_columns = list(feature_columns)
+        self.version = version
+        self.metadata = metadata or {}
+        self.feature_engine = feature_engine
+
+    def features(self, df: pd.DataFrame, stream_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Select the raw feature columns in training order and add the rolling features, if any.
+
+        Args:
+            df (pd.DataFrame): Data containing at least the feature columns.
+            stream_id (Optional[str]): Stream the rows belong to, so rolling windows continue from its previous rows.
+
+        Returns:
+            pd.DataFrame: Unscaled feature matrix.
+        """
+        missing = [column for column in self.feature_columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"Input data is missing feature columns: {missing}")
+        features = df[self.feature_columns]
+        if self.feature_engine is not None:
+            features = self.feature_engine.transform(features, stream_id)
+        return features
+
+    def transform(self, df: pd.DataFrame, stream_id: Optional[str] = None):
+        """
+        Build the features and scale them.
+
+        Args:
+            df (pd.DataFrame): Data containing at least the feature columns.
+            stream_id (Optional[str]): Stream the rows belong to, see features.
+
+        Returns:
+            numpy.ndarray: Scaled feature matrix.
+        """
+        return self.scaler.transform(self.features(df, stream_id))
+
+    def predict(self, df: pd.DataFrame, stream_id: Optional[str] = None):
+        """
+        Scale the data and predict the machine status for every row.
+
+        Args:
+            df (pd.DataFrame): Data containing at least the feature columns.
+            stream_id (Optional[str]): Stream the rows belong to, see features.
+
+        Returns:
+            numpy.ndarray: Predicted class per row.
+        """
+        return self.predict_scaled(self.transform(df, stream_id))
+
+    def predict_scaled(self, X):
+        """
+        Predict the machine status for already scaled features, e.g. the output of transform.
+
+        Args:
+            X (numpy.ndarray): Scaled feature matrix.
+
+        Returns:
+            numpy.ndarray: Predicted class per row.
+        """
+        if self.flat_forest is not None and len(X) <= self.flat_forest_max_batch:
+            return self.flat_forest.predict(X)
+        return self.model.predict(X)
+
+    def predict_proba_scaled(self, X):
+        """
+        Class probabilities for already scaled features, in the order of the model's classes_.
+
+        Args:
+            X (numpy.ndarray): Scaled feature matrix.
+
+        Returns:
+            numpy.ndarray: Probabilities of shape (n_rows, n_classes).
+        """
+        if self.flat_forest is not None and len(X) <= self.flat_forest_max_batch:
+            return self.flat_forest.predict_proba(X)
+        return self.model.predict_proba(X)
+
+    def use_flat_forest(self, max_batch: int = 256):
+        """
+        Compile the forest into a FlatForest and use it for batches of up to max_batch rows,
+        where sklearn's per-call overhead dominates. Its predictions are identical to the model's.
+
+        Args:
+            max_batch (int): Largest batch scored with the compiled forest.
+        """
+        from forest_engine import FlatForest
+        self.flat_forest = self.model if self.shared else FlatForest.from_sklearn(self.model)
+        self.flat_forest_max_batch = max_batch
+
+    def __getstate__(self):
+        """
+        Leave the compiled forest out of the pickle; it is derived from the model and rebuilt after loading.
+        """
+        state = self.__dict__.copy()
+        state.pop('flat_forest', None)
+        return state
+
+    @classmethod
+    def shared_dir(cls, path: str) -> str:
+        """
+        Return the directory holding the array-backed copy of the artifact at path.
+        """
+        return f"{path}{cls.SHARED_SUFFIX}"
+
+    def save(self, path: str, shared: bool = False):
+        """
+        Write the bundle to disk.
+
+        The bundle is written to a temporary file first and then renamed over the target,
+        so a reader never sees a half-written artifact.
+
+        With shared=True the forest is also written, as FlatForest node arrays, into a versioned
+        subdirectory of shared_dir(path), next to a small pickle of the scaler, column order and
+        metadata, see _save_shared. load with mmap_mode opens
+        that copy, so scoring processes map one read-only copy of the forest instead of each
+        unpickling their own. Models that cannot be compiled into a FlatForest are saved without it.
+
+        Args:
+            path (str): Destination path of the artifact.
+            shared (bool): Also write the memory-mappable copy.
+        """
+        tmp_path = f"{path}.tmp"
+        joblib.dump(self, tmp_path)
+        if shared:
+            stat = os.stat(tmp_path)
+            try:
+                self._save_shared(self.shared_dir(path), [stat.st_mtime_ns, stat.st_size], file_digest(tmp_path))
+            except (AttributeError, ValueError) as e:
+                logging.warning("Model of type %s cannot be saved for memory mapping: %s", type(self.model).__name__, e)
+        os.replace(tmp_path, path)
+        logging.info("Model bundle version %s saved to %s", self.version, path)
+
+    def _save_shared(self, directory: str, artifact_stat: list, digest: str):
+        """
+        Write the forest arrays and the rest of the bundle as a new version inside directory and switch to it.
+
+        Every version lives in its own subdirectory named after the artifact's digest. It is written
+        under a temporary name and renamed into place once complete; then the pointer file, recording
+        the subdirectory and the mtime and size of the artifact being saved, is atomically replaced.
+        A reader therefore always maps the arrays of one complete version, and a copy left over from
+        an older artifact is never used for a newer one. The previous version is kept for readers that
+        read the pointer just before the switch; older ones are removed.
+        """
+        from forest_engine import FlatForest
+
+        name = digest[:16]
+        version_dir = os.path.join(directory, name)
+        if not os.path.isdir(version_dir):
+            flat = self.flat_forest or FlatForest.from_sklearn(self.model)
+            tmp_dir = f"{version_dir}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            flat.save(tmp_dir)
+            state = self.__getstate__()
+            state['model'] = None
+            light = ModelBundle.__new__(ModelBundle)
+            light.__dict__.update(state)
+            joblib.dump(light, os.path.join(tmp_dir, self.SHARED_BUNDLE_FILE))
+            try:
+                os.rename(tmp_dir, version_dir)
+            except OSError:
+                # Another process saved the same artifact first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        pointer_path = os.path.join(directory, self.SHARED_POINTER_FILE)
+        previous = self._read_pointer(directory)
+        tmp_path = f"{pointer_path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as file:
+            json.dump({'version': self.version, 'artifact_stat': artifact_stat, 'directory': name}, file)
+        os.replace(tmp_path, pointer_path)
+        keep = {name, previous.get('directory') if previous else None}
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            if entry not in keep and '.tmp' not in entry and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def _read_pointer(cls, directory: str) -> Optional[dict]:
+        """
+        Return the content of the pointer file of a shared directory, or None if there is none.
+        """
+        try:
+            with open(os.path.join(directory, cls.SHARED_POINTER_FILE)) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = None) -> 'ModelBundle':
+        """
+        Load a bundle previously written by save.
+
+        With mmap_mode (e.g. 'r') the array-backed copy written by save(path, shared=True) is opened
+        instead, as long as it belongs to the current artifact: the forest is a memory-mapped FlatForest
+        used as the model, with the same predictions. Otherwise the artifact is unpickled as usual.
+
+        Args:
+            path (str): Path of the artifact.
+            mmap_mode (Optional[str]): Memory-map the forest arrays in this numpy mode.
+
+        Returns:
+            ModelBundle: The loaded bundle.
+
+        Raises:
+            ValueError: If the file does not contain a ModelBundle, e.g. a bare model from an older run.
+        """
+        if mmap_mode is not None:
+            bundle = cls._load_shared(path, mmap_mode)
+            if bundle is not None:
+                return bundle
+            logging.warning("No current memory-mappable copy of %s, unpickling the full model", path)
+        bundle = joblib.load(path)
+        if not isinstance(bundle, cls):
+            raise ValueError(f"{path} does not contain a model bundle. Please retrain the model.")
+        return bundle
+
+    @classmethod
+    def _load_shared(cls, path: str, mmap_mode: str) -> Optional['ModelBundle']:
+        """
+        Open the array-backed copy of the artifact at path, or return None if it is missing or stale.
+        """
+        from forest_engine import FlatForest
+
+        directory = cls.shared_dir(path)
+        pointer = cls._read_pointer(directory)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if pointer is None or pointer.get('artifact_stat') != [stat.st_mtime_ns, stat.st_size]:
+            return None
+        version_dir = os.path.join(directory, pointer['directory'])
+        try:
+            bundle = joblib.load(os.path.join(version_dir, cls.SHARED_BUNDLE_FILE))
+            bundle.model = FlatForest.load(version_dir, mmap_mode=mmap_mode)
+        except FileNotFoundError:
+            # Removed by two saves in quick succession after the pointer was read
+            return None
+        bundle.shared = True
+        return bundle
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the sha256 digest of a file.
+
+    Args:
+        path (str): Path of the file.
+        chunk_size (int): Number of bytes read per iteration.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelBundleManager:
+    """
+    Keeps one loaded ModelBundle in memory and reloads it when the file on disk changes.
+
+    The bundle is shared by all threads of the pipeline. A reload builds the new bundle
+    next to the current one and then replaces the reference, so work that already holds
+    the old bundle finishes with it and is never paused.
+
+    Attributes:
+        model_path (str): Path of the bundle artifact.
+        check_interval (float): Minimum number of seconds between two checks of the file on disk.
+        flat_forest_max_batch (int): If set, every loaded bundle compiles a FlatForest for batches up to this size.
+        mmap_mode (str): If set, bundles are loaded from their memory-mappable copy, see ModelBundle.load.
+    """
+    def __init__(self, model_path: str, check_interval: float = 5.0, flat_forest_max_batch: Optional[int] = None,
+                 mmap_mode: Optional[str] = None):
+        """
+        initializes the manager and loads the bundle once.
+
+        Args:
+            model_path (str): Path of the bundle artifact.
+            check_interval (float): Minimum number of seconds between two checks of the file on disk.
+            flat_forest_max_batch (Optional[int]): If set, every loaded bundle compiles a FlatForest for batches up to this size.
+            mmap_mode (Optional[str]): If set, bundles are loaded from their memory-mappable copy.
+        """
+        self.model_path = model_path
+        self.check_interval = check_interval
+        self.flat_forest_max_batch = flat_forest_max_batch
+        self.mmap_mode = mmap_mode
+        self._reload_lock = threading.Lock()
+        self._bundle = None
+        self._stat = None
+        self._digest = None
+        self._last_check = 0.0
+        self.reload()
+
+    def get(self) -> ModelBundle:
+        """
+        Return the current bundle, reloading it first if the artifact changed on disk.
+
+        Returns:
+            ModelBundle: The bundle to score with.
+        """
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self._check_for_update()
+        return self._bundle
+
+    def reload(self):
+        """
+        Load the artifact from disk and make it the current bundle.
+        """
+        with self._reload_lock:
+            self._load()
+
+    def _check_for_update(self):
+        """
+        Reload the bundle if the artifact's mtime or size changed and its content hash differs.
+
+        Only one thread performs the check; the others keep scoring with the current bundle.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_check = time.monotonic()
+            try:
+                stat = os.stat(self.model_path)
+            except FileNotFoundError:
+                logging.warning("Model bundle %s not found, keeping version %s", self.model_path, self._bundle.version)
+                return
+            if (stat.st_mtime_ns, stat.st_size) == self._stat:
+                return
+            if file_digest(self.model_path) == self._digest:
+                self._stat = (stat.st_mtime_ns, stat.st_size)
+                return
+            self._load()
+        except Exception as e:
+            logging.error("Error reloading model bundle %s: %s", self.model_path, e)
+        finally:
+            self._reload_lock.release()
+
+    def _load(self):
+        """
+        Read the artifact and swap it in as the current bundle.
+        """
+        stat = os.stat(self.model_path)
+        digest = file_digest(self.model_path)
+        start = time.perf_counter()
+        bundle = ModelBundle.load(self.model_path, mmap_mode=self.mmap_mode)
+        load_seconds = time.perf_counter() - start
+        bundle.artifact_digest = digest
+        if self.flat_forest_max_batch:
+            bundle.use_flat_forest(self.flat_forest_max_batch)
+        self._bundle = bundle
+        self._stat = (stat.st_mtime_ns, stat.st_size)
+        self._digest = digest
+        self._last_check = time.monotonic()
+        logging.info("Model bundle version %s loaded from %s in %.3f s (shared: %s)", bundle.version, self.model_path,
+                     load_seconds, bundle.shared)
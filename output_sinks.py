@@ -0,0 +1,373 @@
+import os
+import uuid
+import sqlite3
+import logging
+import threading
+import time
+import pandas as pd
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+from ingestion import TIMESTAMP_COLUMN, TIMESTAMP_FORMAT
+
+# Columns added to every prediction row by OutputSink.write
+SOURCE_COLUMN = 'source'
+STREAM_COLUMN = 'stream'
+
+
+class OutputSink(ABC):
+    """
+    abstract destination for prediction rows that batches writes across files.
+
+    Rows passed to write are buffered until batch_rows rows have accumulated (or flush is called)
+    and then written in one go, so many small input files produce few, large writes. Callers that
+    must not act before their rows are persisted, e.g. delete the input file, register a callback
+    with after_write. Every row carries its timestamp, the input file it came from, its stream,
+    the predicted class and one proba_<class> column per class.
+
+    Attributes:
+        batch_rows (int): Number of buffered rows that triggers a write.
+    """
+    def __init__(self, batch_rows: int = 100_000):
+        """
+        initializes the buffer.
+
+        Args:
+            batch_rows (int): Number of buffered rows that triggers a write.
+        """
+        self.batch_rows = batch_rows
+        self._buffer: List[pd.DataFrame] = []
+        self._buffered_rows = 0
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        # Serializes batch writes, so a callback never runs before the rows written ahead of it
+        self._flush_lock = threading.Lock()
+
+    def write(self, predictions: pd.DataFrame, source: str, stream: str = 'default'):
+        """
+        Add prediction rows to the buffer and write the buffer if it is full.
+
+        Args:
+            predictions (pd.DataFrame): Frame indexed by timestamp with a predictions column and proba_<class> columns.
+            source (str): Name of the input file the rows came from.
+            stream (str): Stream, i.e. machine, the rows belong to.
+        """
+        frame = predictions.reset_index().rename(columns={predictions.index.name or 'index': TIMESTAMP_COLUMN})
+        frame.insert(1, SOURCE_COLUMN, source)
+        frame.insert(2, STREAM_COLUMN, stream)
+        with self._lock:
+            self._buffer.append(frame)
+            self._buffered_rows += len(frame)
+            full = self._buffered_rows >= self.batch_rows
+        if full:
+            self.flush()
+
+    def after_write(self, callback: Callable[[], None]):
+        """
+        Call callback once all rows passed to write so far have been persisted, i.e. after the next flush.
+
+        Args:
+            callback (Callable[[], None]): Function to call; it is dropped if writing the batch fails.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def flush(self):
+        """
+        Write all buffered rows, then run the callbacks registered until now.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._take_buffer()
+                callbacks, self._callbacks = self._callbacks, []
+            if batch is not None:
+                self._write_batch(batch)
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logging.error("Error in output sink callback: %s", e)
+
+    def close(self):
+        """
+        Write all buffered rows and release the sink's resources.
+        """
+        self.flush()
+
+    def _take_buffer(self) -> Optional[pd.DataFrame]:
+        """
+        Empty the buffer and return its rows as one frame, or None if it was empty. Called with the lock held.
+        """
+        if not self._buffer:
+            return None
+        batch = pd.concat(self._buffer, ignore_index=True)
+        self._buffer = []
+        self._buffered_rows = 0
+        return batch
+
+    @abstractmethod
+    def _write_batch(self, batch: pd.DataFrame):
+        """
+        Persist one batch of rows. To be implemented by subclasses.
+        """
+        pass
+
+    @abstractmethod
+    def read(self, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Read the stored predictions with start <= timestamp < end. To be implemented by subclasses.
+        """
+        pass
+
+
+class ParquetSink(OutputSink):
+    """
+    Writes predictions to a Parquet dataset partitioned by day (root/date=YYYY-MM-DD/part-*.parquet).
+
+    Reading a time range is one scan of the matching partitions. Every batch adds one file per
+    day it touches; compact merges the small files of a partition into one.
+
+    Attributes:
+        root (str): Directory of the dataset.
+        compression (str): Parquet compression codec.
+        target_file_bytes (int): Files smaller than this are merged by compact.
+    """
+    def __init__(self, root: str, batch_rows: int = 100_000, compression: str = 'snappy',
+                 target_file_bytes: int = 64 * 1024 * 1024):
+        """
+        initializes the sink.
+
+        Args:
+            root (str): Directory of the dataset.
+            batch_rows (int): Number of buffered rows that triggers a write.
+            compression (str): Parquet compression codec.
+            target_file_bytes (int): Files smaller than this are merged by compact.
+        """
+        super().__init__(batch_rows)
+        # pyarrow is only needed by this sink
+        import pyarrow  # noqa: F401
+        self.root = root
+        self.compression = compression
+        self.target_file_bytes = target_file_bytes
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+        self._stop = threading.Event()
+        os.makedirs(root, exist_ok=True)
+
+    def _partition_dir(self, day: str) -> str:
+        return os.path.join(self.root, f'date={day}')
+
+    def _write_file(self, frame: pd.DataFrame, directory: str, name: str):
+        """
+        Write a frame as a Parquet file, renaming it into place so readers never see a partial file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f'.{name}.tmp')
+        frame.to_parquet(tmp_path, engine='pyarrow', compression=self.compression, index=False)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+    def _write_batch(self, batch: pd.DataFrame):
+        days = batch[TIMESTAMP_COLUMN].dt.strftime('%Y-%m-%d')
+        for day, rows in batch.groupby(days, sort=False):
+            self._write_file(rows, self._partition_dir(day), f'part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet')
+        logging.info("Wrote %d prediction rows to %s", len(batch), self.root)
+
+    def read(self, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Read the stored predictions with start <= timestamp < end, sorted by timestamp.
+
+        Args:
+            start (Optional[str]): First timestamp to include; None for no lower bound.
+            end (Optional[str]): Timestamp to stop before; None for no upper bound.
+
+        Returns:
+            pd.DataFrame: The prediction rows.
+        """
+        filters = []
+        if start is not None:
+            start = pd.Timestamp(start)
+            filters += [('date', '>=', start.strftime('%Y-%m-%d')), (TIMESTAMP_COLUMN, '>=', start)]
+        if end is not None:
+            end = pd.Timestamp(end)
+            filters += [('date', '<=', end.strftime('%Y-%m-%d')), (TIMESTAMP_COLUMN, '<', end)]
+        if not any(name.startswith('date=') for name in os.listdir(self.root)):
+            return pd.DataFrame()
+        df = pd.read_parquet(self.root, engine='pyarrow', filters=filters or None)
+        return df.drop(columns=['date']).sort_values(TIMESTAMP_COLUMN, kind='stable').reset_index(drop=True)
+
+    def compact(self) -> int:
+        """
+        Merge the small files of every partition into one file per partition.
+
+        The merged file is renamed into place before the small files are removed, so a reader
+        running at that moment may see rows twice but never misses any.
+
+        Returns:
+            int: Number of files removed.
+        """
+        removed = 0
+        with self._compact_lock:
+            for entry in sorted(os.listdir(self.root)):
+                directory = os.path.join(self.root, entry)
+                if not entry.startswith('date=') or not os.path.isdir(directory):
+                    continue
+                small = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                         if name.startswith('part-') and name.endswith('.parquet')
+                         and os.path.getsize(os.path.join(directory, name)) < self.target_file_bytes]
+                if len(small) < 2:
+                    continue
+                merged = pd.concat([pd.read_parquet(path, engine='pyarrow') for path in small], ignore_index=True)
+                merged = merged.sort_values(TIMESTAMP_COLUMN, kind='stable')
+                self._write_file(merged, directory, f'part-{time.time_ns()}-compacted.parquet')
+                for path in small:
+                    os.remove(path)
+                removed += len(small) - 1
+                logging.info("Compacted %d files of %s", len(small), directory)
+        return removed
+
+    def start_compaction(self, interval: float = 300.0):
+        """
+        Run compact every interval seconds on a background thread until close is called.
+
+        Args:
+            interval (float): Seconds between two compactions.
+        """
+        def compact_loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.compact()
+                except Exception as e:
+                    logging.error("Error compacting %s: %s", self.root, e)
+
+        self._stop.clear()
+        self._compactor = threading.Thread(target=compact_loop, name='parquet-compaction', daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        """
+        Write the buffered rows and stop the background compaction.
+        """
+        super().close()
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+
+class SqliteSink(OutputSink):
+    """
+    Writes predictions to a table of a local SQLite database in WAL mode.
+
+    WAL mode lets readers query the table while batches are written. The table has one
+    proba_<class> column per class; columns for classes not seen before are added on the fly.
+
+    Attributes:
+        path (str): Path of the database file.
+        table (str): Name of the table.
+    """
+    def __init__(self, path: str, table: str = 'predictions', batch_rows: int = 100_000):
+        """
+        initializes the sink and creates the table if needed.
+
+        Args:
+            path (str): Path of the database file.
+            table (str): Name of the table.
+            batch_rows (int): Number of buffered rows that triggers a write.
+        """
+        super().__init__(batch_rows)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self._write_lock = threading.Lock()
+        connection = self._connect()
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {table} ({TIMESTAMP_COLUMN} TEXT NOT NULL, '
+                               f'{SOURCE_COLUMN} TEXT, {STREAM_COLUMN} TEXT, predictions TEXT)')
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {table}_{TIMESTAMP_COLUMN} '
+                               f'ON {table} ({TIMESTAMP_COLUMN})')
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Transactions are opened explicitly, so adding columns and inserting happen in the same one
+        connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _write_batch(self, batch: pd.DataFrame):
+        batch = batch.copy()
+        # Timestamps are stored as text in the input format, which sorts chronologically
+        batch[TIMESTAMP_COLUMN] = batch[TIMESTAMP_COLUMN].dt.strftime(TIMESTAMP_FORMAT)
+        batch['predictions'] = batch['predictions'].astype(str)
+        columns = list(batch.columns)
+        placeholders = ', '.join('?' * len(columns))
+        quoted = ', '.join(f'"{column}"' for column in columns)
+        with self._write_lock:
+            connection = self._connect()
+            try:
+                # IMMEDIATE takes the write lock up front, so concurrent processes cannot add the same column twice
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    existing = {row[1] for row in connection.execute(f'PRAGMA table_info({self.table})')}
+                    for column in columns:
+                        if column not in existing:
+                            connection.execute(f'ALTER TABLE {self.table} ADD COLUMN "{column}" REAL')
+                    connection.executemany(f'INSERT INTO {self.table} ({quoted}) VALUES ({placeholders})',
+                                           batch.itertuples(index=False, name=None))
+                    connection.execute('COMMIT')
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+            finally:
+                connection.close()
+        logging.info("Wrote %d prediction rows to %s", len(batch), self.path)
+
+    def read(self, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Read the stored predictions with start <= timestamp < end, sorted by timestamp.
+
+        Args:
+            start (Optional[str]): First timestamp to include; None for no lower bound.
+            end (Optional[str]): Timestamp to stop before; None for no upper bound.
+
+        Returns:
+            pd.DataFrame: The prediction rows.
+        """
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append(f'{TIMESTAMP_COLUMN} >= ?')
+            parameters.append(pd.Timestamp(start).strftime(TIMESTAMP_FORMAT))
+        if end is not None:
+            conditions.append(f'{TIMESTAMP_COLUMN} < ?')
+            parameters.append(pd.Timestamp(end).strftime(TIMESTAMP_FORMAT))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        connection = self._connect()
+        try:
+            df = pd.read_sql_query(f'SELECT * FROM {self.table}{where} ORDER BY {TIMESTAMP_COLUMN}, rowid',
+                                   connection, params=parameters)
+        finally:
+            connection.close()
+        df[TIMESTAMP_COLUMN] = pd.to_datetime(df[TIMESTAMP_COLUMN], format=TIMESTAMP_FORMAT)
+        return df
+
+
+def make_sink(kind: str, output_dir: str, batch_rows: int = 100_000) -> Optional[OutputSink]:
+    """
+    Create the output sink configured by name.
+
+    Args:
+        kind (str): 'csv' (one predictions CSV per input file, no sink), 'parquet' or 'sqlite'.
+        output_dir (str): Output directory; the dataset or database is created inside it.
+        batch_rows (int): Number of buffered rows that triggers a write.
+
+    Returns:
+        Optional[OutputSink]: The sink, or None for 'csv'.
+    """
+    if kind == 'csv':
+        return None
+    if kind == 'parquet':
+        return ParquetSink(os.path.join(output_dir, 'predictions'), batch_rows=batch_rows)
+    if kind == 'sqlite':
+        return SqliteSink(os.path.join(output_dir, 'predictions.sqlite'), batch_rows=batch_rows)
+    raise ValueError(f"Unknown output sink: {kind}")
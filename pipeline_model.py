@@ -1,13 +1,21 @@
 import os
-import joblib
+import numpy as np
 import pandas as pd
 import logging
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
-from sklearn.preprocessing import StandardScaler
+import time
+from model_bundle import ModelBundle
+from runtime_stats import peak_rss_mb
+from sensor_cache import SensorCache
+from ingestion import read_sensor_csv, iter_sensor_csv, IngestionReport, STATUS_COLUMN
+from plot_renderer import AnomalyPlotRenderer
+from metrics import timed
+
+# Stream used for rolling-feature state when the caller does not name one
+DEFAULT_STREAM = 'default'
+
+# The sklearn training, evaluation and plotting stacks are imported by the methods that use them,
+# so scoring processes only load what unpickling the model bundle needs.
+
 
 class ModelPipeline:
     """
@@ -16,16 +24,24 @@ class ModelPipeline:
     to ensure modularity, flexibility, and maintainability.
     """
 
-    def __init__(self, model_path, data_dir):
+    def __init__(self, model_path, data_dir, bundle=None, feature_engine=None, metrics=None, feature_selector=None):
         """
         Initializing the ModelPipeline with paths for the model and data directory.
 
         :param model_path: Path where the trained model will be saved.
         :param data_dir: Directory where data and log files will be stored.
+        :param bundle: Optional already loaded ModelBundle used for scoring instead of reading model_path.
+        :param feature_engine: Optional RollingFeatureEngine adding rolling-window features during training;
+            it is saved with the model, so scoring uses the same features.
+        :param metrics: Optional MetricsRegistry receiving the durations of the parse, scale, predict and write stages.
+        :param feature_selector: Optional FeatureSelector choosing the raw columns the model is trained on; only
+            those columns are saved as the bundle's feature_columns and read at scoring time.
         """
         self.model_path = model_path
         self.data_dir = data_dir
-        self.model = RandomForestClassifier(random_state=42)
+        self.bundle = bundle
+        self.cache_dir = os.path.join(data_dir, 'sensor_cache')
+        self.model = None
         self.train_df = None
         self.val_df = None
         self.test_df = None
@@ -34,32 +50,36 @@ class ModelPipeline:
         self.X_val = None
         self.y_val = None
         self.scaler = None
+        self.feature_columns = None
+        self.feature_engine = feature_engine
+        self.feature_selector = feature_selector
+        self.last_ingestion_report = None
+        self.metrics = metrics
         logging.basicConfig(filename=os.path.join(data_dir, 'model_pipeline.log'), level=logging.INFO,
                             format='%(asctime)s - %(levelname)s - %(message)s')
 
-    def load_data(self, data_path):
+    def load_data(self, data_path=None):
         """
         Load and preprocess the data from the specified path.
 
-        :param data_path: Path to the CSV file containing the dataset.
+        The parsed data is kept in a columnar cache under cache_dir that is reused as long as the
+        source file is unchanged. The month splits are slices of the memory-mapped cache rather
+        than separate CSV files.
+
+        :param data_path: Path to the CSV file containing the dataset. If None, the cache is used as
+            it is, e.g. after DatasetDownloader.stream_to_cache filled it from the remote archive.
         :raises: Exception if data loading or processing fails.
         :sol: Single Responsibility Principle (SRP)
         :rep: Data loading and preprocessing are handled in this method, encapsulating this functionality.
         """
-        logging.info("Loading data from %s", data_path)
+        logging.info("Loading data from %s", data_path or self.cache_dir)
         try:
-            df = pd.read_csv(data_path)
-            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-            df = df.dropna(subset=['timestamp'])
-            df.set_index('timestamp', inplace=True)
-            df.drop(columns=['Unnamed: 0'], errors='ignore', inplace=True)
+            df = SensorCache(self.cache_dir).load(data_path)
             self.train_df = df.loc['2018-04-01':'2018-06-30']
             self.val_df = df.loc['2018-07-01':'2018-07-31']
             self.test_df = df.loc['2018-08-01':'2018-08-31']
-            self.train_df.to_csv(os.path.join(self.data_dir, 'train_data.csv'))
-            self.val_df.to_csv(os.path.join(self.data_dir, 'val_data_july.csv'))
-            self.test_df.to_csv(os.path.join(self.data_dir, 'test_data_august.csv'))
-            logging.info("Data loaded and saved: train_data.csv, val_data_july.csv, test_data_august.csv")
+            logging.info("Data loaded: %d train, %d validation and %d test rows",
+                         len(self.train_df), len(self.val_df), len(self.test_df))
         except Exception as e:
             logging.error("Error loading or processing data: %s", e)
             raise
@@ -68,15 +88,29 @@ class ModelPipeline:
         """
         Split the training data into training and validation sets.
 
+        The rows are split in time order: the last 30% of the training months are the validation set,
+        so no rows from after the validation period are used for training. With a feature selector,
+        the raw columns are chosen on the training rows before the rolling features are added.
+
         :raises: ValueError if training data is not loaded.
         :sol: Single Responsibility Principle (SRP)
         :rep: Data splitting is handled here, ensuring that the method focuses solely on this task.
         """
         if self.train_df is None:
             raise ValueError("Training data not loaded. Please load the data first.")
+        from sklearn.model_selection import train_test_split
+
         X = self.train_df.drop(columns=['machine_status'])
         y = self.train_df['machine_status']
-        self.X_train, self.X_val, self.y_train, self.y_val = train_test_split(X, y, test_size=0.3, random_state=42)
+        if self.feature_selector is not None:
+            n_train = len(X) - int(np.ceil(0.3 * len(X)))
+            self.feature_selector.fit(X.iloc[:n_train], y.iloc[:n_train])
+            X = X[self.feature_selector.selected_]
+        self.feature_columns = list(X.columns)
+        if self.feature_engine is not None:
+            # The training months are one continuous block, so no stream state is needed
+            X = self.feature_engine.transform(X)
+        self.X_train, self.X_val, self.y_train, self.y_val = train_test_split(X, y, test_size=0.3, shuffle=False)
         logging.info("Data split into training and validation sets.")
 
     def transform_data(self):
@@ -89,13 +123,18 @@ class ModelPipeline:
         """
         if self.X_train is None:
             raise ValueError("Training data not available. Please load and split the data first.")
+        from sklearn.preprocessing import StandardScaler
+
         self.scaler = StandardScaler()
         self.X_train = self.scaler.fit_transform(self.X_train)
         logging.info("Data transformation completed.")
 
     def train_model(self):
         """
-        Train the RandomForestClassifier model and save it to the specified path.
+        Train the RandomForestClassifier model and save it, together with the fitted scaler
+        and the feature column order (after feature selection, if any), as a ModelBundle to the specified path, together with its
+        memory-mappable copy (see ModelBundle.save). A model assigned
+        to self.model beforehand is trained instead of the default RandomForestClassifier(random_state=42).
 
         :raises: ValueError if training data is not available.
         :sol: Single Responsibility Principle (SRP)
@@ -103,21 +142,134 @@ class ModelPipeline:
         """
         if self.X_train is None or self.y_train is None:
             raise ValueError("Training data not available. Please load and split the data first.")
+        if self.scaler is None:
+            raise ValueError("Scaler not available. Please transform the data first.")
+        if self.model is None:
+            from sklearn.ensemble import RandomForestClassifier
+            self.model = RandomForestClassifier(random_state=42)
+        start = time.perf_counter()
         self.model.fit(self.X_train, self.y_train)
-        joblib.dump(self.model, self.model_path)
+        metadata = {
+            'full_fit_seconds': time.perf_counter() - start,
+            'full_fit_rows': len(self.y_train),
+            'full_fit_trees': len(self.model.estimators_),
+            'history': [],
+        }
+        if self.feature_selector is not None:
+            metadata['feature_selection'] = self.feature_selector.report()
+        self.bundle = ModelBundle(self.scaler, self.model, self.feature_columns, metadata=metadata,
+                                  feature_engine=self.feature_engine)
+        # Also written as memory-mappable arrays, so scoring processes can share one copy of the forest
+        self.bundle.save(self.model_path, shared=True)
         logging.info("Model trained and saved to %s", self.model_path)
 
+    def incremental_update(self, file_paths, n_new_trees=20):
+        """
+        Update the saved model with newly labelled files instead of retraining from scratch.
+
+        The scaler's running statistics are updated with partial_fit and the split thresholds of the
+        existing trees are moved into the new scaled space, so they keep making the same decisions
+        (up to floating-point rounding at the split boundaries). Then n_new_trees trees are fitted on
+        the new data only and added to the forest with warm_start. Only the new files are held in
+        memory. The bundle is saved with an incremented version, next to a versioned copy.
+
+        :param file_paths: Paths to labelled CSV files with the same columns as the training data.
+        :param n_new_trees: Number of trees fitted on the new data and added to the forest.
+        :returns: Dictionary with the new version, rows, trees, update seconds and the ratio to the last full fit.
+        :raises: ValueError if the new data contains a machine status the model has never seen.
+        :sol: Open/Closed Principle (OCP)
+        :rep: The monthly refresh extends the trained bundle instead of changing how a full training run works.
+        """
+        logging.info("Incremental update with %s", file_paths)
+        start = time.perf_counter()
+        bundle = self.load_bundle()
+        scaler = bundle.scaler
+        old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+
+        features, labels = [], []
+        for file_path in file_paths:
+            df, _ = read_sensor_csv(file_path, usecols=bundle.feature_columns)
+            df = df.dropna(subset=[STATUS_COLUMN])
+            file_features = bundle.features(df)
+            scaler.partial_fit(file_features)
+            features.append(file_features)
+            labels.append(df[STATUS_COLUMN].astype(str).to_numpy())
+        self._rebase_thresholds(bundle.model, old_mean, old_scale, scaler.mean_, scaler.scale_)
+
+        X_new = scaler.transform(pd.concat(features))
+        y_new = np.concatenate(labels)
+        rows = len(y_new)
+        classes = bundle.model.classes_
+        unknown = set(y_new) - set(classes)
+        if unknown:
+            raise ValueError(f"New data contains unseen machine status {sorted(unknown)}. Please retrain the model.")
+        # Zero-weight rows keep every known class in the fit, so the new trees share the forest's class order
+        missing = [label for label in classes if label not in set(y_new)]
+        weights = np.ones(len(y_new))
+        if missing:
+            X_new = np.vstack([X_new, np.repeat(X_new[:1], len(missing), axis=0)])
+            y_new = np.concatenate([y_new, missing])
+            weights = np.concatenate([weights, np.zeros(len(missing))])
+
+        n_trees = len(bundle.model.estimators_) + n_new_trees
+        bundle.model.set_params(warm_start=True, n_estimators=n_trees)
+        try:
+            bundle.model.fit(X_new, y_new, sample_weight=weights)
+        finally:
+            bundle.model.set_params(warm_start=False)
+        if bundle.flat_forest is not None:
+            bundle.use_flat_forest(bundle.flat_forest_max_batch)
+
+        seconds = time.perf_counter() - start
+        full_fit_seconds = bundle.metadata.get('full_fit_seconds')
+        update = {
+            'version': bundle.version + 1,
+            'files': [os.path.basename(file_path) for file_path in file_paths],
+            'rows': rows,
+            'trees': n_trees,
+            'seconds': seconds,
+            'ratio_to_full_fit': seconds / full_fit_seconds if full_fit_seconds else None,
+        }
+        bundle.version += 1
+        bundle.metadata.setdefault('history', []).append(update)
+        root, extension = os.path.splitext(self.model_path)
+        bundle.save(f"{root}_v{bundle.version}{extension}")
+        bundle.save(self.model_path, shared=True)
+        logging.info("Incremental update to version %d took %.2f s (%s of the last full fit)",
+                     bundle.version, seconds, update['ratio_to_full_fit'])
+        return update
+
+    @staticmethod
+    def _rebase_thresholds(model, old_mean, old_scale, new_mean, new_scale):
+        """
+        Move the split thresholds of all trees from the old scaled feature space into the new one.
+        """
+        shift = np.nan_to_num((old_mean - new_mean) / new_scale)
+        factor = np.nan_to_num(old_scale / new_scale, nan=1.0)
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            split = tree.feature >= 0
+            features = tree.feature[split]
+            thresholds = tree.threshold
+            thresholds[split] = thresholds[split] * factor[features] + shift[features]
+
     def evaluate_model(self):
         """
         Evaluate the trained model using validation data and log the results.
 
+        The validation features are scaled with the scaler fitted on the training rows, as at scoring time.
+
         :raises: ValueError if validation data is not available.
         :sol: Single Responsibility Principle (SRP)
         :rep: Evaluation is focused on assessing the model's performance and logging the results.
         """
         if self.X_val is None or self.y_val is None:
             raise ValueError("Validation data not available. Please split the data first.")
-        predictions = self.model.predict(self.X_val)
+        from sklearn.metrics import classification_report, accuracy_score
+
+        if self.scaler is None:
+            raise ValueError("Scaler not available. Please transform the data first.")
+        predictions = self.model.predict(self.scaler.transform(self.X_val))
         accuracy = accuracy_score(self.y_val, predictions)
         report = classification_report(self.y_val, predictions, zero_division=0)
         logging.info("Validation Accuracy: %.2f", accuracy)
@@ -125,41 +277,57 @@ class ModelPipeline:
         print("Validation Accuracy: %.2f" % accuracy)
         print("Classification Report:\n", report)
 
-    def plot_sensor_anomalies(self, df, sensor_name):
+    def backtest(self, data_path=None, configurations=({},), min_train_months=3, max_train_months=None,
+                 workers=None):
+        """
+        Evaluate forest configurations on rolling-origin monthly folds in parallel processes.
+
+        Every fold trains on the months up to k and scores month k + 1, with its own scaler and, if a
+        feature selector is set, its own copy of the selector fitted on the fold's training months.
+        The worker processes memory-map the sensor cache instead of receiving copies of the data.
+
+        :param data_path: Path to the sensor CSV file; if None, the existing cache is used.
+        :param configurations: RandomForestClassifier parameter dicts, one per configuration to evaluate.
+        :param min_train_months: Number of months in the first fold's training window.
+        :param max_train_months: Largest training window in months; None lets the window grow.
+        :param workers: Number of worker processes; None uses all cores.
+        :returns: Report with per-fold metrics and timings and a summary per configuration, see run_backtest.
+        :sol: Open/Closed Principle (OCP)
+        :rep: Backtesting is added next to the single validation split without changing how the model is trained.
+        """
+        from backtest_engine import run_backtest
+
+        SensorCache(self.cache_dir).load(data_path)
+        report = run_backtest(self.cache_dir, configurations, min_train_months, max_train_months, workers,
+                              feature_engine=self.feature_engine, feature_selector=self.feature_selector)
+        for entry in report['summary']:
+            logging.info("Backtest of configuration %d %s: mean accuracy %s, mean macro F1 %s over %d folds",
+                         entry['config_id'], entry['params'], entry['mean_accuracy'], entry['mean_macro_f1'],
+                         entry['folds'])
+        return report
+
+    def plot_sensor_anomalies(self, df, sensor_name, predictions=None):
         """
         Plot sensor anomalies and save the plot as an image file.
 
         :param df: DataFrame containing sensor data.
         :param sensor_name: Name of the sensor to plot.
+        :param predictions: Optional predicted machine status per row of df; BROKEN and RECOVERING intervals are shaded.
         :returns: Path to the saved plot image file.
         :raises: ValueError if data is not available.
         :sol: Single Responsibility Principle (SRP)
-        :rep: Plotting sensor anomalies is managed separately from other tasks.
+        :rep: Plotting sensor anomalies is managed separately from other tasks and delegated to AnomalyPlotRenderer.
         """
         if df is None:
             raise ValueError("Data not available. Please provide the data.")
-        
-        plt.figure(figsize=(14, 7))
-        sns.lineplot(data=df, x=df.index, y=sensor_name, label=sensor_name)
-        plt.title(f'Anomaly Detection for {sensor_name}')
-        plt.xlabel('Time')
-        plt.ylabel('Sensor Value')
-        plt.legend()
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        plot_file = os.path.join(self.data_dir, f'anomaly_plot_{sensor_name}.png')
-        plt.savefig(plot_file)
-        plt.close()
-        logging.info("Anomaly plot saved to %s", plot_file)
-        
-        return plot_file
+        return AnomalyPlotRenderer(self.data_dir).render(df, sensor_name, predictions)
 
-    def process_new_data(self, file_path):
+    def process_new_data(self, file_path, stream_id=DEFAULT_STREAM):
         """
         Process the new data using the trained model and return predictions.
 
         :param file_path: Path to the new data CSV file.
+        :param stream_id: Stream the file belongs to; rolling features continue from the stream's previous file.
         :returns: Predictions for the new data.
         :raises: Exception if processing fails.
         :sol: Single Responsibility Principle (SRP)
@@ -167,22 +335,184 @@ class ModelPipeline:
         """
         logging.info("Processing new data from %s", file_path)
         try:
-            model = joblib.load(self.model_path)
-            new_data = pd.read_csv(file_path)
-            new_data['timestamp'] = pd.to_datetime(new_data['timestamp'], errors='coerce')
-            new_data = new_data.dropna(subset=['timestamp'])
-            new_data.set_index('timestamp', inplace=True)
-            new_data.drop(columns=['Unnamed: 0'], errors='ignore', inplace=True)
-            X_new = new_data.drop(columns=['machine_status'])
-            if self.scaler is None:
-                raise ValueError("Scaler not available. Please train the model and apply transformation first.")
-            X_new = self.scaler.transform(X_new)
-            predictions = model.predict(X_new)
+            bundle = self.load_bundle()
+            with timed(self.metrics, 'parse'):
+                new_data, self.last_ingestion_report = read_sensor_csv(file_path, usecols=bundle.feature_columns,
+                                                                       with_status=False)
+            with timed(self.metrics, 'scale'):
+                X = bundle.transform(new_data, stream_id)
+            with timed(self.metrics, 'predict'):
+                predictions = bundle.predict_scaled(X)
             return predictions
         except Exception as e:
             logging.error("Error processing new data: %s", e)
             raise
 
+    def iter_new_data(self, file_path, chunk_size, start_row=0):
+        """
+        Read new data in chunks of rows, preprocessing each chunk the same way as process_new_data.
+
+        The ingestion report of the file is available as last_ingestion_report while the chunks are
+        consumed; its rows_read counts the raw rows read after start_row.
+
+        :param file_path: Path to the new data CSV file.
+        :param chunk_size: Number of rows read per chunk.
+        :param start_row: Number of data rows at the start of the file to skip, e.g. when resuming.
+        :returns: Generator yielding one preprocessed DataFrame per chunk, read with only the model's feature columns.
+        :sol: Single Responsibility Principle (SRP)
+        :rep: Chunked reading is kept apart from scoring so that only one chunk is held in memory at a time.
+        """
+        bundle = self.load_bundle()
+        self.last_ingestion_report = IngestionReport(str(file_path))
+        return iter_sensor_csv(file_path, chunk_size, usecols=bundle.feature_columns, with_status=False,
+                               report=self.last_ingestion_report, start_row=start_row)
+
+    def process_new_data_streaming(self, file_path, output_path, chunk_size=50000, stream_id=DEFAULT_STREAM,
+                                   start_row=0, checkpoint=None):
+        """
+        Score new data chunk by chunk and append the predictions to the output file,
+        so peak memory is bounded by the chunk size instead of the file size.
+
+        :param file_path: Path to the new data CSV file.
+        :param output_path: Path of the CSV file the predictions are written to.
+        :param chunk_size: Number of rows read, scaled and predicted at a time.
+        :param stream_id: Stream the file belongs to; rolling features continue across chunks and files.
+        :param start_row: Number of data rows already scored; they are skipped and the predictions are
+            appended to the existing output file, which must end exactly after their predictions. With a
+            feature engine the rows before start_row warm up the rolling windows first, see _warm_up.
+        :param checkpoint: Optional callable called after every written chunk with the number of raw data
+            rows scored so far (including start_row) and the size of the output file in bytes.
+        :returns: Dictionary with the number of rows, elapsed seconds, rows per second and peak RSS in MB.
+        :raises: Exception if processing fails.
+        :sol: Single Responsibility Principle (SRP)
+        :rep: Streaming inference is a separate method, leaving the in-memory process_new_data unchanged.
+        """
+        logging.info("Streaming new data from %s in chunks of %d rows", file_path, chunk_size)
+        try:
+            bundle = self.load_bundle()
+            start = time.perf_counter()
+            rows = 0
+            write_header = not start_row
+            self._warm_up(bundle, file_path, start_row, stream_id)
+            chunks = self.iter_new_data(file_path, chunk_size, start_row)
+            while True:
+                with timed(self.metrics, 'parse'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                with timed(self.metrics, 'scale'):
+                    X = bundle.transform(chunk, stream_id)
+                with timed(self.metrics, 'predict'):
+                    predictions = bundle.predict_scaled(X)
+                with timed(self.metrics, 'write'):
+                    pd.DataFrame(predictions, columns=['predictions']).to_csv(
+                        output_path, mode='w' if write_header else 'a', header=write_header, index=False)
+                write_header = False
+                rows += len(chunk)
+                if checkpoint is not None:
+                    checkpoint(start_row + self.last_ingestion_report.rows_read, os.path.getsize(output_path))
+            if write_header:
+                pd.DataFrame(columns=['predictions']).to_csv(output_path, index=False)
+            elapsed = time.perf_counter() - start
+            stats = {
+                'rows': rows,
+                'seconds': elapsed,
+                'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+                'peak_rss_mb': peak_rss_mb(),
+            }
+            logging.info("Streamed %d rows in %.2f s (%.0f rows/s, peak RSS %s MB)",
+                         rows, elapsed, stats['rows_per_second'], stats['peak_rss_mb'])
+            return stats
+        except Exception as e:
+            logging.error("Error streaming new data: %s", e)
+            raise
+
+    def score_frames(self, file_path, chunk_size=None, stream_id=DEFAULT_STREAM, start_row=0):
+        """
+        Score new data and yield the predictions with their timestamps and class probabilities.
+
+        The predicted class is the one with the highest probability, as in the forest's predict,
+        so both are computed from one pass over the trees.
+
+        :param file_path: Path to the new data CSV file.
+        :param chunk_size: Number of rows scored at a time; None scores the whole file at once.
+        :param stream_id: Stream the file belongs to; rolling features continue across chunks and files.
+        :param start_row: Number of data rows at the start of the file to skip; only used with chunk_size.
+            With a feature engine the rows before start_row warm up the rolling windows first, see _warm_up.
+        :returns: Generator of DataFrames indexed by timestamp, with a predictions column and one
+            proba_<class> column per class.
+        :sol: Open/Closed Principle (OCP)
+        :rep: Output sinks consume these frames without changing how the data is read or scored.
+        """
+        bundle = self.load_bundle()
+        classes = bundle.model.classes_
+
+        def read_whole_file():
+            df, self.last_ingestion_report = read_sensor_csv(file_path, usecols=bundle.feature_columns,
+                                                             with_status=False)
+            yield df
+
+        if chunk_size:
+            self._warm_up(bundle, file_path, start_row, stream_id)
+            chunks = self.iter_new_data(file_path, chunk_size, start_row)
+        else:
+            chunks = read_whole_file()
+        while True:
+            with timed(self.metrics, 'parse'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            with timed(self.metrics, 'scale'):
+                X = bundle.transform(chunk, stream_id)
+            with timed(self.metrics, 'predict'):
+                proba = bundle.predict_proba_scaled(X)
+            frame = pd.DataFrame(proba.astype(np.float32), index=chunk.index,
+                                 columns=[f'proba_{label}' for label in classes])
+            frame.insert(0, 'predictions', classes.take(np.argmax(proba, axis=1)) if len(proba) else [])
+            yield frame
+
+    def _warm_up(self, bundle, file_path, start_row, stream_id):
+        """
+        Pass the rows just before start_row through the bundle's feature engine and discard their features.
+
+        A file resumed after a checkpoint, e.g. in a new process, then continues with the same rolling
+        windows as an uninterrupted run. The engine keeps its last history rows, so reading that many
+        raw rows before start_row restores its state; when start_row is smaller than history, the rows
+        of the stream's previous file that an uninterrupted run would carry over are not restored.
+
+        :param bundle: ModelBundle scoring the file.
+        :param file_path: Path to the new data CSV file.
+        :param start_row: Number of data rows at the start of the file that are skipped.
+        :param stream_id: Stream the file belongs to.
+        """
+        engine = bundle.feature_engine
+        if not start_row or engine is None:
+            return
+        first_row = max(0, start_row - engine.history)
+        chunks = iter_sensor_csv(file_path, start_row - first_row, usecols=bundle.feature_columns,
+                                 with_status=False, start_row=first_row)
+        warm_up = next(chunks, None)
+        chunks.close()
+        if warm_up is not None:
+            bundle.features(warm_up, stream_id)
+        logging.info("Warmed up the rolling features of %s with rows %d to %d", file_path, first_row, start_row)
+
+    def load_bundle(self):
+        """
+        Return the ModelBundle used for scoring, reading it from model_path on first use.
+
+        :returns: The loaded ModelBundle.
+        :raises: ValueError if the file at model_path is not a ModelBundle.
+        :sol: Single Responsibility Principle (SRP)
+        :rep: Access to the persisted scaler and model goes through one place, so it is read from disk at most once.
+        """
+        if self.bundle is None:
+            self.bundle = ModelBundle.load(self.model_path)
+            self.scaler = self.bundle.scaler
+            self.model = self.bundle.model
+            self.feature_columns = self.bundle.feature_columns
+        return self.bundle
+
     def run_pipeline(self, input_data_path):
         """
         Execute the full model pipeline: data loading, splitting, transformation,
@@ -204,17 +534,19 @@ class ModelPipeline:
         print(f"Anomaly plot for sensor_04 saved to {plot_file_04}")
         print(f"Anomaly plot for sensor_51 saved to {plot_file_51}")
         
-        predictions = self.process_new_data(os.path.join(self.data_dir, 'test_data_august.csv'))
+        predictions = self.load_bundle().predict(self.test_df)
         print("Predictions for new data:\n", predictions)
         
 # #Single Responsibility Principle (SRP)
 # Each method in the ModelPipeline class is responsible for a single part of the functionality:
 
-# load_data: Responsible for loading and preprocessing the data.
-# split_data: Handles the splitting of data into training and validation sets.
+# load_data: Responsible for loading and preprocessing the data, backed by the columnar SensorCache.
+# split_data: Handles the time-ordered splitting of data into training and validation sets, after optional feature selection.
 # transform_data: Takes care of scaling the data.
 # train_model: Manages the training of the model and saving it.
+# incremental_update: Extends the saved model with newly labelled data.
 # evaluate_model: Evaluates the model using the validation data and logs the results.
+# backtest: Evaluates model configurations on rolling monthly folds in parallel processes.
 # plot_sensor_anomalies: Plots and saves sensor anomaly data.
 # process_new_data: Processes new data for predictions.
 # run_pipeline: Orchestrates the entire pipeline by calling the other methods in sequence.
@@ -225,5 +557,5 @@ class ModelPipeline:
 # Interface Segregation Principle (ISP)
 # The class methods are highly specific and only perform one task, ensuring that any changes or extensions will not affect unrelated parts of the class.
 # Dependency Inversion Principle (DIP)
-# The class depends on abstractions (interfaces) rather than concrete implementations. It uses standard libraries (joblib, pandas, logging, matplotlib, seaborn, sklearn) which can be easily replaced or mocked for testing.
+# The class depends on abstractions (interfaces) rather than concrete implementations. It uses standard libraries (joblib, pandas, logging, matplotlib, sklearn) which can be easily replaced or mocked for testing.
 # Conclusion
@@ -0,0 +1,233 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Optional
+from metrics import timed
+
+# matplotlib is imported inside the functions that draw, so scoring-only processes never load it
+
+# Colour of the shaded intervals per predicted machine status; NORMAL is not shaded
+STATUS_COLOURS = {'BROKEN': 'tab:red', 'RECOVERING': 'tab:orange'}
+
+
+def minmax_decimate(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Select the indices of the minimum and maximum of each of n_buckets equal slices of y.
+
+    Keeps every spike visible while reducing the series to at most 2 * n_buckets points.
+
+    Args:
+        y (np.ndarray): Series values; NaNs are ignored unless a whole bucket is NaN.
+        n_buckets (int): Number of buckets, usually the pixel width of the plot.
+
+    Returns:
+        np.ndarray: Sorted indices into y.
+    """
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    size = n // n_buckets
+    body = y[:size * n_buckets].reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    low = np.argmin(np.where(np.isnan(body), np.inf, body), axis=1) + offsets
+    high = np.argmax(np.where(np.isnan(body), -np.inf, body), axis=1) + offsets
+    indices = np.concatenate([low, high, np.arange(size * n_buckets, n)])
+    return np.unique(indices)
+
+
+def lttb_decimate(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Select n_out points with the Largest-Triangle-Three-Buckets algorithm.
+
+    Args:
+        x (np.ndarray): Numeric x values, increasing.
+        y (np.ndarray): Series values; NaNs are treated as 0 when choosing points.
+        n_out (int): Number of points to keep, including the first and the last.
+
+    Returns:
+        np.ndarray: Sorted indices into y.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean() if next_end > end else x[-1]
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        indices[i + 1] = previous
+    return indices
+
+
+def status_intervals(index: pd.DatetimeIndex, predictions) -> dict:
+    """
+    Collapse per-row predictions into time intervals per non-normal status.
+
+    Args:
+        index (pd.DatetimeIndex): Timestamps of the rows.
+        predictions: Predicted status per row.
+
+    Returns:
+        dict: Status name to list of (start, width) tuples in matplotlib date numbers.
+    """
+    import matplotlib.dates as mdates
+
+    labels = np.asarray(predictions).astype(str)
+    if len(labels) == 0:
+        return {}
+    times = mdates.date2num(index.values)
+    step = np.median(np.diff(times)) if len(times) > 1 else 1 / 1440
+    # Every run ends where the next row starts, the last one step after its last row
+    ends = np.append(times[1:], times[-1] + step)
+    changes = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    starts = np.concatenate([[0], changes])
+    stops = np.concatenate([changes, [len(labels)]])
+    intervals = {}
+    for start, stop in zip(starts, stops):
+        status = labels[start]
+        if status in STATUS_COLOURS:
+            intervals.setdefault(status, []).append((times[start], ends[stop - 1] - times[start]))
+    return intervals
+
+
+class AnomalyPlotRenderer:
+    """
+    Renders sensor plots with the predicted anomaly intervals shaded.
+
+    Every plot gets its own Figure drawn on an Agg canvas, without the global pyplot state,
+    so plots can be rendered concurrently from several threads or processes. Series are
+    decimated to the pixel width of the image before drawing.
+
+    Attributes:
+        output_dir (str): Directory the PNG files are written to.
+        width_px (int): Width of the image in pixels.
+        height_px (int): Height of the image in pixels.
+        dpi (int): Resolution of the image.
+        method (str): Decimation method, 'minmax' or 'lttb'.
+        metrics (MetricsRegistry): Optional registry receiving the duration of every plot rendered by render_many.
+    """
+    def __init__(self, output_dir: str, width_px: int = 1400, height_px: int = 700, dpi: int = 100,
+                 method: str = 'minmax', metrics=None):
+        """
+        initializes the renderer.
+
+        Args:
+            output_dir (str): Directory the PNG files are written to.
+            width_px (int): Width of the image in pixels.
+            height_px (int): Height of the image in pixels.
+            dpi (int): Resolution of the image.
+            method (str): Decimation method, 'minmax' or 'lttb'.
+            metrics (MetricsRegistry): Optional registry receiving the duration of every plot rendered by render_many.
+        """
+        if method not in ('minmax', 'lttb'):
+            raise ValueError(f"Unknown decimation method: {method}")
+        self.output_dir = output_dir
+        self.width_px = width_px
+        self.height_px = height_px
+        self.dpi = dpi
+        self.method = method
+        self.metrics = metrics
+
+    def decimate(self, index: pd.DatetimeIndex, values: np.ndarray) -> np.ndarray:
+        """
+        Select the row indices to draw for a series.
+
+        Args:
+            index (pd.DatetimeIndex): Timestamps of the rows.
+            values (np.ndarray): Series values.
+
+        Returns:
+            np.ndarray: Sorted row indices.
+        """
+        if self.method == 'lttb':
+            return lttb_decimate(index.asi8, values, 2 * self.width_px)
+        return minmax_decimate(values, self.width_px)
+
+    def render(self, df: pd.DataFrame, sensor_name: str, predictions=None, plot_file: Optional[str] = None) -> str:
+        """
+        Plot one sensor and save it as a PNG file.
+
+        Args:
+            df (pd.DataFrame): Sensor data indexed by timestamp.
+            sensor_name (str): Column to plot.
+            predictions: Optional predicted status per row of df; non-normal intervals are shaded.
+            plot_file (Optional[str]): Path of the image; defaults to anomaly_plot_<sensor>.png in output_dir.
+
+        Returns:
+            str: Path to the saved plot image file.
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        if sensor_name not in df.columns:
+            raise ValueError(f"Sensor {sensor_name} not found in the data.")
+        index = pd.DatetimeIndex(df.index)
+        values = df[sensor_name].to_numpy(dtype=np.float64)
+        keep = self.decimate(index, values)
+
+        figure = Figure(figsize=(self.width_px / self.dpi, self.height_px / self.dpi), dpi=self.dpi)
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        ax.plot(index[keep], values[keep], linewidth=0.8, label=sensor_name)
+        if predictions is not None:
+            for status, spans in status_intervals(index, predictions).items():
+                ax.broken_barh(spans, (0, 1), transform=ax.get_xaxis_transform(),
+                               facecolors=STATUS_COLOURS[status], alpha=0.3, label=f'predicted {status}')
+        ax.set_title(f'Anomaly Detection for {sensor_name}')
+        ax.set_xlabel('Time')
+        ax.set_ylabel('Sensor Value')
+        ax.legend(loc='upper right')
+        ax.tick_params(axis='x', labelrotation=45)
+        figure.tight_layout()
+
+        plot_file = plot_file or os.path.join(self.output_dir, f'anomaly_plot_{sensor_name}.png')
+        figure.savefig(plot_file)
+        logging.info("Anomaly plot saved to %s", plot_file)
+        return plot_file
+
+    def render_many(self, df: pd.DataFrame, sensors: List[str], predictions=None, prefix: str = '',
+                    executor: Optional[Executor] = None) -> List[str]:
+        """
+        Plot several sensors in parallel.
+
+        Args:
+            df (pd.DataFrame): Sensor data indexed by timestamp.
+            sensors (List[str]): Columns to plot; sensors missing from df are skipped with a warning.
+            predictions: Optional predicted status per row of df.
+            prefix (str): Prefix of the file names, e.g. the name of the input file.
+            executor (Optional[Executor]): Pool to render on; a temporary thread pool if None.
+
+        Returns:
+            List[str]: Paths to the saved plot image files.
+        """
+        missing = [sensor for sensor in sensors if sensor not in df.columns]
+        if missing:
+            logging.warning("Skipping plots of sensors not in the data: %s", missing)
+        sensors = [sensor for sensor in sensors if sensor in df.columns]
+        own_executor = executor is None
+        executor = executor or ThreadPoolExecutor(max_workers=max(1, len(sensors)))
+
+        def render(df, sensor, predictions, plot_file):
+            with timed(self.metrics, 'plot', sensor=sensor):
+                return self.render(df, sensor, predictions, plot_file)
+
+        try:
+            futures = [executor.submit(render, df, sensor, predictions,
+                                       os.path.join(self.output_dir, f'{prefix}anomaly_plot_{sensor}.png'))
+                       for sensor in sensors]
+            return [future.result() for future in futures]
+        finally:
+            if own_executor:
+                executor.shutdown()
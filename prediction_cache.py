@@ -0,0 +1,204 @@
+import os
+import logging
+import threading
+import pandas as pd
+from collections import OrderedDict
+from typing import Optional
+
+# Suffix of the cache entry files
+ENTRY_SUFFIX = '.pkl'
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of the scored frames of whole input files, with size-based LRU eviction.
+
+    An entry is keyed by the sha256 digest of the input file's content and the digest of the model
+    artifact that scored it, so a re-sent export is answered from the cache and a hot-swapped model
+    never sees the predictions of its predecessor. When a new model digest shows up, the entries of
+    the previous model are dropped. Bundles with a rolling feature engine are not cached, as their
+    predictions also depend on the previous file of the stream. Entries are pickled DataFrames, written under a temporary name
+    and renamed into place; the least recently used ones are removed once the cache exceeds max_bytes.
+
+    Attributes:
+        cache_dir (str): Directory holding the entries.
+        max_bytes (int): Largest total size of the entries.
+        max_entry_bytes (int): Largest in-memory size of a file's frames that is still cached.
+        metrics (MetricsRegistry): Optional registry receiving the hit, miss and eviction counters.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 ** 3, max_entry_bytes: Optional[int] = None,
+                 metrics=None):
+        """
+        initializes the cache and indexes the entries already on disk, oldest access first.
+
+        Args:
+            cache_dir (str): Directory holding the entries; created if needed.
+            max_bytes (int): Largest total size of the entries.
+            max_entry_bytes (Optional[int]): Largest in-memory size of a file's frames that is still cached;
+                max_bytes / 8 if None.
+            metrics (MetricsRegistry): Optional registry receiving the hit, miss and eviction counters.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self.metrics = metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._bytes = 0
+        self._model_key = None
+        os.makedirs(cache_dir, exist_ok=True)
+        found = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if not name.endswith(ENTRY_SUFFIX):
+                if name.endswith('.tmp'):
+                    os.remove(path)
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_atime, name[:-len(ENTRY_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        if metrics is not None:
+            metrics.gauge('prediction_cache_bytes', "Total size of the prediction cache entries.", lambda: self._bytes)
+            metrics.gauge('prediction_cache_entries', "Number of prediction cache entries.",
+                          lambda: len(self._entries))
+
+    @staticmethod
+    def key(content_digest: str, model_digest: str) -> str:
+        """
+        Return the key of a file's entry: the content digest, then the first 16 characters of the model digest.
+        """
+        return f'{content_digest}-{model_digest[:16]}'
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def _count(self, name: str, help: str):
+        if self.metrics is not None:
+            self.metrics.counter(name, help).inc()
+
+    def _switch_model(self, model_digest: str):
+        """
+        Drop the entries of other models when a new model digest is seen. Called with the lock held.
+        """
+        model_key = model_digest[:16]
+        if model_key == self._model_key:
+            return
+        stale = [key for key in self._entries if not key.endswith('-' + model_key)]
+        if self._model_key is not None and stale:
+            logging.info("Model changed, invalidating %d prediction cache entries", len(stale))
+        for key in stale:
+            self._remove(key)
+        self._model_key = model_key
+
+    def _remove(self, key: str):
+        """
+        Forget an entry and delete its file. Called with the lock held.
+        """
+        self._bytes -= self._entries.pop(key)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, content_digest: str, model_digest: str) -> Optional[pd.DataFrame]:
+        """
+        Return the cached frames of a file, or None on a miss.
+
+        Args:
+            content_digest (str): sha256 digest of the input file.
+            model_digest (str): Digest of the model artifact scoring the file.
+
+        Returns:
+            Optional[pd.DataFrame]: The frames of the file, as produced by ModelPipeline.score_frames.
+        """
+        key = self.key(content_digest, model_digest)
+        with self._lock:
+            self._switch_model(model_digest)
+            known = key in self._entries
+            if known:
+                self._entries.move_to_end(key)
+        frame = None
+        if known:
+            try:
+                frame = pd.read_pickle(self._path(key))
+                os.utime(self._path(key))
+            except Exception as e:
+                logging.warning("Dropping unreadable prediction cache entry %s: %s", key, e)
+                with self._lock:
+                    if key in self._entries:
+                        self._remove(key)
+        with self._lock:
+            if frame is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if frame is None:
+            self._count('prediction_cache_misses_total', "Input files not found in the prediction cache.")
+        else:
+            self._count('prediction_cache_hits_total', "Input files answered from the prediction cache.")
+        return frame
+
+    def put(self, content_digest: str, model_digest: str, frame: pd.DataFrame):
+        """
+        Store the frames of a file and evict least recently used entries beyond max_bytes.
+
+        Args:
+            content_digest (str): sha256 digest of the input file.
+            model_digest (str): Digest of the model artifact that scored the file.
+            frame (pd.DataFrame): The file's frames concatenated, as produced by ModelPipeline.score_frames.
+        """
+        key = self.key(content_digest, model_digest)
+        path = self._path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        frame.to_pickle(tmp_path)
+        size = os.path.getsize(tmp_path)
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, path)
+        evicted = 0
+        with self._lock:
+            self._switch_model(model_digest)
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                evicted += 1
+            self.evictions += evicted
+        if evicted and self.metrics is not None:
+            self.metrics.counter('prediction_cache_evictions_total',
+                                 "Entries evicted from the prediction cache.").inc(evicted)
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the cache's counters.
+
+        Returns:
+            dict: hits, misses, evictions, entries, bytes and hit_ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
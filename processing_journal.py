@@ -0,0 +1,152 @@
+import os
+import time
+import sqlite3
+import logging
+from typing import Optional
+
+# Status of a journal entry
+PROCESSING = 'processing'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ProcessingJournal:
+    """
+    Crash-safe record of which input files have been scored, in a SQLite database in WAL mode.
+
+    Files are identified by the sha256 digest of their content, so a file that is re-sent under
+    another name, or moved back by a claim reclaim, is still recognized. For every file the journal
+    keeps its status, the number of raw CSV data rows whose predictions are persisted (row_offset)
+    and, for per-file predictions CSVs, the size of the output file at that point. Every update
+    is committed immediately with synchronous=FULL, so a checkpoint that was recorded survives a
+    crash or power loss.
+
+    Attributes:
+        path (str): Path of the database file.
+    """
+    def __init__(self, path: str):
+        """
+        initializes the journal and creates its table if needed.
+
+        Args:
+            path (str): Path of the database file.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS files (digest TEXT PRIMARY KEY, source TEXT, '
+                               'status TEXT NOT NULL, row_offset INTEGER NOT NULL DEFAULT 0, output_bytes INTEGER, '
+                               'rows INTEGER, error TEXT, started REAL, updated REAL)')
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call, so the journal can be used from any thread or process
+        connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        connection.execute('PRAGMA synchronous=FULL')
+        return connection
+
+    def _execute(self, sql: str, parameters: tuple = ()):
+        """
+        Run one statement in its own transaction.
+        """
+        connection = self._connect()
+        try:
+            connection.execute(sql, parameters)
+        finally:
+            connection.close()
+
+    def lookup(self, digest: str) -> Optional[dict]:
+        """
+        Return the journal entry of a file.
+
+        Args:
+            digest (str): sha256 digest of the file content.
+
+        Returns:
+            Optional[dict]: digest, source, status, row_offset, output_bytes, rows, error, started and
+            updated; None if the file was never started.
+        """
+        connection = self._connect()
+        try:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute('SELECT * FROM files WHERE digest = ?', (digest,)).fetchone()
+        finally:
+            connection.close()
+        return dict(row) if row is not None else None
+
+    def start(self, digest: str, source: str) -> dict:
+        """
+        Mark a file as being processed, keeping the checkpoint of an earlier, interrupted attempt.
+
+        Args:
+            digest (str): sha256 digest of the file content.
+            source (str): Name of the input file.
+
+        Returns:
+            dict: The entry after the update, see lookup.
+        """
+        now = time.time()
+        self._execute('INSERT INTO files (digest, source, status, started, updated) VALUES (?, ?, ?, ?, ?) '
+                      'ON CONFLICT(digest) DO UPDATE SET source = excluded.source, status = excluded.status, '
+                      'error = NULL, updated = excluded.updated', (digest, source, PROCESSING, now, now))
+        return self.lookup(digest)
+
+    def checkpoint(self, digest: str, row_offset: int, output_bytes: Optional[int] = None):
+        """
+        Record that the predictions of the first row_offset data rows of a file are persisted.
+
+        Args:
+            digest (str): sha256 digest of the file content.
+            row_offset (int): Number of raw data rows, header excluded, whose predictions are persisted.
+            output_bytes (Optional[int]): Size of the predictions CSV after those rows.
+        """
+        self._execute('UPDATE files SET row_offset = ?, output_bytes = ?, updated = ? WHERE digest = ?',
+                      (row_offset, output_bytes, time.time(), digest))
+
+    def complete(self, digest: str, rows: int):
+        """
+        Mark a file as completely processed.
+
+        Args:
+            digest (str): sha256 digest of the file content.
+            rows (int): Number of raw data rows in the file.
+        """
+        self._execute('UPDATE files SET status = ?, row_offset = ?, rows = ?, updated = ? WHERE digest = ?',
+                      (DONE, rows, rows, time.time(), digest))
+
+    def fail(self, digest: str, error: str):
+        """
+        Mark a file as failed; its checkpoint is kept, so a retry resumes from it.
+
+        Args:
+            digest (str): sha256 digest of the file content.
+            error (str): Error message.
+        """
+        self._execute('UPDATE files SET status = ?, error = ?, updated = ? WHERE digest = ?',
+                      (FAILED, error, time.time(), digest))
+
+    def prune(self, max_age_seconds: float) -> int:
+        """
+        Forget completed files last updated more than max_age_seconds ago.
+
+        Args:
+            max_age_seconds (float): Age after which completed entries are removed.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        connection = self._connect()
+        try:
+            cursor = connection.execute('DELETE FROM files WHERE status = ? AND updated < ?',
+                                        (DONE, time.time() - max_age_seconds))
+            removed = cursor.rowcount
+        finally:
+            connection.close()
+        if removed:
+            logging.info("Pruned %d completed entries from the processing journal", removed)
+        return removed
@@ -1,15 +1,97 @@
 import os
 import json
 import logging
+import numpy as np
 import pandas as pd
 import time
+import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from pipeline_model import ModelPipeline
+from inference import score_file, score_file_journaled
+from model_bundle import ModelBundle, ModelBundleManager
+from scheduler import WorkScheduler
+from plot_renderer import AnomalyPlotRenderer
+from ingestion import read_sensor_csv
+from metrics import MetricsRegistry, MetricsExporter, timed
+from output_sinks import make_sink
+from runtime_stats import memory_mb
+from file_claims import FileClaimer, claim_file
+from processing_journal import ProcessingJournal
+from prediction_cache import PredictionCache
+from file_profiler import FileProfiler, PROFILES_DIR
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from typing import List, Optional
 
+# Model bundle, output sink and bundle load time of a backlog worker process, set once by _init_backlog_worker
+_worker_bundle = None
+_worker_sink = None
+_worker_load_seconds = None
+
+
+def _init_backlog_worker(model_path: str, n_jobs: int, output_sink: str = 'csv', output_dir: str = None,
+                         batch_rows: int = 100_000, mmap_mode: Optional[str] = None):
+    """
+    Load the model bundle once per backlog worker process and limit the forest's threads.
+
+    Args:
+        model_path (str): Path to the model bundle.
+        n_jobs (int): Number of threads the forest may use inside this process.
+        output_sink (str): Kind of output sink, see make_sink.
+        output_dir (str): Output directory the sink writes into.
+        batch_rows (int): Number of buffered rows that triggers a write of the sink.
+        mmap_mode (Optional[str]): If set, the forest is memory-mapped from the bundle's shared copy.
+    """
+    global _worker_bundle, _worker_sink, _worker_load_seconds
+    start = time.perf_counter()
+    _worker_bundle = ModelBundle.load(model_path, mmap_mode=mmap_mode)
+    _worker_load_seconds = time.perf_counter() - start
+    if hasattr(_worker_bundle.model, 'n_jobs'):
+        _worker_bundle.model.n_jobs = n_jobs
+    _worker_sink = make_sink(output_sink, output_dir, batch_rows)
+    memory = memory_mb()
+    logging.info("Backlog worker %d loaded model bundle in %.3f s (shared: %s, RSS %s MB, PSS %s MB)", os.getpid(),
+                 _worker_load_seconds, _worker_bundle.shared, memory['rss'], memory['pss'])
+
+
+def _drain_file(file_path: str, model_path: str, data_dir: str, output_dir: str, chunk_size: Optional[int],
+                claim_dir: Optional[str] = None, journal_path: Optional[str] = None) -> Optional[dict]:
+    """
+    Score and remove one backlog file inside a worker process.
+
+    With claim_dir the file is first claimed for the pipeline instance, see FileClaimer. With
+    journal_path its progress is recorded in the ProcessingJournal, see score_file_journaled.
+
+    Returns:
+        Optional[dict]: rows scored, and the worker's pid, bundle load seconds and current RSS and PSS in MB;
+        None if another instance claimed the file first.
+    """
+    if claim_dir is not None:
+        file_path = claim_file(file_path, claim_dir)
+        if file_path is None:
+            return None
+    model_pipeline = ModelPipeline(model_path=model_path, data_dir=data_dir, bundle=_worker_bundle)
+    if journal_path is None:
+        rows = score_file(model_pipeline, file_path, output_dir, chunk_size, sink=_worker_sink)
+        commit = None
+    else:
+        result = score_file_journaled(model_pipeline, file_path, output_dir, ProcessingJournal(journal_path),
+                                      chunk_size, sink=_worker_sink)
+        rows, commit = (0, None) if result is None else (result['rows'], result['commit'])
+    if _worker_sink is not None:
+        # A worker process can exit at any time, so its rows are persisted before the input is removed
+        _worker_sink.flush()
+    if commit is not None:
+        commit()
+    os.remove(file_path)
+    logging.info("Removed original data file %s", file_path)
+    memory = memory_mb()
+    return {'rows': rows, 'pid': os.getpid(), 'load_seconds': _worker_load_seconds,
+            'rss_mb': memory['rss'], 'pss_mb': memory['pss']}
+
+
 class BasePipeline(ABC):
     """
     abstract base class for pipeline processing with common functionality.
@@ -22,6 +104,41 @@ class BasePipeline(ABC):
         sensors_to_plot (List[str]): List of sensors for which anomalies will be plotted.
         check_interval (int): Interval in seconds for checking new files.
         model_path (str): Path to the model file.
+        model_reload_interval (float): Interval in seconds for checking the model file for changes.
+        chunk_size (Optional[int]): Rows per chunk for streaming inference; None scores each file in one go.
+        backlog_workers (Optional[int]): Number of processes used to drain the backlog; None uses all cores.
+        scoring_workers (int): Number of threads scoring new files.
+        render_workers (int): Number of threads rendering plots.
+        max_queue_size (int): Maximum number of stable files waiting for a scoring thread.
+        stability_interval (float): Seconds between two size/mtime checks of a new file.
+        stability_checks (int): Number of unchanged checks after which a new file is considered completely written.
+        flat_forest_max_batch (Optional[int]): If set, batches up to this size are scored with the compiled FlatForest.
+        metrics_port (Optional[int]): Local port serving the metrics in Prometheus text format at /metrics; None disables it
+            and 0 binds a free port, so several instances on one host never collide.
+        metrics_file (Optional[str]): File the metrics are periodically written to in the same format; None disables it.
+        metrics_flush_interval (float): Seconds between two writes of metrics_file.
+        output_sink (str): Where predictions go: 'csv' (one predictions CSV per input file), 'parquet'
+            (date-partitioned dataset) or 'sqlite' (WAL-mode table), see output_sinks.
+        output_batch_rows (int): Number of buffered prediction rows that triggers a write of the parquet or sqlite sink.
+        compaction_interval (Optional[float]): Seconds between two compactions of the parquet dataset; None disables it.
+        shared_model (bool): Whether scoring threads and backlog processes memory-map one read-only copy of the
+            forest written by train_model instead of each unpickling their own, see ModelBundle.load.
+        claim_files (bool): Whether files are claimed before processing, so several instances can share one
+            input directory, see FileClaimer.
+        instance_id (Optional[str]): Name of this instance's claim directory; host name and pid if None.
+        lease_timeout (float): Seconds without a heartbeat after which another instance's claimed files are reclaimed.
+        claim_max_attempts (int): Failed attempts after which a claimed file is moved to the input directory's
+            .failed directory instead of back into the input directory.
+        journal_path (Optional[str]): SQLite database recording the progress of every file, so files already
+            processed are skipped and interrupted ones resume from their last chunk; None disables it.
+        prediction_cache_dir (Optional[str]): Directory of the content-addressed prediction cache answering
+            re-sent files without scoring them, see PredictionCache; None disables it.
+        prediction_cache_bytes (int): Largest total size of the prediction cache; least recently used entries are evicted.
+        profile_every (int): Process every n-th file under cProfile and tracemalloc, see FileProfiler; 0 disables it.
+        profile_min_bytes (Optional[int]): Also profile files at least this large; None disables it.
+        profile_dir (Optional[str]): Directory the profiles are written to (config key profile_directory);
+            output_dir/profiles if None.
+        profile_top_allocations (int): Number of source lines listed in an allocation report.
     """
     def __init__(self, config_path: str):
         """
@@ -37,6 +154,33 @@ class BasePipeline(ABC):
         self.sensors_to_plot = []
         self.check_interval = 30
         self.model_path = None
+        self.model_reload_interval = 5.0
+        self.chunk_size = None
+        self.backlog_workers = None
+        self.scoring_workers = 4
+        self.render_workers = 4
+        self.max_queue_size = 100
+        self.stability_interval = 1.0
+        self.stability_checks = 2
+        self.flat_forest_max_batch = None
+        self.metrics_port = None
+        self.metrics_file = None
+        self.metrics_flush_interval = 15.0
+        self.output_sink = 'csv'
+        self.output_batch_rows = 100_000
+        self.compaction_interval = 300.0
+        self.shared_model = False
+        self.claim_files = False
+        self.instance_id = None
+        self.lease_timeout = 60.0
+        self.claim_max_attempts = 3
+        self.journal_path = None
+        self.prediction_cache_dir = None
+        self.prediction_cache_bytes = 1024 ** 3
+        self.profile_every = 0
+        self.profile_min_bytes = None
+        self.profile_dir = None
+        self.profile_top_allocations = 25
         self.load_config()
         self.setup_logging()
 
@@ -65,6 +209,33 @@ class BasePipeline(ABC):
                 self.sensors_to_plot = config.get('sensors_to_plot', [])
                 self.check_interval = config.get('check_interval', 30)
                 self.model_path = config.get('model_path', 'model.pkl')
+                self.model_reload_interval = config.get('model_reload_interval', 5.0)
+                self.chunk_size = config.get('chunk_size')
+                self.backlog_workers = config.get('backlog_workers')
+                self.scoring_workers = config.get('scoring_workers', 4)
+                self.render_workers = config.get('render_workers', 4)
+                self.max_queue_size = config.get('max_queue_size', 100)
+                self.stability_interval = config.get('stability_interval', 1.0)
+                self.stability_checks = config.get('stability_checks', 2)
+                self.flat_forest_max_batch = config.get('flat_forest_max_batch')
+                self.metrics_port = config.get('metrics_port')
+                self.metrics_file = config.get('metrics_file')
+                self.metrics_flush_interval = config.get('metrics_flush_interval', 15.0)
+                self.output_sink = config.get('output_sink', 'csv')
+                self.output_batch_rows = config.get('output_batch_rows', 100_000)
+                self.compaction_interval = config.get('compaction_interval', 300.0)
+                self.shared_model = config.get('shared_model', False)
+                self.claim_files = config.get('claim_files', False)
+                self.instance_id = config.get('instance_id')
+                self.lease_timeout = config.get('lease_timeout', 60.0)
+                self.claim_max_attempts = config.get('claim_max_attempts', 3)
+                self.journal_path = config.get('journal_path')
+                self.prediction_cache_dir = config.get('prediction_cache_dir')
+                self.prediction_cache_bytes = config.get('prediction_cache_bytes', 1024 ** 3)
+                self.profile_every = config.get('profile_every', 0)
+                self.profile_min_bytes = config.get('profile_min_bytes')
+                self.profile_dir = config.get('profile_directory')
+                self.profile_top_allocations = config.get('profile_top_allocations', 25)
             logging.info("Configuration loaded.")
         except FileNotFoundError:
             logging.error("Configuration file not found.")
@@ -98,52 +269,418 @@ class ProductionPipeline(BasePipeline):
             config_path (str): Path to the configuration JSON file.
         """
         super().__init__(config_path)
-        self.executor = ThreadPoolExecutor(max_workers=4)  # Using parallelization for file processing
+        self.metrics = MetricsRegistry()
+        self.exporter = None
+        # Scoring and plotting use separate pools, so a scoring thread waiting for its plots can never starve them
+        self.scheduler = WorkScheduler(self.process_new_file, max_queue_size=self.max_queue_size,
+                                       workers=self.scoring_workers, stability_interval=self.stability_interval,
+                                       stability_checks=self.stability_checks, metrics=self.metrics)
+        self.render_executor = ThreadPoolExecutor(max_workers=self.render_workers)
+        self.renderer = AnomalyPlotRenderer(self.img_dir, metrics=self.metrics)
+        self.sink = make_sink(self.output_sink, self.output_dir, self.output_batch_rows)
+        self._register_gauges()
+        self._stop_event = threading.Event()
+        # Held while a file is scored with a feature engine, whose rolling state all files share
+        self._stream_lock = threading.Lock()
+        self.claimer = FileClaimer(self.input_dir, self.instance_id, self.lease_timeout,
+                                   self.claim_max_attempts) if self.claim_files else None
+        self.journal = ProcessingJournal(self.journal_path) if self.journal_path else None
+        # Keyed by the model artifact's digest as well, so a hot-swapped model invalidates the entries
+        self.prediction_cache = (PredictionCache(self.prediction_cache_dir, self.prediction_cache_bytes,
+                                                 metrics=self.metrics) if self.prediction_cache_dir else None)
+        self.profiler = None
+        if self.profile_every or self.profile_min_bytes is not None:
+            self.profiler = FileProfiler(self.profile_dir or os.path.join(self.output_dir, PROFILES_DIR),
+                                         every=self.profile_every, min_bytes=self.profile_min_bytes,
+                                         top_allocations=self.profile_top_allocations)
+        # The model bundle is loaded once and shared by all worker threads; it is swapped in place when the file changes.
+        self.bundle_manager = ModelBundleManager(self.model_path, check_interval=self.model_reload_interval,
+                                                 flat_forest_max_batch=self.flat_forest_max_batch,
+                                                 mmap_mode=self.mmap_mode)
+
+    @property
+    def mmap_mode(self) -> Optional[str]:
+        """
+        Optional[str]: Mode the forest arrays are memory-mapped in, or None to unpickle the model.
+        """
+        return 'r' if self.shared_model else None
 
     def process_new_file(self,file_path:str):
         """
         Process a new file by generating predictions and plots.
 
+        With a parquet or sqlite output sink the input file is only removed once its predictions
+        have been written by the sink, which batches the rows of several files. With claim_files
+        the file is claimed first and skipped if another instance claimed it, and given back with
+        FileClaimer.release if processing it fails. With a journal, a file
+        whose content was already processed is removed without scoring it, an interrupted one resumes
+        from its last checkpoint, and the file is marked done before it is removed. With a prediction
+        cache, a file whose content was already scored by the current model is answered from the cache.
+        With profiling enabled, a sample of the files is processed under cProfile and tracemalloc.
+        With a bundle whose feature engine carries rolling windows from one file into the next,
+        files are scored one at a time, see _stream_order.
+
         Args:
             file_path (str): Path to the new data file to process.
         """
         logging.info("Found new data file %s", file_path)
+        if self.claimer is not None:
+            file_path = self.claimer.claim(file_path)
+            if file_path is None:
+                return
         try:
-            model_pipeline = ModelPipeline(model_path=self.model_path, data_dir=self.input_dir)
-            predictions =model_pipeline.process_new_data(file_path)
-            output_path =os.path.join(self.output_dir, os.path.basename(file_path))
-            pd.DataFrame(predictions, columns=['predictions']).to_csv(output_path, index=False)
-            logging.info("Predictions saved to %s",output_path)
-            
-            # Using parallelization to plot sensors
-            futures = [self.executor.submit(model_pipeline.plot_sensor_anomalies, sensor) for sensor in self.sensors_to_plot]
-            for future in futures:
-                plot_file = future.result()
-                logging.info("Saving image %s", plot_file)
-            
-            os.remove(file_path)
-            logging.info("Removed original data file %s", file_path)
+            with self._profile(file_path), timed(self.metrics, 'file'):
+                bundle = self.bundle_manager.get()
+                model_pipeline = ModelPipeline(model_path=self.model_path, data_dir=self.input_dir,
+                                               bundle=bundle, metrics=self.metrics)
+                collected = [] if self.sink is not None and self.sensors_to_plot else None
+                commit, resumed, result = None, False, None
+                with self._stream_order(bundle):
+                    if self.journal is None:
+                        rows = score_file(model_pipeline, file_path, self.output_dir, self.chunk_size,
+                                          sink=self.sink, collect=collected, cache=self.prediction_cache)
+                    else:
+                        result = score_file_journaled(model_pipeline, file_path, self.output_dir, self.journal,
+                                                      self.chunk_size, sink=self.sink, collect=collected,
+                                                      cache=self.prediction_cache)
+                if self.journal is not None:
+                    if result is None:
+                        self.metrics.counter('skipped_files_total', "Input files whose content was already "
+                                                                    "processed.").inc(mode='live')
+                        self._remove_input(file_path)
+                        return
+                    rows, commit, resumed = result['rows'], result['commit'], result['start_row'] > 0
+
+                self._complete_file(file_path, collected, resumed, commit)
+            self.metrics.counter('files_total', "Input files processed.").inc(mode='live')
+            self.metrics.counter('rows_total', "Rows scored.").inc(rows, mode='live')
         except Exception as e:
+            self.metrics.counter('errors_total', "Input files that failed to process.").inc(mode='live')
             logging.error("Error processing file %s: %s", file_path, str(e))
+            self._release_claim(file_path)
+
+    def _release_claim(self, claimed_path: str):
+        """
+        Give a claimed file that failed back to the input directory, see FileClaimer.release.
+        """
+        if self.claimer is None:
+            return
+        try:
+            self.claimer.release(claimed_path)
+        except OSError as e:
+            logging.error("Error releasing claimed file %s: %s", claimed_path, e)
+
+    def _stream_order(self, bundle: ModelBundle):
+        """
+        Return a context scoring one file at a time if the bundle has a feature engine.
+
+        All files are scored as DEFAULT_STREAM, so the rolling windows continue from the previous
+        file's last rows as during training; concurrent files would read and replace each other's
+        carry-over rows. Without a feature engine files are scored concurrently.
+        """
+        if bundle.feature_engine is None:
+            return nullcontext()
+        return self._stream_lock
+
+    def _profile(self, file_path: str):
+        """
+        Return a context profiling the processing of a file if it is sampled, see FileProfiler.profile.
+        """
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.profile(file_path)
+
+    def _complete_file(self, file_path: str, collected: Optional[list], resumed: bool, commit=None):
+        """
+        Plot a scored file and remove it, right away or once the output sink has written its predictions.
+
+        Args:
+            file_path (str): Path to the scored data file.
+            collected (Optional[list]): Predicted classes per chunk; read back from the predictions CSV if None.
+            resumed (bool): Whether only the rows after a journal checkpoint were scored in this attempt.
+            commit (Optional[Callable]): Marks the file done in the journal before it is removed.
+        """
+        # Using parallelization to plot sensors; the sink holds only part of a resumed file's predictions
+        if self.sensors_to_plot and not (resumed and self.sink is not None):
+            self.plot_predictions(file_path, np.concatenate(collected) if collected else None)
+        if self.sink is None:
+            self._finish_input(file_path, commit)
+        else:
+            self.sink.after_write(lambda: self._finish_input(file_path, commit))
+
+    def _finish_input(self, file_path: str, commit=None):
+        """
+        Mark a file done in the journal, if any, and then remove it.
+        """
+        if commit is not None:
+            commit()
+        self._remove_input(file_path)
+
+    def _remove_input(self, file_path: str):
+        """
+        Remove a processed input file.
+        """
+        with timed(self.metrics, 'delete'):
+            os.remove(file_path)
+        logging.info("Removed original data file %s", file_path)
+
+    def _register_gauges(self):
+        """
+        Expose the scheduler's and the render pool's state as gauges read on every scrape.
+        """
+        def scheduler_stat(name):
+            return lambda: self.scheduler.stats()[name]
+
+        self.metrics.gauge('scoring_queue_depth', "Stable files waiting for a scoring worker.",
+                           scheduler_stat('queue_depth'))
+        self.metrics.gauge('stabilizing_files', "Files waiting until they are completely written.",
+                           scheduler_stat('stabilizing'))
+        self.metrics.gauge('scoring_workers_busy', "Scoring workers currently processing a file.",
+                           scheduler_stat('busy_workers'))
+        self.metrics.gauge('scoring_workers', "Configured number of scoring workers.", lambda: self.scoring_workers)
+        self.metrics.gauge('scoring_worker_utilisation', "Fraction of scoring workers currently busy.",
+                           lambda: self.scheduler.stats()['busy_workers'] / max(1, self.scoring_workers))
+        self.metrics.gauge('coalesced_events', "Filesystem events merged into an already known file.",
+                           scheduler_stat('coalesced'))
+        # ThreadPoolExecutor has no public queue size; _work_queue holds the submitted, not yet started plots
+        self.metrics.gauge('render_queue_depth', "Plots waiting for a render worker.",
+                           lambda: self.render_executor._work_queue.qsize())
+
+    def start_metrics(self):
+        """
+        Start serving and/or writing the metrics as configured; does nothing if neither is configured or already started.
+        """
+        if self.exporter is not None or (self.metrics_port is None and self.metrics_file is None):
+            return
+        self.exporter = MetricsExporter(self.metrics, port=self.metrics_port, path=self.metrics_file,
+                                        flush_interval=self.metrics_flush_interval)
+        self.exporter.start()
+
+    def stop_metrics(self):
+        """
+        Stop the metrics exporter, writing the metrics file a last time.
+        """
+        if self.exporter is not None:
+            self.exporter.stop()
+            self.exporter = None
+
+    def _on_file_event(self, file_path: str):
+        """
+        Hand a created or moved-in file to the scheduler and record how long after its last write it was detected.
+        """
+        try:
+            delay = time.time() - os.stat(file_path).st_mtime
+        except FileNotFoundError:
+            return
+        if self.scheduler.submit(file_path):
+            self.metrics.histogram('stage_seconds', "Duration of the pipeline stages in seconds.").observe(
+                max(0.0, delay), stage='detect')
+
+    def plot_predictions(self, file_path: str, predictions=None) -> List[str]:
+        """
+        Plot the configured sensors of a scored file with its predicted anomaly intervals.
+
+        Only the plotted sensor columns are read back from the input file, and the predictions,
+        unless given, from the output file, so this also works after streaming inference.
+
+        Args:
+            file_path (str): Path to the scored data file.
+            predictions: Predicted status per row of the file; read from the predictions CSV if None.
+
+        Returns:
+            List[str]: Paths to the saved plot image files.
+        """
+        df, _ = read_sensor_csv(file_path, usecols=self.sensors_to_plot, with_status=False)
+        if predictions is None:
+            output_path = os.path.join(self.output_dir, os.path.basename(file_path))
+            predictions = pd.read_csv(output_path)['predictions'].to_numpy()
+        prefix = os.path.splitext(os.path.basename(file_path))[0] + '_'
+        plot_files = self.renderer.render_many(df, self.sensors_to_plot, predictions, prefix=prefix,
+                                               executor=self.render_executor)
+        for plot_file in plot_files:
+            logging.info("Saving image %s", plot_file)
+        return plot_files
+
+    def list_backlog(self) -> List[str]:
+        """
+        List the files already waiting in the input directory, oldest first.
+
+        Returns:
+            List[str]: Paths of the waiting files.
+        """
+        waiting = []
+        with os.scandir(self.input_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        waiting.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    # Scored, claimed or moved away since the directory was listed
+                    continue
+        return [path for _, path in sorted(waiting)]
+
+    def drain_backlog(self) -> dict:
+        """
+        Score all files already in the input directory with a process pool.
+
+        The pool is sized to the cores (or backlog_workers) and every process gets its own copy of the
+        model bundle with the forest's n_jobs set so that processes times threads does not exceed the
+        cores. With shared_model the processes map one copy of the forest instead. With claim_files
+        every file is claimed first, so instances draining the same directory split the files, and a
+        file that fails is given back to the input directory for live monitoring to retry. Files
+        arriving while the backlog is drained are picked up by a further round. With a feature engine
+        in the bundle the files are scored by one process, oldest first, so the rolling windows
+        continue from file to file as in live scoring. Anomaly plots are not rendered for backlog files.
+
+        Returns:
+            dict: Throughput summary with files, rows, errors, seconds, files_per_second and rows_per_second,
+            and per worker pid its bundle load seconds and last reported RSS and PSS in MB.
+        """
+        cores = os.cpu_count() or 1
+        workers = self.backlog_workers or cores
+        if workers > 1 and self.bundle_manager.get().feature_engine is not None:
+            logging.info("Model bundle has a feature engine, draining the backlog with one process")
+            workers = 1
+        n_jobs = max(1, cores // workers)
+        start = time.perf_counter()
+        files = rows = errors = 0
+        attempted = set()
+        worker_stats = {}
+        claim_dir = None
+        if self.claimer is not None:
+            self.claimer.start()
+            self.claimer.reclaim_stale()
+            claim_dir = self.claimer.claim_dir
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_backlog_worker,
+                                 initargs=(self.model_path, n_jobs, self.output_sink, self.output_dir,
+                                           self.output_batch_rows, self.mmap_mode)) as pool:
+            backlog = self.list_backlog()
+            while backlog:
+                logging.info("Draining backlog of %d files with %d processes", len(backlog), workers)
+                attempted.update(backlog)
+                futures = {pool.submit(_drain_file, path, self.model_path, self.input_dir, self.output_dir,
+                                       self.chunk_size, claim_dir, self.journal_path): path for path in backlog}
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                        if result is None:
+                            continue
+                        file_rows = result['rows']
+                        worker_stats[result['pid']] = {name: result[name]
+                                                       for name in ('load_seconds', 'rss_mb', 'pss_mb')}
+                        rows += file_rows
+                        files += 1
+                        self.metrics.counter('files_total', "Input files processed.").inc(mode='backlog')
+                        self.metrics.counter('rows_total', "Rows scored.").inc(file_rows, mode='backlog')
+                    except Exception as e:
+                        errors += 1
+                        self.metrics.counter('errors_total', "Input files that failed to process.").inc(mode='backlog')
+                        logging.error("Error processing file %s: %s", futures[future], str(e))
+                        if claim_dir is not None:
+                            self._release_claim(os.path.join(claim_dir, os.path.basename(futures[future])))
+                backlog = [path for path in self.list_backlog() if path not in attempted]
+        elapsed = time.perf_counter() - start
+        summary = {
+            'files': files,
+            'rows': rows,
+            'errors': errors,
+            'seconds': elapsed,
+            'files_per_second': files / elapsed if elapsed > 0 else 0.0,
+            'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+            'workers': worker_stats,
+        }
+        logging.info("Backlog drained: %s", summary)
+        print("Backlog drained: %d files, %d rows, %d errors in %.1f s (%.2f files/s, %.0f rows/s)" % (
+            files, rows, errors, elapsed, summary['files_per_second'], summary['rows_per_second']))
+        for pid, stats in sorted(worker_stats.items()):
+            print("  worker %d: model loaded in %.3f s, RSS %s MB, PSS %s MB" % (
+                pid, stats['load_seconds'], stats['rss_mb'], stats['pss_mb']))
+        return summary
+
+    def run(self):
+        """
+        Drain the files already in the input directory, then hand over to live monitoring, which
+        picks up the files that arrived in between.
+        """
+        self.start_metrics()
+        self.drain_backlog()
+        self.start_monitoring()
 
     def start_monitoring(self):
         """
         start monitoring the input directory for new files.
 
-        Using watchdog to monitor the input directory and processes new files as they appear.
+        Using watchdog to monitor the input directory. New and moved-in files are handed to the
+        scheduler, which processes them once they are completely written. The scheduler's queue
+        depth and wait times are logged and the output sink's buffered predictions are written
+        every check_interval seconds, and the metrics are published as configured. With claim_files
+        the files of instances whose lease expired are reclaimed every check_interval seconds as well.
+
+        Once the observer runs, the files already in the input directory are submitted too, so files
+        that arrived after drain_backlog listed the directory but before the observer started are not
+        missed. A file seen both ways is coalesced by the scheduler.
         """
         event_handler = FileSystemEventHandler()
-        event_handler.on_created = lambda event: self.executor.submit(self.process_new_file, event.src_path)
+        event_handler.on_created = lambda event: event.is_directory or self._on_file_event(event.src_path)
+        event_handler.on_moved = lambda event: event.is_directory or self._on_file_event(event.dest_path)
+        self.start_metrics()
+        if self.sink is not None and self.compaction_interval and hasattr(self.sink, 'start_compaction'):
+            self.sink.start_compaction(self.compaction_interval)
+        if self.claimer is not None:
+            self.claimer.start()
+        self.scheduler.start()
         observer = Observer()
         observer.schedule(event_handler, self.input_dir, recursive=False)
         observer.start()
+        for file_path in self.list_backlog():
+            self._on_file_event(file_path)
         logging.info("Started listening for new files.")
         try:
-            while True:
-                time.sleep(self.check_interval)
+            while not self._stop_event.wait(self.check_interval):
+                logging.info("Scheduler status: %s", self.scheduler.stats())
+                if self.prediction_cache is not None:
+                    logging.info("Prediction cache: %s", self.prediction_cache.stats())
+                self._flush_sink()
+                self._reclaim_stale()
         except KeyboardInterrupt:
-            observer.stop()
+            pass
+        observer.stop()
         observer.join()
+        self.scheduler.shutdown()
+        if self.sink is not None:
+            self.sink.close()
+        if self.claimer is not None:
+            self.claimer.stop()
+        self.stop_metrics()
+        self.render_executor.shutdown()
+
+    def _flush_sink(self):
+        """
+        Write the rows buffered by the output sink, so quiet periods do not hold predictions back.
+        """
+        if self.sink is None:
+            return
+        try:
+            self.sink.flush()
+        except Exception as e:
+            logging.error("Error writing predictions to the output sink: %s", e)
+
+    def _reclaim_stale(self):
+        """
+        Move the files claimed by instances whose lease expired back into the input directory.
+        """
+        if self.claimer is None:
+            return
+        try:
+            self.claimer.reclaim_stale()
+        except OSError as e:
+            logging.error("Error reclaiming stale claims: %s", e)
+
+    def stop(self):
+        """
+        Ask start_monitoring to stop, e.g. from another thread. Queued files are still processed.
+        """
+        self._stop_event.set()
 
 # #The code adheres to these principles, promoting clean and maintainable design.
 
@@ -0,0 +1,58 @@
+import sys
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of the current process in megabytes.
+
+    Uses the resource module where available and falls back to psutil. On platforms
+    where psutil only reports the current RSS that value is returned instead.
+
+    Returns:
+        float: Peak RSS in MB, or None if it cannot be determined.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024)
+    return None
+
+
+def memory_mb():
+    """
+    Return the current memory use of this process in megabytes.
+
+    The resident set size counts pages shared with other processes, e.g. a memory-mapped
+    model, in full for every process. The proportional set size divides them by the number
+    of processes sharing them, so the PSS of all workers adds up to the real memory use.
+    PSS is read from /proc/self/smaps_rollup and is only available on Linux.
+
+    Returns:
+        dict: rss and pss in MB; a value is None if it cannot be determined.
+    """
+    result = {'rss': None, 'pss': None}
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            for line in file:
+                name, _, value = line.partition(':')
+                if name in ('Rss', 'Pss'):
+                    result[name.lower()] = int(value.split()[0]) / 1024
+        return result
+    except (OSError, ValueError):
+        pass
+    if psutil is not None:
+        result['rss'] = psutil.Process().memory_info().rss / (1024 * 1024)
+    return result
@@ -0,0 +1,205 @@
+import os
+import queue
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class WorkScheduler:
+    """
+    Schedules files reported by the filesystem watcher onto a fixed set of worker threads.
+
+    A file first waits until it is stable (its size and mtime did not change for
+    stability_checks polls), so half-written files are never read. Stable files enter a
+    bounded queue; when the queue is full the stabilizer blocks instead of letting work pile
+    up in memory. Repeated events for a file that is already waiting, queued or being
+    processed are coalesced into one job.
+
+    Attributes:
+        handler (Callable[[str], None]): Function called with the path of every stable file.
+        max_queue_size (int): Maximum number of stable files waiting for a worker.
+        workers (int): Number of worker threads calling handler.
+        stability_interval (float): Seconds between two size/mtime checks of a waiting file.
+        stability_checks (int): Number of consecutive unchanged checks after which a file is stable.
+        metrics (MetricsRegistry): Optional registry receiving the stabilize and queue_wait durations of every file.
+    """
+    def __init__(self, handler: Callable[[str], None], max_queue_size: int = 100, workers: int = 4,
+                 stability_interval: float = 1.0, stability_checks: int = 2, metrics=None):
+        """
+        initializes the scheduler. Call start to launch its threads.
+
+        Args:
+            handler (Callable[[str], None]): Function called with the path of every stable file.
+            max_queue_size (int): Maximum number of stable files waiting for a worker.
+            workers (int): Number of worker threads calling handler.
+            stability_interval (float): Seconds between two size/mtime checks of a waiting file.
+            stability_checks (int): Number of consecutive unchanged checks after which a file is stable.
+            metrics (MetricsRegistry): Optional registry receiving the stabilize and queue_wait durations of every file.
+        """
+        self.handler = handler
+        self.max_queue_size = max_queue_size
+        self.workers = workers
+        self.stability_interval = stability_interval
+        self.stability_checks = stability_checks
+        self.metrics = metrics
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._stabilizing: Dict[str, list] = {}
+        self._scheduled = set()
+        self._stop = threading.Event()
+        self._threads = []
+        self._busy = 0
+        self._submitted = 0
+        self._coalesced = 0
+        self._processed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def start(self):
+        """
+        Start the stabilizer thread and the worker threads.
+        """
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._stabilize_loop, name='scheduler-stabilizer', daemon=True)]
+        self._threads += [threading.Thread(target=self._work_loop, name=f'scheduler-worker-{i}', daemon=True)
+                          for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        logging.info("Scheduler started with %d workers and a queue of %d files", self.workers, self.max_queue_size)
+
+    def submit(self, file_path: str) -> bool:
+        """
+        Report a file. It is handed to a worker once it is stable.
+
+        Args:
+            file_path (str): Path of the new file.
+
+        Returns:
+            bool: False if the file was already known to the scheduler and the event was coalesced.
+        """
+        with self._lock:
+            if file_path in self._stabilizing or file_path in self._scheduled:
+                self._coalesced += 1
+                return False
+            self._stabilizing[file_path] = [None, 0, time.monotonic()]
+            self._submitted += 1
+        return True
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop accepting files and stop the threads after the queued files are processed.
+
+        Args:
+            wait (bool): Whether to block until the worker threads have exited.
+        """
+        self._stop.set()
+        for _ in range(self.workers):
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        logging.info("Scheduler stopped: %s", self.stats())
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the scheduler's counters.
+
+        Returns:
+            dict: queue_depth, stabilizing, busy_workers, submitted, coalesced, processed, failed,
+            avg_wait_seconds and max_wait_seconds (time between a file becoming stable and a worker starting it).
+        """
+        with self._lock:
+            started = self._processed + self._failed + self._busy
+            return {
+                'queue_depth': self._queue.qsize(),
+                'stabilizing': len(self._stabilizing),
+                'busy_workers': self._busy,
+                'submitted': self._submitted,
+                'coalesced': self._coalesced,
+                'processed': self._processed,
+                'failed': self._failed,
+                'avg_wait_seconds': self._wait_total / started if started else 0.0,
+                'max_wait_seconds': self._wait_max,
+            }
+
+    def _file_signature(self, file_path: str) -> Optional[tuple]:
+        """
+        Return (size, mtime) of a file, or None if it no longer exists.
+        """
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _observe(self, stage: str, seconds: float):
+        """
+        Record a duration in the stage histogram of the metrics registry.
+        """
+        self.metrics.histogram('stage_seconds', "Duration of the pipeline stages in seconds.").observe(
+            seconds, stage=stage)
+
+    def _stabilize_loop(self):
+        """
+        Poll waiting files and move the stable ones into the bounded queue.
+        """
+        while not self._stop.is_set():
+            with self._lock:
+                waiting = list(self._stabilizing.items())
+            for file_path, state in waiting:
+                signature = self._file_signature(file_path)
+                if signature is None:
+                    logging.warning("File %s disappeared before it was processed", file_path)
+                    with self._lock:
+                        self._stabilizing.pop(file_path, None)
+                    continue
+                state[1] = state[1] + 1 if signature == state[0] else 0
+                state[0] = signature
+                if state[1] < self.stability_checks:
+                    continue
+                with self._lock:
+                    self._stabilizing.pop(file_path, None)
+                    self._scheduled.add(file_path)
+                if self.metrics is not None:
+                    self._observe('stabilize', time.monotonic() - state[2])
+                # Blocks while the queue is full, which holds further files back in the stabilizing set
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put((file_path, time.monotonic()), timeout=self.stability_interval)
+                        break
+                    except queue.Full:
+                        continue
+            self._stop.wait(self.stability_interval)
+
+    def _work_loop(self):
+        """
+        Take stable files from the queue and call the handler for each.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            file_path, enqueued_at = item
+            waited = time.monotonic() - enqueued_at
+            with self._lock:
+                self._busy += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            if self.metrics is not None:
+                self._observe('queue_wait', waited)
+            failed = False
+            try:
+                self.handler(file_path)
+            except Exception as e:
+                failed = True
+                logging.error("Error processing file %s: %s", file_path, str(e))
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._scheduled.discard(file_path)
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._processed += 1
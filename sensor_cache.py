@@ -0,0 +1,174 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from typing import Optional
+from model_bundle import file_digest
+from ingestion import read_sensor_csv, STATUS_COLUMN
+
+
+class SensorCache:
+    """
+    Binary columnar cache of the raw sensor dataset.
+
+    The parsed dataset is stored as a set of .npy files: one 2D matrix with all sensor
+    columns, the timestamp index as int64 nanoseconds and the machine status as small
+    integer codes. The files are memory-mapped read-only on load, so the DataFrame
+    returned by load and any row range sliced from it share the cached pages instead
+    of copying them.
+
+    Attributes:
+        cache_dir (str): Directory holding the cache files.
+    """
+    META_FILE = 'meta.json'
+    VALUES_FILE = 'values.npy'
+    TIMESTAMPS_FILE = 'timestamps.npy'
+    STATUS_FILE = 'status.npy'
+    # Incremented whenever the layout or dtypes of the cache files change
+    FORMAT_VERSION = 1
+
+    def __init__(self, cache_dir: str):
+        """
+        initializes the cache.
+
+        Args:
+            cache_dir (str): Directory holding the cache files. Created when the cache is first built.
+        """
+        self.cache_dir = cache_dir
+
+    def load(self, source_path: Optional[str] = None) -> pd.DataFrame:
+        """
+        Return the dataset as a DataFrame indexed by timestamp, building the cache first
+        if it does not exist or the source file changed.
+
+        Args:
+            source_path (Optional[str]): Path to the sensor CSV file. If None, the existing cache is
+                opened as it is, e.g. after DatasetDownloader.stream_to_cache filled it.
+
+        Returns:
+            pd.DataFrame: Memory-mapped sensor data with a sorted DatetimeIndex.
+
+        Raises:
+            FileNotFoundError: If source_path is None and there is no complete cache.
+        """
+        meta = self._read_meta()
+        if source_path is None:
+            if meta is None or meta.get('format_version') != self.FORMAT_VERSION:
+                raise FileNotFoundError(f"No sensor cache in {self.cache_dir}. Please download the dataset first.")
+            return self._open(meta)
+        if meta is None or meta.get('format_version') != self.FORMAT_VERSION or not self._is_fresh(meta, source_path):
+            meta = self.build(source_path)
+        else:
+            logging.info("Using sensor cache %s for %s", self.cache_dir, source_path)
+        return self._open(meta)
+
+    def build(self, source_path, source_info: Optional[dict] = None) -> dict:
+        """
+        Parse the source CSV once and write the cache files.
+
+        The metadata file is written last, so an interrupted build is never mistaken for a valid cache.
+
+        Args:
+            source_path: Path to the sensor CSV file, or a seekable binary stream of it, e.g. a zip member.
+            source_info (Optional[dict]): Identity of a streamed source, e.g. its URL and ETag, stored
+                instead of the file's hash and checked with matches_source. Required for streams.
+
+        Returns:
+            dict: The metadata of the written cache.
+        """
+        if source_info is None and not isinstance(source_path, (str, os.PathLike)):
+            raise ValueError("source_info is required when the cache is built from a stream")
+        logging.info("Building sensor cache %s from %s", self.cache_dir,
+                     source_path if source_info is None else source_info)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path = os.path.join(self.cache_dir, self.META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        df, _ = read_sensor_csv(source_path)
+        df = df.sort_index(kind='stable')
+
+        status = df.pop(STATUS_COLUMN).array
+        timestamps = df.index.values.astype('datetime64[ns]')
+        np.save(os.path.join(self.cache_dir, self.TIMESTAMPS_FILE), timestamps.view('int64'))
+        np.save(os.path.join(self.cache_dir, self.STATUS_FILE), status.codes)
+        np.save(os.path.join(self.cache_dir, self.VALUES_FILE), np.ascontiguousarray(df.to_numpy()))
+
+        meta = {
+            'format_version': self.FORMAT_VERSION,
+            'columns': list(df.columns),
+            'status_categories': [str(category) for category in status.categories],
+        }
+        if source_info is None:
+            stat = os.stat(source_path)
+            meta['source_digest'] = file_digest(source_path)
+            meta['source_stat'] = [stat.st_mtime_ns, stat.st_size]
+        else:
+            meta['source'] = source_info
+        self._write_meta(meta)
+        logging.info("Sensor cache built with %d rows", len(df))
+        return meta
+
+    def matches_source(self, source_info: dict) -> bool:
+        """
+        Check whether a complete cache was built from the streamed source described by source_info.
+
+        Args:
+            source_info (dict): Identity of the source, as passed to build.
+
+        Returns:
+            bool: True if the cache can be used as it is.
+        """
+        meta = self._read_meta()
+        return (meta is not None and meta.get('format_version') == self.FORMAT_VERSION
+                and meta.get('source') == source_info)
+
+    def _read_meta(self):
+        """
+        Read the cache metadata, or return None if no complete cache exists.
+        """
+        try:
+            with open(os.path.join(self.cache_dir, self.META_FILE), 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _is_fresh(self, meta: dict, source_path: str) -> bool:
+        """
+        Check whether the cache was built from the current content of the source file.
+
+        An unchanged mtime and size is trusted directly; otherwise the content hash decides.
+        """
+        stat = os.stat(source_path)
+        if meta.get('source_stat') == [stat.st_mtime_ns, stat.st_size]:
+            return True
+        if file_digest(source_path) != meta.get('source_digest'):
+            return False
+        meta['source_stat'] = [stat.st_mtime_ns, stat.st_size]
+        self._write_meta(meta)
+        return True
+
+    def _write_meta(self, meta: dict):
+        """
+        Replace the cache metadata atomically, so concurrent readers never see a partly written file.
+
+        The temporary file is named per process, as several backtest workers may refresh it at once.
+        """
+        meta_path = os.path.join(self.cache_dir, self.META_FILE)
+        tmp_path = f"{meta_path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, meta_path)
+
+    def _open(self, meta: dict) -> pd.DataFrame:
+        """
+        Memory-map the cache files and wrap them in a DataFrame without copying the sensor values.
+        """
+        values = np.load(os.path.join(self.cache_dir, self.VALUES_FILE), mmap_mode='r')
+        timestamps = np.load(os.path.join(self.cache_dir, self.TIMESTAMPS_FILE), mmap_mode='r')
+        codes = np.load(os.path.join(self.cache_dir, self.STATUS_FILE), mmap_mode='r')
+        index = pd.DatetimeIndex(np.asarray(timestamps).view('datetime64[ns]'), name='timestamp')
+        df = pd.DataFrame(values, index=index, columns=meta['columns'], copy=False)
+        df[STATUS_COLUMN] = pd.Categorical.from_codes(np.asarray(codes), categories=meta['status_categories'])
+        return df
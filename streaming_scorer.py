@@ -0,0 +1,281 @@
+import sys
+import csv
+import time
+import queue
+import socket
+import logging
+import argparse
+import itertools
+import threading
+import numpy as np
+import pandas as pd
+from collections import deque
+from typing import Callable, Iterable, Iterator, List, Optional
+from model_bundle import ModelBundleManager
+from ingestion import TIMESTAMP_COLUMN, TIMESTAMP_FORMAT
+
+# Numbers the default stream ids, so scorers sharing a bundle never share rolling-feature state
+_scorer_ids = itertools.count(1)
+
+
+class LatencyTracker:
+    """
+    Keeps the most recent latencies and reports their percentiles.
+
+    Attributes:
+        window (int): Number of most recent latencies kept.
+        count (int): Total number of latencies recorded.
+    """
+    def __init__(self, window: int = 10000):
+        """
+        initializes an empty tracker.
+
+        Args:
+            window (int): Number of most recent latencies kept.
+        """
+        self.window = window
+        self.count = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """
+        Record one latency.
+
+        Args:
+            seconds (float): Latency in seconds.
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+            self.count += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Return a percentile of the recent latencies.
+
+        Args:
+            q (float): Percentile between 0 and 100.
+
+        Returns:
+            float: Latency in seconds, or 0.0 if nothing was recorded.
+        """
+        with self._lock:
+            if not self._latencies:
+                return 0.0
+            return float(np.percentile(np.fromiter(self._latencies, dtype=float), q))
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            dict: count, p50_ms and p99_ms of the recent latencies.
+        """
+        return {'count': self.count, 'p50_ms': self.percentile(50) * 1000, 'p99_ms': self.percentile(99) * 1000}
+
+
+def tail_file(file_path: str, poll_interval: float = 0.2, from_start: bool = True) -> Iterator[str]:
+    """
+    Yield lines appended to a file, like tail -f.
+
+    Args:
+        file_path (str): Path of the file to follow.
+        poll_interval (float): Seconds to wait before checking for new data at the end of the file.
+        from_start (bool): Whether to yield the lines already in the file first (needed for the header).
+
+    Yields:
+        str: One complete line without the trailing newline.
+    """
+    with open(file_path, 'r') as file:
+        if not from_start:
+            file.seek(0, 2)
+        partial = ''
+        while True:
+            line = file.readline()
+            if not line:
+                time.sleep(poll_interval)
+                continue
+            partial += line
+            if partial.endswith('\n'):
+                yield partial.rstrip('\r\n')
+                partial = ''
+
+
+def socket_lines(host: str, port: int) -> Iterator[str]:
+    """
+    Accept connections on a local TCP socket and yield the lines they send, one connection at a time.
+
+    Args:
+        host (str): Interface to listen on, e.g. 127.0.0.1.
+        port (int): Port to listen on.
+
+    Yields:
+        str: One line without the trailing newline.
+    """
+    with socket.create_server((host, port)) as server:
+        logging.info("Streaming scorer listening on %s:%d", host, port)
+        while True:
+            connection, address = server.accept()
+            logging.info("Accepted sensor feed from %s", address)
+            with connection, connection.makefile('r') as stream:
+                for line in stream:
+                    yield line.rstrip('\r\n')
+
+
+class StreamingScorer:
+    """
+    Scores a live feed of sensor rows with the trained model held in memory.
+
+    Rows are CSV lines with the same columns as the training data; the first line with a
+    timestamp column is taken as the header. Rows are collected into micro-batches that are
+    scored when batch_size rows are waiting or the oldest row has waited max_delay seconds.
+    The latency from a row's arrival to its prediction is tracked per row. Every scorer scores
+    its feed as one stream, so the rolling features of a bundle's feature engine continue
+    across micro-batches as they did over the training rows.
+
+    Attributes:
+        bundle_manager (ModelBundleManager): Source of the model bundle; reloads it when the file changes.
+        batch_size (int): Maximum number of rows per micro-batch.
+        max_delay (float): Maximum number of seconds a row waits before its batch is scored.
+        on_prediction (Callable): Called with (timestamp, prediction) for every scored row.
+        latency (LatencyTracker): Arrival-to-prediction latency of the scored rows.
+        stream_id (str): Stream the feed's rows belong to in the bundle's feature engine.
+    """
+    def __init__(self, bundle_manager: ModelBundleManager, batch_size: int = 64, max_delay: float = 0.5,
+                 on_prediction: Optional[Callable] = None, columns: Optional[List[str]] = None,
+                 stream_id: Optional[str] = None):
+        """
+        initializes the scorer.
+
+        Args:
+            bundle_manager (ModelBundleManager): Source of the model bundle.
+            batch_size (int): Maximum number of rows per micro-batch.
+            max_delay (float): Maximum number of seconds a row waits before its batch is scored.
+            on_prediction (Optional[Callable]): Called with (timestamp, prediction) per row; prints to stdout if None.
+            columns (Optional[List[str]]): Column names of the feed if it has no header line.
+            stream_id (Optional[str]): Stream the feed's rows belong to; a name unique to this scorer if None.
+        """
+        self.bundle_manager = bundle_manager
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.on_prediction = on_prediction or self._print_prediction
+        self.columns = columns
+        self.latency = LatencyTracker()
+        self.alerts = 0
+        self.stream_id = stream_id or f'streaming-{next(_scorer_ids)}'
+
+    def score_batch(self, rows: List[List[str]], arrivals: List[float]):
+        """
+        Score one micro-batch and emit a prediction per row.
+
+        Args:
+            rows (List[List[str]]): Parsed CSV fields per row, in the order of columns.
+            arrivals (List[float]): time.monotonic() at which each row arrived.
+
+        Returns:
+            numpy.ndarray: Predicted class per row.
+        """
+        df = pd.DataFrame(rows, columns=self.columns)
+        df[TIMESTAMP_COLUMN] = pd.to_datetime(df[TIMESTAMP_COLUMN], format=TIMESTAMP_FORMAT, errors='coerce')
+        df = df.set_index(TIMESTAMP_COLUMN)
+        bundle = self.bundle_manager.get()
+        features = df[bundle.feature_columns].apply(pd.to_numeric, errors='coerce')
+        predictions = bundle.predict(features, self.stream_id)
+        now = time.monotonic()
+        for timestamp, prediction, arrived in zip(df.index, predictions, arrivals):
+            self.latency.record(now - arrived)
+            if prediction != 'NORMAL':
+                self.alerts += 1
+                logging.warning("Pump alert at %s: predicted %s", timestamp, prediction)
+            self.on_prediction(timestamp, prediction)
+        return predictions
+
+    def run(self, lines: Iterable[str]):
+        """
+        Score a feed of CSV lines until it ends.
+
+        The lines are read on a background thread, so a batch is flushed on time even while the source blocks.
+
+        Args:
+            lines (Iterable[str]): CSV lines, e.g. from tail_file, socket_lines or sys.stdin.
+        """
+        feed = queue.Queue(maxsize=self.batch_size * 16)
+        done = object()
+
+        def read():
+            try:
+                for line in lines:
+                    feed.put((line, time.monotonic()))
+            finally:
+                feed.put((done, None))
+
+        threading.Thread(target=read, name='streaming-reader', daemon=True).start()
+        rows, arrivals = [], []
+        finished = False
+        while not finished:
+            timeout = None if not rows else max(0.0, arrivals[0] + self.max_delay - time.monotonic())
+            try:
+                line, arrived = feed.get(timeout=timeout)
+            except queue.Empty:
+                line = None
+            if line is done:
+                finished = True
+            elif line:
+                fields = next(csv.reader([line]))
+                if TIMESTAMP_COLUMN in fields:
+                    self.columns = fields
+                    continue
+                if self.columns is None:
+                    logging.warning("Skipping row received before the header line")
+                    continue
+                rows.append(fields)
+                arrivals.append(arrived)
+            if rows and (finished or len(rows) >= self.batch_size
+                         or time.monotonic() - arrivals[0] >= self.max_delay):
+                try:
+                    self.score_batch(rows, arrivals)
+                except Exception as e:
+                    logging.error("Error scoring micro-batch of %d rows: %s", len(rows), e)
+                rows, arrivals = [], []
+        logging.info("Streaming scorer finished: %s, %d alerts", self.latency.summary(), self.alerts)
+
+    @staticmethod
+    def _print_prediction(timestamp, prediction):
+        """
+        Default output: one CSV line per prediction on stdout.
+        """
+        print(f"{timestamp},{prediction}", flush=True)
+
+
+def main(argv=None):
+    """
+    Command line entry point: score a sensor feed from stdin, a followed file or a local socket.
+    """
+    parser = argparse.ArgumentParser(description="Score a live sensor feed with the trained model bundle.")
+    parser.add_argument('--model', required=True, help="Path to the model bundle.")
+    parser.add_argument('--source', default='stdin',
+                        help="'stdin', 'tail:<path>' or 'socket:<port>' (listens on 127.0.0.1).")
+    parser.add_argument('--batch-size', type=int, default=64, help="Maximum rows per micro-batch.")
+    parser.add_argument('--max-delay', type=float, default=0.5, help="Maximum seconds a row waits for its batch.")
+    parser.add_argument('--flat-forest', action='store_true',
+                        help="Score micro-batches with the compiled FlatForest instead of sklearn.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+    if args.source == 'stdin':
+        lines = (line.rstrip('\r\n') for line in sys.stdin)
+    elif args.source.startswith('tail:'):
+        lines = tail_file(args.source[len('tail:'):])
+    elif args.source.startswith('socket:'):
+        lines = socket_lines('127.0.0.1', int(args.source[len('socket:'):]))
+    else:
+        parser.error(f"Unknown source: {args.source}")
+    bundle_manager = ModelBundleManager(args.model, flat_forest_max_batch=args.batch_size if args.flat_forest else None)
+    scorer = StreamingScorer(bundle_manager, batch_size=args.batch_size, max_delay=args.max_delay)
+    try:
+        scorer.run(lines)
+    except KeyboardInterrupt:
+        pass
+    print(scorer.latency.summary(), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
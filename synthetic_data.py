@@ -0,0 +1,86 @@
+import argparse
+import numpy as np
+import pandas as pd
+from ingestion import SENSOR_COLUMNS, TIMESTAMP_FORMAT
+
+
+def generate_sensor_data(n_rows: int, start: str = '2018-04-01', seed: int = 0, failure_every: int = 30000,
+                         recovery_rows: int = 600) -> pd.DataFrame:
+    """
+    Generate a deterministic synthetic pump-sensor dataset with the layout of the Kaggle sensor.csv.
+
+    Rows are one minute apart and carry 52 sensors, the unnamed row counter and machine_status.
+    Every failure_every rows the pump degrades for a while (sensors drift), breaks for one row
+    (BROKEN) and then spends recovery_rows rows RECOVERING at shifted levels. Like the real data,
+    sensor_15 is always empty, sensor_50 becomes empty after the first third of the rows,
+    sensor_51 has a long gap and the other sensors have sparse missing values.
+
+    Args:
+        n_rows (int): Number of rows to generate.
+        start (str): Timestamp of the first row.
+        seed (int): Seed of the random generator; the same seed always gives the same data.
+        failure_every (int): Average number of rows between two failures.
+        recovery_rows (int): Number of RECOVERING rows after every failure.
+
+    Returns:
+        pd.DataFrame: The dataset with the columns of sensor.csv.
+    """
+    rng = np.random.default_rng(seed)
+    n_sensors = len(SENSOR_COLUMNS)
+    timestamps = pd.date_range(start, periods=n_rows, freq='min')
+
+    status = np.full(n_rows, 'NORMAL', dtype=object)
+    degradation = np.zeros(n_rows)
+    recovering = np.zeros(n_rows, dtype=bool)
+    failure = int(rng.integers(failure_every // 2, failure_every))
+    while failure < n_rows:
+        ramp_start = max(0, failure - recovery_rows)
+        degradation[ramp_start:failure] = np.linspace(0, 1, failure - ramp_start)
+        status[failure] = 'BROKEN'
+        status[failure + 1:failure + 1 + recovery_rows] = 'RECOVERING'
+        recovering[failure + 1:failure + 1 + recovery_rows] = True
+        failure += int(rng.integers(failure_every // 2, failure_every * 3 // 2))
+
+    levels = rng.uniform(1, 600, n_sensors)
+    noise = levels * rng.uniform(0.01, 0.05, n_sensors)
+    drift = levels * rng.uniform(-0.3, 0.3, n_sensors)
+    values = levels + rng.standard_normal((n_rows, n_sensors)) * noise
+    values += degradation[:, None] * drift
+    values[recovering] *= rng.uniform(0.2, 0.6, n_sensors)
+    values = values.astype(np.float32)
+
+    values[rng.random((n_rows, n_sensors)) < 0.002] = np.nan
+    values[:, SENSOR_COLUMNS.index('sensor_15')] = np.nan
+    values[n_rows // 3:, SENSOR_COLUMNS.index('sensor_50')] = np.nan
+    values[n_rows // 2:n_rows // 2 + n_rows // 10, SENSOR_COLUMNS.index('sensor_51')] = np.nan
+
+    df = pd.DataFrame(values, columns=SENSOR_COLUMNS)
+    df.insert(0, 'timestamp', timestamps.strftime(TIMESTAMP_FORMAT))
+    df.insert(0, 'Unnamed: 0', np.arange(n_rows))
+    df['machine_status'] = status
+    return df
+
+
+def write_sensor_csv(path: str, n_rows: int, **kwargs) -> str:
+    """
+    Generate a synthetic dataset and write it as CSV.
+
+    Args:
+        path (str): Destination of the CSV file.
+        n_rows (int): Number of rows to generate.
+        **kwargs: Further arguments of generate_sensor_data.
+
+    Returns:
+        str: The path of the written file.
+    """
+    generate_sensor_data(n_rows, **kwargs).to_csv(path, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic pump-sensor CSV.")
+    parser.add_argument('path', help="Destination of the CSV file.")
+    parser.add_argument('--rows', type=int, default=220320, help="Number of rows (sensor.csv has 220320).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator.")
+    args = parser.parse_args()
+    write_sensor_csv(args.path, args.rows, seed=args.seed)
@@ -0,0 +1,132 @@
+import os
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from download_engine import RangedDownloader
+
+PAYLOAD = random.Random(0).randbytes(1024 * 1024 + 17)
+CHECKSUM = f'sha256:{hashlib.sha256(PAYLOAD).hexdigest()}'
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """
+    Serves the server's payload, honouring single byte ranges if the server is ranged.
+
+    The server's budget is the number of body bytes served before every further request fails
+    with 503; the response crossing the budget is cut off mid-body. With empty set, every range
+    request except the downloader's bytes=0-0 probe is answered with an empty 206 body.
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        requested = self.headers.get('Range')
+        with server.lock:
+            server.requests += 1
+            exhausted = server.budget is not None and server.budget <= 0
+        if exhausted:
+            self.send_error(503)
+            return
+        if server.ranged and requested:
+            first, last = requested[len('bytes='):].split('-')
+            first = int(first)
+            last = min(int(last) if last else len(payload) - 1, len(payload) - 1)
+            body = b'' if server.empty and requested != 'bytes=0-0' else payload[first:last + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{len(payload)}')
+        else:
+            body = payload
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        with server.lock:
+            if server.budget is not None:
+                allowed = max(0, min(len(body), server.budget))
+                server.budget -= allowed
+                body = body[:allowed]
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def serve():
+    """
+    Start local HTTP servers for a test: serve(ranged=True, budget=None, empty=False) returns (server, url).
+    """
+    servers = []
+
+    def start(ranged=True, budget=None, empty=False):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _FileHandler)
+        server.daemon_threads = True
+        server.payload = PAYLOAD
+        server.ranged = ranged
+        server.budget = budget
+        server.empty = empty
+        server.requests = 0
+        server.lock = threading.Lock()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f'http://127.0.0.1:{server.server_address[1]}/data.bin'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_segmented_download(serve, tmp_path):
+    server, url = serve()
+    destination = str(tmp_path / 'data.bin')
+    result = RangedDownloader(url, segments=4, workers=4, checksum=CHECKSUM).download(destination)
+    assert _read(destination) == PAYLOAD
+    assert result['segments'] == 4
+    assert result['resumed_bytes'] == 0
+    # The probe plus at least one request per segment
+    assert server.requests >= 5
+    assert not os.path.exists(destination + '.part')
+    assert not os.path.exists(destination + '.part.json')
+
+
+def test_resume_after_interruption(serve, tmp_path):
+    destination = str(tmp_path / 'data.bin')
+    server, url = serve(budget=300 * 1024)
+    with pytest.raises(requests.RequestException):
+        RangedDownloader(url, segments=4, workers=4, retries=1, checksum=CHECKSUM).download(destination)
+    assert os.path.exists(destination + '.part')
+    assert os.path.exists(destination + '.part.json')
+    assert not os.path.exists(destination)
+
+    server.budget = None
+    result = RangedDownloader(url, segments=4, workers=4, checksum=CHECKSUM).download(destination)
+    assert _read(destination) == PAYLOAD
+    assert 0 < result['resumed_bytes'] <= 300 * 1024
+
+
+def test_fallback_without_range_support(serve, tmp_path):
+    server, url = serve(ranged=False)
+    destination = str(tmp_path / 'data.bin')
+    downloader = RangedDownloader(url, segments=4, workers=4, checksum=CHECKSUM)
+    assert downloader.probe()['ranged'] is False
+    result = downloader.download(destination)
+    assert _read(destination) == PAYLOAD
+    assert result['segments'] == 1
+
+
+def test_empty_partial_responses_count_as_failed_attempts(serve, tmp_path):
+    server, url = serve(empty=True)
+    destination = str(tmp_path / 'data.bin')
+    with pytest.raises(requests.RequestException):
+        RangedDownloader(url, segments=2, workers=2, retries=1).download(destination)
+    # The probe and one attempt per segment, instead of re-requesting forever
+    assert server.requests == 3